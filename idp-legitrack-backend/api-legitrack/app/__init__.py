@@ -1,26 +1,50 @@
 from flask import Flask
-from .extensions import db, jwt, swagger, migrate, cors
+from .banco import db, configurar_banco, criar_app_dados, wait_for_db
 import os
+from datetime import timedelta
 from dotenv import load_dotenv
 
-def create_app():
+def create_app(perfil='api'):
+    """
+    Cria a aplicação HTTP completa. 'perfil' escolhe a configuração do pool de
+    conexões ('api' para o servidor HTTP, 'worker' para ferramentas que usam o
+    cliente de teste). Processos sem HTTP usam criar_app_dados() (app/banco.py).
+    """
+    # Importadas aqui: Swagger, JWT, CORS e Migrate só carregam em quem serve HTTP
+    from .extensions import jwt, swagger, migrate, cors, broker, profiler, limitador
+    from .limites import LIMITES_PADRAO
+
     app = Flask(__name__)
 
     # Carrega variáveis de ambiente do arquivo .env
     load_dotenv()
 
-    # Configurações do Banco de Dados
-    db_host = os.getenv('DB_HOST', 'db')
-    db_port = os.getenv('DB_PORT', '5432')
-    db_user = os.getenv('DB_USER', 'user')
-    db_password = os.getenv('DB_PASSWORD', 'password')
-    db_name = os.getenv('DB_NAME', 'legitrack_db')
+    app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'fallback-secret-key-change-this')
+    # Access token curto; o refresh token (app/tokens.py) renova sem refazer o login
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(minutes=int(os.getenv('JWT_ACESSO_MINUTOS', '15')))
+    app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=int(os.getenv('JWT_REFRESH_DIAS', '30')))
 
-    database_uri = f'postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}'
+    # Configurações do stream de notificações (SSE)
+    app.config['SSE_HEARTBEAT_SEGUNDOS'] = int(os.getenv('SSE_HEARTBEAT_SEGUNDOS', '25'))
+    app.config['SSE_LISTEN_URI'] = os.getenv('SSE_LISTEN_URI')  # Conexão direta (sem PgBouncer) para LISTEN
+    # Cada stream prende uma thread do gthread: por padrão metade delas fica para o resto da API
+    app.config['SSE_MAX_CONEXOES'] = int(
+        os.getenv('SSE_MAX_CONEXOES', max(1, int(os.getenv('GUNICORN_THREADS', '4')) // 2))
+    )
 
-    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'fallback-secret-key-change-this')
+    # Profiling de SQL por requisição (opt-in) e registro de requisições lentas
+    app.config['SQL_PROFILING'] = os.getenv('SQL_PROFILING', '').strip().lower() in ('1', 'true', 'sim', 'yes')
+    app.config['SQL_SLOW_REQUEST_MS'] = float(os.getenv('SQL_SLOW_REQUEST_MS', '500'))
+    app.config['SQL_SLOW_SAMPLE_RATE'] = float(os.getenv('SQL_SLOW_SAMPLE_RATE', '1.0'))
+    app.config['SQL_SLOW_BUFFER'] = int(os.getenv('SQL_SLOW_BUFFER', '200'))
+    app.config['SQL_SLOW_LOG'] = os.getenv('SQL_SLOW_LOG')  # Ex.: logs/consultas_lentas.log (rotativo)
+
+    # Limite de requisições por usuário e classe de rota (token bucket); Redis em ARMAZENAMENTO_URL para vários nós
+    app.config['LIMITES_ATIVOS'] = os.getenv('LIMITES_ATIVOS', 'true').strip().lower() in ('1', 'true', 'sim', 'yes')
+    app.config['LIMITES'] = {
+        classe: os.getenv(f'LIMITE_{classe.upper()}', padrao) for classe, padrao in LIMITES_PADRAO.items()
+    }
+    app.config['ARMAZENAMENTO_URL'] = os.getenv('ARMAZENAMENTO_URL')
 
     # Configuração do CORS - Permite requisições do frontend
     app.config['CORS_HEADERS'] = 'Content-Type'
@@ -34,10 +58,13 @@ def create_app():
     }
 
     # Inicializa as extensões com o app configurado
-    db.init_app(app)
+    configurar_banco(app, perfil)
     jwt.init_app(app)
     swagger.init_app(app)
     migrate.init_app(app, db)
+    broker.init_app(app)
+    profiler.init_app(app)
+    limitador.init_app(app)
 
     # Configura CORS com as origens do .env
     if cors_origins == '*':
@@ -52,9 +79,13 @@ def create_app():
             # Importar rotas aqui para registrar Blueprints
             from .routes import bp as main_bp
             from .auth import bp as auth_bp
+            from .admin import bp as admin_bp
+            from .painel import bp as painel_bp
 
             app.register_blueprint(main_bp)
             app.register_blueprint(auth_bp)
+            app.register_blueprint(admin_bp)
+            app.register_blueprint(painel_bp)
 
             print("✅ Blueprints registrados com sucesso")
         except Exception as e:
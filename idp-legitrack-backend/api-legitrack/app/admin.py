@@ -0,0 +1,102 @@
+from functools import wraps
+import hmac
+import os
+from flask import Blueprint, current_app, jsonify, request
+from .extensions import db, limitador, profiler
+from .pool import configuracao_pool, estatisticas_pool
+
+bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+# ============================================================================
+# AUTENTICAÇÃO OPERACIONAL
+# ============================================================================
+
+def admin_required(fn):
+    """
+    Rotas operacionais exigem o header X-Admin-Token igual a ADMIN_TOKEN.
+    Sem ADMIN_TOKEN configurado as rotas simplesmente não existem (404).
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        esperado = os.getenv('ADMIN_TOKEN')
+        if not esperado:
+            return jsonify({"erro": "Não encontrado"}), 404
+        recebido = request.headers.get('X-Admin-Token', '')
+        if not hmac.compare_digest(recebido, esperado):
+            return jsonify({"erro": "Não autorizado"}), 401
+        return fn(*args, **kwargs)
+    return wrapper
+
+# ============================================================================
+# ROTAS DE TELEMETRIA
+# ============================================================================
+
+@bp.route("/pool", methods=["GET"])
+@admin_required
+def telemetria_pool():
+    """
+    Telemetria do pool de conexões deste processo
+    ---
+    tags:
+      - Administração
+    parameters:
+      - name: X-Admin-Token
+        in: header
+        type: string
+        required: true
+    responses:
+      200:
+        description: Configuração efetiva e contadores do pool (checkouts, espera, overflow, timeouts)
+    """
+    perfil = current_app.config['DB_PERFIL']
+    return jsonify({
+        "pid": os.getpid(),
+        "perfil": perfil,
+        "configuracao": configuracao_pool(perfil),
+        "metricas": estatisticas_pool(db.engine)
+    }), 200
+
+@bp.route("/consultas-lentas", methods=["GET"])
+@admin_required
+def consultas_lentas():
+    """
+    Requisições lentas amostradas por este processo (mais recentes primeiro)
+    ---
+    tags:
+      - Administração
+    parameters:
+      - name: X-Admin-Token
+        in: header
+        type: string
+        required: true
+    responses:
+      200:
+        description: Endpoint, usuário, tempo de banco e impressões digitais do SQL de cada requisição lenta
+    """
+    return jsonify({
+        "pid": os.getpid(),
+        "profiling_ativo": bool(current_app.config.get('SQL_PROFILING')),
+        "limite_ms": current_app.config.get('SQL_SLOW_REQUEST_MS'),
+        "requisicoes": list(reversed(profiler.lentas))
+    }), 200
+
+@bp.route("/limites", methods=["GET"])
+@admin_required
+def limites_requisicoes():
+    """
+    Limites de requisições em vigor e usuários/IPs mais limitados
+    ---
+    tags:
+      - Administração
+    parameters:
+      - name: X-Admin-Token
+        in: header
+        type: string
+        required: true
+    responses:
+      200:
+        description: >
+          Capacidade e reposição de cada classe de rota e quem recebeu mais 429.
+          Com o armazenamento em memória os contadores são deste processo.
+    """
+    return jsonify({"pid": os.getpid(), **limitador.resumo()}), 200
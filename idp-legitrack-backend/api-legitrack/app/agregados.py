@@ -0,0 +1,136 @@
+"""
+Agregados de atividade legislativa para o painel (app.painel).
+
+As rotas do painel não leem rl_tramitacoes: leem dois agregados pequenos,
+indexados por dia:
+
+  - camara.tb_atividade_diaria: tramitações por dia × situação × tema, mais
+    uma linha com id_tema = 0 (total) por dia × situação;
+  - camara.tb_atividade_orgao: tramitações por dia × órgão onde cada uma
+    aconteceu (rl_tramitacoes.sigla_orgao, o siglaOrgao da própria tramitação
+    na API, não o órgão atual do projeto).
+
+Tramitações gravadas antes de rl_tramitacoes ter sigla_orgao ficam sem órgão e
+não entram em tb_atividade_orgao até uma carga em lote trazê-las de novo: o
+merge preenche a coluna e acumular_orgaos() soma só essas ao agregado.
+
+O worker chama acumular_tramitacoes() na mesma transação em que grava as
+tramitações novas de um projeto (depois dos temas, que entram no tema do
+agregado); a carga em lote faz o mesmo com as tramitações que o merge inseriu.
+reconstruir() refaz tudo a partir do histórico (instalação e carga inicial).
+
+Uso:
+    python -m app.agregados                 # cria as tabelas; reconstrói se estiverem vazias
+    python -m app.agregados --reconstruir   # reconstrói a partir de rl_tramitacoes
+"""
+import argparse
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex, CreateTable
+from .banco import db
+from .models import TB_AtividadeDiaria, TB_AtividadeOrgao
+
+TABELAS = [TB_AtividadeDiaria.__table__, TB_AtividadeOrgao.__table__]
+
+# {origem}: de onde vêm as tramitações contadas (todas ou só os pares projeto/sequência informados)
+ORIGEM_TODAS = "camara.rl_tramitacoes t"
+ORIGEM_PARES = """
+    unnest(CAST(:ids_projetos AS integer[]), CAST(:sequencias AS integer[])) AS n(id_projeto, sequencia)
+    JOIN camara.rl_tramitacoes t ON t.id_projeto = n.id_projeto AND t.sequencia = n.sequencia
+"""
+
+SQL_DIARIA = """
+    WITH novas AS (
+        SELECT t.data_hora::date AS dia, t.id_situacao, p.ids_temas
+        FROM {origem}
+        JOIN camara.tb_projeto p ON p.id_projeto = t.id_projeto
+    )
+    INSERT INTO camara.tb_atividade_diaria (dia, id_situacao, id_tema, qtd_tramitacoes)
+    SELECT dia, id_situacao, id_tema, count(*)
+    FROM (
+        SELECT dia, id_situacao, 0 AS id_tema FROM novas
+        UNION ALL
+        SELECT dia, id_situacao, tema FROM novas, unnest(ids_temas) AS tema
+    ) x
+    GROUP BY dia, id_situacao, id_tema
+    ON CONFLICT (dia, id_situacao, id_tema) DO UPDATE
+    SET qtd_tramitacoes = camara.tb_atividade_diaria.qtd_tramitacoes + EXCLUDED.qtd_tramitacoes
+"""
+
+SQL_ORGAO = """
+    INSERT INTO camara.tb_atividade_orgao (dia, sigla_orgao, qtd_tramitacoes)
+    SELECT t.data_hora::date, t.sigla_orgao, count(*)
+    FROM {origem}
+    WHERE t.sigla_orgao IS NOT NULL
+    GROUP BY 1, 2
+    ON CONFLICT (dia, sigla_orgao) DO UPDATE
+    SET qtd_tramitacoes = camara.tb_atividade_orgao.qtd_tramitacoes + EXCLUDED.qtd_tramitacoes
+"""
+
+
+def instalar():
+    """Cria as tabelas de agregados, se faltarem. Retorna True se estavam vazias."""
+    with db.engine.begin() as conn:
+        # Bancos criados antes da coluna (o ALTER na tabela particionada vale para todas as partições)
+        conn.execute(text("ALTER TABLE camara.rl_tramitacoes ADD COLUMN IF NOT EXISTS sigla_orgao varchar(100)"))
+        for tabela in TABELAS:
+            conn.execute(CreateTable(tabela, if_not_exists=True))
+            for indice in tabela.indexes:
+                conn.execute(CreateIndex(indice, if_not_exists=True))
+        return not conn.execute(text("SELECT EXISTS (SELECT 1 FROM camara.tb_atividade_diaria)")).scalar()
+
+
+def _parametros(pares):
+    ids_projetos, sequencias = zip(*sorted(pares))
+    return {"ids_projetos": list(ids_projetos), "sequencias": list(sequencias)}
+
+
+def acumular_tramitacoes(pares):
+    """
+    Soma aos agregados as tramitações (id_projeto, sequencia) recém-inseridas.
+    Chamar uma única vez por tramitação, depois do flush. Não faz commit.
+    """
+    if not pares:
+        return 0
+    parametros = _parametros(pares)
+    db.session.execute(text(SQL_ORGAO.format(origem=ORIGEM_PARES)), parametros)
+    return db.session.execute(text(SQL_DIARIA.format(origem=ORIGEM_PARES)), parametros).rowcount
+
+
+def acumular_orgaos(pares):
+    """
+    Soma a tb_atividade_orgao tramitações antigas que acabaram de ganhar sigla_orgao
+    (já contadas em tb_atividade_diaria). Não faz commit.
+    """
+    if not pares:
+        return 0
+    return db.session.execute(text(SQL_ORGAO.format(origem=ORIGEM_PARES)), _parametros(pares)).rowcount
+
+
+def reconstruir():
+    """Refaz os agregados a partir de todo o histórico. Não faz commit. Retorna as linhas diárias geradas."""
+    db.session.execute(text(f"TRUNCATE {', '.join(tabela.fullname for tabela in TABELAS)}"))
+    db.session.execute(text(SQL_ORGAO.format(origem=ORIGEM_TODAS)))
+    return db.session.execute(text(SQL_DIARIA.format(origem=ORIGEM_TODAS))).rowcount
+
+
+if __name__ == "__main__":
+    from . import criar_app_dados
+
+    parser = argparse.ArgumentParser(description="Cria e reconstrói os agregados do painel.")
+    parser.add_argument("--reconstruir", action="store_true", help="Reconstrói mesmo se já houver dados")
+    args = parser.parse_args()
+
+    app = criar_app_dados('worker')
+    with app.app_context():
+        print("--- [AGREGADOS] INICIANDO ---")
+        vazias = instalar()
+        if vazias or args.reconstruir:
+            qtd = reconstruir()
+            db.session.commit()
+            for tabela in TABELAS:
+                db.session.execute(text(f"ANALYZE {tabela.fullname}"))
+            db.session.commit()
+            print(f"AGREGADOS: {qtd} linhas diárias geradas a partir do histórico.")
+        else:
+            print("AGREGADOS: Tabelas já populadas (use --reconstruir para refazer).")
+        print("--- [AGREGADOS] CONCLUÍDO ---")
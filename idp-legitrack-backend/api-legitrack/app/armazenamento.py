@@ -0,0 +1,188 @@
+"""
+Estado curto compartilhado pelas requisições: baldes do limitador (app.limites)
+e marcas com validade, como a lista de revogação de tokens (app.tokens).
+
+Dois backends com a mesma interface, escolhidos por ARMAZENAMENTO_URL:
+
+  - vazio: ArmazenamentoMemoria, um dicionário por processo. Serve para um
+    processo só (WEB_CONCURRENCY=1, scripts, cliente de teste); o gunicorn com
+    mais workers se recusa a subir sem ARMAZENAMENTO_URL;
+  - redis://...: ArmazenamentoRedis, compartilhado entre processos e nós. O
+    balde é atualizado atomicamente por um script Lua com o relógio do Redis.
+    O pacote redis é opcional e só é exigido quando este backend é usado.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:  # redis é opcional: sem ele só há o armazenamento em memória
+    redis = None
+
+# Chaves (baldes, contadores) mantidas pelo armazenamento em memória; as menos usadas saem primeiro
+MAX_CHAVES = 100_000
+
+
+class ArmazenamentoMemoria:
+
+    def __init__(self, max_chaves=MAX_CHAVES):
+        self.max_chaves = max_chaves
+        self._baldes = OrderedDict()
+        self._bloqueios = OrderedDict()
+        self._marcas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consumir(self, chave, capacidade, taxa):
+        """
+        Tira uma ficha do balde `chave` (capacidade fichas, reposição de `taxa` fichas/s).
+        Devolve (permitido, segundos até haver uma ficha).
+        """
+        with self._lock:
+            agora = time.monotonic()
+            fichas, antes = self._baldes.pop(chave, (capacidade, agora))
+            fichas = min(capacidade, fichas + (agora - antes) * taxa)
+            permitido = fichas >= 1
+            if permitido:
+                fichas -= 1
+            self._baldes[chave] = (fichas, agora)
+            # Balde descartado volta cheio: só acontece com os mais antigos, que já encheram de novo
+            while len(self._baldes) > self.max_chaves:
+                self._baldes.popitem(last=False)
+        return permitido, 0.0 if permitido else (1 - fichas) / taxa
+
+    def guardar(self, chave, validade, somente_se_ausente=False):
+        """
+        Grava a marca `chave` por `validade` segundos. Com somente_se_ausente, não
+        sobrescreve uma marca válida e devolve False; senão devolve True.
+        """
+        with self._lock:
+            agora = time.monotonic()
+            expira_em = self._marcas.pop(chave, None)
+            if somente_se_ausente and expira_em is not None and expira_em > agora:
+                self._marcas[chave] = expira_em
+                return False
+            self._marcas[chave] = agora + validade
+            if len(self._marcas) > self.max_chaves:
+                # Primeiro as vencidas; se não bastar, as mais antigas
+                for vencida in [c for c, expira in self._marcas.items() if expira <= agora]:
+                    del self._marcas[vencida]
+                while len(self._marcas) > self.max_chaves:
+                    self._marcas.popitem(last=False)
+            return True
+
+    def existe(self, *chaves):
+        """True se alguma das marcas existe e está válida."""
+        with self._lock:
+            agora = time.monotonic()
+            for chave in chaves:
+                expira_em = self._marcas.get(chave)
+                if expira_em is None:
+                    continue
+                if expira_em > agora:
+                    return True
+                del self._marcas[chave]
+        return False
+
+    def registrar_bloqueio(self, identidade, classe):
+        with self._lock:
+            qtd, _ = self._bloqueios.pop((identidade, classe), (0, None))
+            self._bloqueios[(identidade, classe)] = (qtd + 1, time.time())
+            while len(self._bloqueios) > self.max_chaves:
+                self._bloqueios.popitem(last=False)
+
+    def bloqueios(self, limite=50):
+        """Quem mais foi limitado: [{identidade, classe, qtd, ultimo}] em ordem decrescente."""
+        with self._lock:
+            itens = list(self._bloqueios.items())
+        itens.sort(key=lambda item: -item[1][0])
+        return [
+            {"identidade": identidade, "classe": classe, "qtd": qtd, "ultimo": int(ultimo)}
+            for (identidade, classe), (qtd, ultimo) in itens[:limite]
+        ]
+
+
+# KEYS[1] = balde; ARGV = capacidade, taxa. Devolve {permitido, espera em texto}
+SCRIPT_CONSUMIR = """
+local agora_redis = redis.call('TIME')
+local agora = tonumber(agora_redis[1]) + tonumber(agora_redis[2]) / 1000000
+local capacidade = tonumber(ARGV[1])
+local taxa = tonumber(ARGV[2])
+local balde = redis.call('HMGET', KEYS[1], 'fichas', 'em')
+local fichas = tonumber(balde[1]) or capacidade
+local antes = tonumber(balde[2]) or agora
+fichas = math.min(capacidade, fichas + (agora - antes) * taxa)
+local permitido = 0
+local espera = 0
+if fichas >= 1 then
+    fichas = fichas - 1
+    permitido = 1
+else
+    espera = (1 - fichas) / taxa
+end
+redis.call('HSET', KEYS[1], 'fichas', tostring(fichas), 'em', tostring(agora))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacidade / taxa) + 1)
+return {permitido, tostring(espera)}
+"""
+
+
+class ArmazenamentoRedis:
+
+    PREFIXO = "legitrack:"
+    # Contadores de bloqueio expiram se ninguém for limitado por este tempo
+    RETENCAO_BLOQUEIOS = 24 * 3600
+
+    def __init__(self, url):
+        if redis is None:
+            raise RuntimeError("ARMAZENAMENTO_URL aponta para o Redis, mas o pacote redis não está instalado")
+        self._cliente = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self._consumir = self._cliente.register_script(SCRIPT_CONSUMIR)
+
+    def consumir(self, chave, capacidade, taxa):
+        permitido, espera = self._consumir(keys=[self.PREFIXO + chave], args=[capacidade, taxa])
+        return bool(permitido), float(espera)
+
+    def guardar(self, chave, validade, somente_se_ausente=False):
+        return bool(self._cliente.set(
+            self.PREFIXO + chave, 1, ex=max(1, math.ceil(validade)), nx=somente_se_ausente
+        ))
+
+    def existe(self, *chaves):
+        return self._cliente.exists(*(self.PREFIXO + chave for chave in chaves)) > 0
+
+    def registrar_bloqueio(self, identidade, classe):
+        membro = f"{identidade}|{classe}"
+        pipe = self._cliente.pipeline()
+        pipe.zincrby(self.PREFIXO + "bloqueios", 1, membro)
+        pipe.hset(self.PREFIXO + "bloqueios:ultimo", membro, int(time.time()))
+        pipe.expire(self.PREFIXO + "bloqueios", self.RETENCAO_BLOQUEIOS)
+        pipe.expire(self.PREFIXO + "bloqueios:ultimo", self.RETENCAO_BLOQUEIOS)
+        pipe.execute()
+
+    def bloqueios(self, limite=50):
+        itens = self._cliente.zrevrange(self.PREFIXO + "bloqueios", 0, limite - 1, withscores=True)
+        if not itens:
+            return []
+        ultimos = self._cliente.hmget(self.PREFIXO + "bloqueios:ultimo", [membro for membro, _ in itens])
+        resultado = []
+        for (membro, qtd), ultimo in zip(itens, ultimos):
+            identidade, _, classe = membro.decode().rpartition("|")
+            resultado.append({
+                "identidade": identidade, "classe": classe, "qtd": int(qtd), "ultimo": int(ultimo or 0)
+            })
+        return resultado
+
+
+def criar_armazenamento(url=None):
+    """ArmazenamentoRedis para uma URL redis://, senão ArmazenamentoMemoria."""
+    if url and url.startswith(("redis://", "rediss://", "unix://")):
+        return ArmazenamentoRedis(url)
+    return ArmazenamentoMemoria()
+
+
+def armazenamento_do_app(app):
+    """O armazenamento do app (um por processo), criado no primeiro uso a partir de ARMAZENAMENTO_URL."""
+    if "armazenamento" not in app.extensions:
+        app.extensions["armazenamento"] = criar_armazenamento(app.config.get("ARMAZENAMENTO_URL"))
+    return app.extensions["armazenamento"]
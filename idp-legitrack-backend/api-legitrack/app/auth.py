@@ -1,10 +1,18 @@
 from flask import Blueprint, jsonify, request
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
 from .extensions import db
 from .models import TB_User
+from .senhas import SENHAS_ESPERA_VAGA, SenhasOcupadas, executor_senhas
+from .tokens import TokenReutilizado, emitir_par, revogar_familia, rotacionar
 
 bp = Blueprint('auth', __name__, url_prefix='/auth')
 
+def _senhas_ocupadas():
+    resposta = jsonify({"error": "Muitos logins simultâneos. Tente novamente em instantes."})
+    resposta.status_code = 503
+    resposta.headers["Retry-After"] = str(max(1, round(SENHAS_ESPERA_VAGA * 2)))
+    return resposta
+
 @bp.route('/registrar', methods=['POST'])
 def registrar():
     """
@@ -30,6 +38,8 @@ def registrar():
         description: Usuário criado com sucesso
       409:
         description: Usuário já existente
+      503:
+        description: Muitos cadastros/logins simultâneos
     """
     data = request.get_json()
     
@@ -38,7 +48,10 @@ def registrar():
         return jsonify({"error": "Usuário ou Email já cadastrados"}), 409
 
     user = TB_User(username=data["username"], email=data["email"])
-    user.set_password(data["password"])
+    try:
+        user.password_hash = executor_senhas.gerar(data["password"])
+    except SenhasOcupadas:
+        return _senhas_ocupadas()
     
     try:
         db.session.add(user)
@@ -68,19 +81,24 @@ def login():
               type: string
     responses:
       200:
-        description: Token gerado com sucesso
+        description: Tokens gerados com sucesso (access_token curto e refresh_token para /auth/refresh)
       401:
         description: Credenciais inválidas
+      503:
+        description: Muitos logins simultâneos
     """
     data = request.get_json()
     user = TB_User.query.filter_by(email=data.get("email")).first()
 
-    if user and user.check_password(data.get("password")):
-        # Cria o token JWT. A 'identity' é o ID do usuário (string)
-        access_token = create_access_token(identity=str(user.id))
-        
+    try:
+        senha_ok = user is not None and executor_senhas.verificar(user.password_hash, data.get("password"))
+    except SenhasOcupadas:
+        return _senhas_ocupadas()
+
+    if senha_ok:
+        # Cria o par de tokens JWT. A 'identity' é o ID do usuário (string)
         return jsonify({
-            "access_token": access_token,
+            **emitir_par(str(user.id)),
             "user": {
                 "id": user.id,
                 "username": user.username,
@@ -90,6 +108,48 @@ def login():
 
     return jsonify({"error": "Email ou senha inválidos"}), 401
 
+@bp.route('/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+def renovar_token():
+    """
+    Troca o refresh token por um par novo (sem refazer o login)
+    ---
+    tags:
+      - Autenticação
+    security:
+      - Bearer: []
+    description: >
+      Envie o refresh_token no header Authorization. Cada refresh token vale uma
+      vez só; reutilizar um já trocado revoga todos os tokens daquele login.
+    responses:
+      200:
+        description: Novo access_token e novo refresh_token
+      401:
+        description: Refresh token inválido, vencido, revogado ou já utilizado
+    """
+    try:
+        tokens = rotacionar(get_jwt())
+    except TokenReutilizado:
+        return jsonify({"error": "Refresh token já utilizado. Faça login novamente."}), 401
+    return jsonify(tokens), 200
+
+@bp.route('/logout', methods=['POST'])
+@jwt_required(verify_type=False)
+def logout():
+    """
+    Encerra a sessão, revogando o access e o refresh token do login
+    ---
+    tags:
+      - Autenticação
+    security:
+      - Bearer: []
+    responses:
+      200:
+        description: Sessão encerrada
+    """
+    revogar_familia(get_jwt())
+    return jsonify({"message": "Sessão encerrada"}), 200
+
 @bp.route('/me', methods=['GET'])
 @jwt_required()
 def get_current_user():
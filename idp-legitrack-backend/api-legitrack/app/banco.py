@@ -0,0 +1,79 @@
+"""
+Camada de dados para processos sem HTTP: engine, sessão e modelos.
+
+Worker, dispatcher, seeders e os scripts `python -m app.<módulo>` só precisam
+do banco. criar_app_dados() monta um Flask mínimo com o Flask-SQLAlchemy e o
+pool do perfil, sem Swagger, JWT, CORS, Migrate nem blueprints (e sem importar
+esses pacotes). create_app() aplica a mesma configuração de banco e acrescenta
+o resto da API.
+
+Uso:
+    from . import criar_app_dados, db, wait_for_db
+
+    app = criar_app_dados('worker')
+    app.app_context().push()
+    if not wait_for_db("WORKER"):
+        exit(1)
+"""
+import os
+import time
+
+from dotenv import load_dotenv
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from .pool import opcoes_engine, instalar_eventos
+
+db = SQLAlchemy()
+
+
+def configurar_banco(app, perfil):
+    """Configura o banco e o pool do perfil ('api' ou 'worker') e inicializa o Flask-SQLAlchemy."""
+    db_host = os.getenv('DB_HOST', 'db')
+    db_port = os.getenv('DB_PORT', '5432')
+    db_user = os.getenv('DB_USER', 'user')
+    db_password = os.getenv('DB_PASSWORD', 'password')
+    db_name = os.getenv('DB_NAME', 'legitrack_db')
+
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = opcoes_engine(perfil)
+    app.config['DB_PERFIL'] = perfil
+
+    db.init_app(app)
+    with app.app_context():
+        instalar_eventos(db.engine, perfil)
+
+
+def criar_app_dados(perfil='worker'):
+    """App só com o banco, para worker, seeders e scripts de manutenção."""
+    load_dotenv()
+    app = Flask(__name__)
+    configurar_banco(app, perfil)
+    # Os modelos entram no metadata do db (create_all, DDL dos scripts)
+    from . import models  # noqa: F401
+    return app
+
+
+def wait_for_db(prefixo="WORKER", tentativas=10, intervalo=5):
+    """Espera o banco responder (dentro de um app context). False se não responder a tempo."""
+    print(f"{prefixo}: Aguardando o banco de dados ficar pronto...")
+    for tentativa in range(1, tentativas + 1):
+        try:
+            db.session.execute(text('SELECT 1'))
+            db.session.rollback()
+            print(f"{prefixo}: Conexão com o banco de dados estabelecida!")
+            return True
+        except OperationalError:
+            db.session.rollback()
+            print(f"{prefixo}: Banco ainda não está pronto. Tentando novamente em {intervalo}s... "
+                  f"(Tentativa {tentativa}/{tentativas})")
+        except Exception as e:
+            db.session.rollback()
+            print(f"{prefixo}: Erro inesperado ao esperar pelo banco: {e}")
+        time.sleep(intervalo)
+
+    print(f"{prefixo}: ERRO CRÍTICO! Não foi possível conectar ao banco após {tentativas} tentativas.")
+    return False
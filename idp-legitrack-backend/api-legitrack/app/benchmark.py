@@ -0,0 +1,275 @@
+"""
+Teste de carga da API contra um banco populado com a massa sintética.
+
+Sobe a API normalmente (de preferência com gunicorn.conf.py e LIMITES_ATIVOS=false,
+senão o limitador de app.limites responde 429 no meio da medição) e rode:
+
+    python -m app.benchmark --url http://localhost:5000 --carregar --confirmar --escalas 0.1,1,10 \
+        --saida resultados/$(git rev-parse --short HEAD).json [--comparar resultados/anterior.json]
+
+--carregar popula o banco (APAGA os dados, veja app.sintetico) em cada escala antes de medir.
+Sem ele, mede uma única vez o banco atual, que precisa conter a massa sintética
+(usuários sintetico<n>@legitrack.test). Para cada cenário são reportados req/s,
+p50, p95 e p99 de latência; o JSON de --saida tem sempre as mesmas chaves para
+ser comparado entre versões com --comparar.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+from .sintetico import CONCENTRACAO_SEGUIDORES, EMAIL_PADRAO, SENHA_PADRAO, VOLUMES_BASE
+
+# Todas as rotas de routes.py e auth.py, exceto o stream SSE (conexão longa, sem latência por requisição).
+# Cada cenário recebe (sessão, url, ctx, rnd); ctx traz os volumes e os dados do usuário da sessão.
+CENARIOS = {
+    "POST /auth/login": lambda s, url, ctx, rnd: s.post(f"{url}/auth/login", json={
+        "email": ctx["email"], "password": SENHA_PADRAO
+    }),
+    "POST /auth/refresh": lambda s, url, ctx, rnd: _renovar(s, url, ctx),
+    "GET /auth/me": lambda s, url, ctx, rnd: s.get(f"{url}/auth/me"),
+    "POST /api/projetos": lambda s, url, ctx, rnd: s.post(f"{url}/api/projetos", json={}),
+    "POST /api/projetos (ids_temas)": lambda s, url, ctx, rnd: s.post(f"{url}/api/projetos", json={
+        "ids_temas": ctx["ids_temas"]
+    }),
+    "POST /api/projetos (facetas)": lambda s, url, ctx, rnd: s.post(f"{url}/api/projetos", json={
+        "ids_temas": ctx["ids_temas"], "facetas": True
+    }),
+    "POST /api/projetos (busca)": lambda s, url, ctx, rnd: s.post(f"{url}/api/projetos", json={
+        "busca": f"{rnd.randint(1, ctx['projetos'])}/"
+    }),
+    "GET /api/projetos/<id>": lambda s, url, ctx, rnd: s.get(f"{url}/api/projetos/{_projeto_popular(ctx, rnd)}"),
+    "POST /api/projetos/lote": lambda s, url, ctx, rnd: s.post(f"{url}/api/projetos/lote", json={
+        "ids": [_projeto_popular(ctx, rnd) for _ in range(50)]
+    }),
+    "GET /api/exportar (tema)": lambda s, url, ctx, rnd: s.get(f"{url}/api/exportar", params={
+        "formato": "ndjson", "tema": rnd.choice(ctx["ids_temas"] or [1])
+    }),
+    "GET /api/feed": lambda s, url, ctx, rnd: s.get(f"{url}/api/feed"),
+    "GET /api/favoritos": lambda s, url, ctx, rnd: s.get(f"{url}/api/favoritos"),
+    "POST /api/favoritar/<id>": lambda s, url, ctx, rnd: s.post(f"{url}/api/favoritar/{_projeto_popular(ctx, rnd)}"),
+    "POST /api/favoritos/lote": lambda s, url, ctx, rnd: s.post(f"{url}/api/favoritos/lote", json={
+        "adicionar": [_projeto_popular(ctx, rnd) for _ in range(10)]
+    }),
+    "GET /api/temas": lambda s, url, ctx, rnd: s.get(f"{url}/api/temas"),
+    "GET /api/usuario/interesses": lambda s, url, ctx, rnd: s.get(f"{url}/api/usuario/interesses"),
+    "POST /api/usuario/interesses": lambda s, url, ctx, rnd: s.post(f"{url}/api/usuario/interesses", json={
+        "ids_temas": ctx["ids_temas"]
+    }),
+    "GET /api/notificacoes": lambda s, url, ctx, rnd: s.get(f"{url}/api/notificacoes"),
+    "POST /api/notificacoes/<id>/ler": lambda s, url, ctx, rnd: s.post(
+        f"{url}/api/notificacoes/{rnd.choice(ctx['ids_notificacoes'] or [0])}/ler"
+    ),
+    "GET /api/sync": lambda s, url, ctx, rnd: s.get(f"{url}/api/sync", params={"since": ctx["token_sync"]}),
+}
+
+
+def _projeto_popular(ctx, rnd):
+    """Mesma concentração da massa sintética: os acessos também se concentram nos projetos populares."""
+    return 1 + int(rnd.random() ** CONCENTRACAO_SEGUIDORES * ctx["projetos"])
+
+
+def _renovar(s, url, ctx):
+    """
+    Troca o refresh token da thread por um novo. Cada refresh vale uma vez só,
+    então cada thread mantém a própria cadeia (ctx é por thread), iniciada por um login.
+    """
+    if "refresh_token" not in ctx:
+        login = s.post(f"{url}/auth/login", json={"email": ctx["email"], "password": SENHA_PADRAO})
+        if login.status_code >= 400:
+            return login
+        ctx["refresh_token"] = login.json()["refresh_token"]
+    resp = s.post(f"{url}/auth/refresh", headers={"Authorization": f"Bearer {ctx['refresh_token']}"})
+    if resp.status_code < 400:
+        ctx["refresh_token"] = resp.json()["refresh_token"]
+    return resp
+
+
+def _percentil(valores_ordenados, p):
+    if not valores_ordenados:
+        return 0.0
+    indice = max(0, math.ceil(p / 100 * len(valores_ordenados)) - 1)
+    return valores_ordenados[indice]
+
+
+def autenticar(url, qtd_usuarios):
+    """
+    Faz login com os primeiros usuários sintéticos e devolve, para cada um, o
+    token e os ids usados pelos cenários (temas seguidos e notificações).
+    """
+    usuarios = []
+    for n in range(1, qtd_usuarios + 1):
+        email = EMAIL_PADRAO.replace("{n}", str(n))
+        resp = requests.post(f"{url}/auth/login", json={"email": email, "password": SENHA_PADRAO}, timeout=30)
+        resp.raise_for_status()
+        token = resp.json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        interesses = requests.get(f"{url}/api/usuario/interesses", headers=headers, timeout=30).json()
+        notificacoes = requests.get(f"{url}/api/notificacoes", headers=headers, timeout=30).json()
+        # Token do momento do login: o cenário de sync mede a retomada do app logo depois
+        token_sync = requests.get(f"{url}/api/sync", headers=headers, timeout=30).json()["token"]
+        usuarios.append({
+            "token": token,
+            "email": email,
+            "ids_temas": [i["id_tema"] for i in interesses],
+            "ids_notificacoes": [n["id"] for n in notificacoes],
+            "token_sync": token_sync,
+        })
+    return usuarios
+
+
+def executar_cenario(url, chamada, usuarios, ctx, duracao, concorrencia):
+    latencias = []
+    erros = [0]
+    limitadas = [0]
+    lock = threading.Lock()
+    fim = time.perf_counter() + duracao
+
+    def trabalhador(indice):
+        rnd = random.Random(indice)
+        usuario = usuarios[indice % len(usuarios)]
+        ctx_usuario = {**ctx, **usuario}
+        sessao = requests.Session()
+        sessao.headers["Authorization"] = f"Bearer {usuario['token']}"
+        minhas, meus_erros, minhas_limitadas = [], 0, 0
+        while time.perf_counter() < fim:
+            inicio = time.perf_counter()
+            try:
+                resp = chamada(sessao, url, ctx_usuario, rnd)
+                ok = resp.status_code < 400
+                minhas_limitadas += resp.status_code == 429
+            except requests.RequestException:
+                ok = False
+            if ok:
+                minhas.append(time.perf_counter() - inicio)
+            else:
+                meus_erros += 1
+        with lock:
+            latencias.extend(minhas)
+            erros[0] += meus_erros
+            limitadas[0] += minhas_limitadas
+
+    threads = [threading.Thread(target=trabalhador, args=(i,)) for i in range(concorrencia)]
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    decorrido = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        "requisicoes": len(latencias),
+        "erros": erros[0],
+        "limitadas": limitadas[0],  # 429 do limitador (também contadas em erros)
+        "req_s": round(len(latencias) / decorrido, 1),
+        "p50_ms": round(_percentil(latencias, 50) * 1000, 2),
+        "p95_ms": round(_percentil(latencias, 95) * 1000, 2),
+        "p99_ms": round(_percentil(latencias, 99) * 1000, 2),
+    }
+
+
+def executar(url, ctx, duracao, concorrencia, qtd_usuarios, cenarios=None):
+    usuarios = autenticar(url, qtd_usuarios)
+    resultados = {}
+    for nome, chamada in CENARIOS.items():
+        if cenarios and nome not in cenarios:
+            continue
+        print(f"BENCHMARK: {nome} ({concorrencia} conexões, {duracao}s)...")
+        resultados[nome] = executar_cenario(url, chamada, usuarios, ctx, duracao, concorrencia)
+        r = resultados[nome]
+        print(f"BENCHMARK:   {r['req_s']} req/s | p50 {r['p50_ms']} ms | p95 {r['p95_ms']} ms | "
+              f"p99 {r['p99_ms']} ms | erros {r['erros']}")
+    return resultados
+
+
+def versao_codigo():
+    """Identifica a versão medida: variável LEGITRACK_VERSAO ou o commit atual do git."""
+    if os.getenv("LEGITRACK_VERSAO"):
+        return os.getenv("LEGITRACK_VERSAO")
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecida"
+
+
+def comparar(atual, anterior):
+    """Imprime a variação de p99 e req/s de cada cenário presente nos dois arquivos."""
+    print(f"BENCHMARK: Comparando {atual['versao']} com {anterior['versao']}")
+    for escala, medicao in atual["escalas"].items():
+        base = anterior.get("escalas", {}).get(escala)
+        if not base:
+            continue
+        for nome, r in medicao["resultados"].items():
+            b = base["resultados"].get(nome)
+            if not b or not b["p99_ms"] or not b["req_s"]:
+                continue
+            delta_p99 = (r["p99_ms"] - b["p99_ms"]) / b["p99_ms"] * 100
+            delta_req = (r["req_s"] - b["req_s"]) / b["req_s"] * 100
+            print(f"BENCHMARK:   escala {escala} | {nome}: p99 {delta_p99:+.1f}% | req/s {delta_req:+.1f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Teste de carga da API Legitrack.")
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--duracao", type=float, default=20, help="Segundos por cenário")
+    parser.add_argument("--concorrencia", type=int, default=16, help="Conexões simultâneas")
+    parser.add_argument("--usuarios", type=int, default=20, help="Quantos usuários sintéticos distintos usar")
+    parser.add_argument("--escalas", default="1", help="Escalas da massa sintética, separadas por vírgula (ex.: 0.1,1,10)")
+    parser.add_argument("--cenarios", help="Nomes de cenários separados por ';' (padrão: todos)")
+    parser.add_argument("--carregar", action="store_true", help="Popula o banco com a massa sintética antes de cada escala")
+    parser.add_argument("--confirmar", action="store_true", help="Confirma que o banco é descartável")
+    parser.add_argument("--saida", help="Arquivo JSON para gravar os resultados")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args()
+
+    escalas = [float(e) for e in args.escalas.split(",")]
+    cenarios = args.cenarios.split(";") if args.cenarios else None
+
+    if args.carregar and not args.confirmar:
+        print("BENCHMARK: --carregar APAGA os dados do banco. Use --confirmar em um banco descartável.")
+        sys.exit(2)
+    if not args.carregar and len(escalas) > 1:
+        print("BENCHMARK: Várias escalas exigem --carregar (o banco só contém uma massa por vez).")
+        sys.exit(2)
+
+    relatorio = {
+        "versao": versao_codigo(),
+        "quando": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "url": args.url,
+        "concorrencia": args.concorrencia,
+        "duracao": args.duracao,
+        "usuarios": args.usuarios,
+        "escalas": {},
+    }
+    for escala in escalas:
+        volumes = {nome: max(1, int(qtd * escala)) for nome, qtd in VOLUMES_BASE.items()}
+        if args.carregar:
+            from . import criar_app_dados
+            from .sintetico import popular
+
+            app = criar_app_dados('worker')
+            with app.app_context():
+                volumes = popular(escala)
+
+        print(f"BENCHMARK: === Escala {escala} ===")
+        relatorio["escalas"][str(escala)] = {
+            "volumes": volumes,
+            "resultados": executar(args.url, volumes, args.duracao, args.concorrencia, args.usuarios, cenarios),
+        }
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"BENCHMARK: Resultados gravados em {args.saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            comparar(relatorio, json.load(f))
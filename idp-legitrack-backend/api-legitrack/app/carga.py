@@ -0,0 +1,336 @@
+"""
+Caminho de carga em massa de projetos (carga inicial dos seeders).
+
+Em vez de um INSERT (e um commit) por projeto, as linhas vindas da API da
+Câmara são acumuladas em CSV na memória e enviadas com COPY FROM STDIN para
+tabelas de staging UNLOGGED. A cada CARGA_PROJETOS_POR_MERGE projetos (e no
+fim) cada tabela real recebe um único statement set-based (upsert para
+tb_projeto, anti-join NOT EXISTS para rl_tramitacoes e rl_temas) e a staging é
+esvaziada. Cada merge é um checkpoint: se a carga cair, o que já foi mesclado
+fica gravado e só os projetos desde o último merge precisam ser baixados de
+novo (rodar de novo é seguro, os merges ignoram o que já existe). A staging
+não serve de ponto de retomada: é esvaziada ao iniciar e, sendo UNLOGGED, o
+Postgres a esvazia num crash. Se o primeiro merge encontrar tb_projeto vazia,
+os índices secundários dessas tabelas são removidos antes dele e recriados
+depois; os seguintes mantêm os índices.
+Tramitações que já existiam sem sigla_orgao recebem o órgão vindo da API.
+As partições anuais de rl_tramitacoes dos anos carregados são criadas antes
+do merge (app.particoes).
+
+Uso (dentro de um app context):
+
+    carga = CargaEmLote()
+    with ThreadPoolExecutor(SEED_THREADS) as executor:
+        for detalhes in executor.map(buscar_detalhes_projeto, resumos):
+            if detalhes:
+                carga.adicionar_da_api(*detalhes)
+    carga.aplicar()
+"""
+import csv
+import io
+import os
+import time
+from datetime import datetime
+import requests
+from sqlalchemy import text
+from .banco import db
+from .agregados import acumular_orgaos, acumular_tramitacoes, reconstruir as reconstruir_agregados
+from .feed import atualizar_feed_projetos
+from .indices import ddl_indice
+from .particoes import preparar_historico_tramitacoes
+from .resumos import atualizar_resumos
+from .models import RL_Tramitacoes, TB_Projeto, rel_temas
+
+# Linhas acumuladas antes de cada COPY (limita a memória do buffer CSV)
+LINHAS_POR_COPY = 50_000
+
+# Projetos acumulados na staging antes de cada merge (checkpoint da carga)
+CARGA_PROJETOS_POR_MERGE = int(os.getenv('CARGA_PROJETOS_POR_MERGE', '2000'))
+
+# Downloads simultâneos de tramitações/temas nos seeders (a API da Câmara limita abusos: seja gentil)
+SEED_THREADS = int(os.getenv('SEED_THREADS', '8'))
+
+URL_PROPOSICAO = "https://dadosabertos.camara.leg.br/api/v2/proposicoes/{id}/{recurso}"
+
+# Tabela de staging -> colunas, na ordem do CSV
+STAGING = {
+    "camara.stg_projeto": (
+        "id_projeto", "titulo_projeto", "descricao", "ano_inicio", "data_hora",
+        "sigla_orgao", "despacho", "id_ultima_situacao", "id_ultima_tramitacao",
+    ),
+    "camara.stg_tramitacoes": ("id_projeto", "sequencia", "data_hora", "id_situacao", "id_tramitacao", "sigla_orgao"),
+    "camara.stg_temas": ("id_projeto", "id_tema"),
+}
+
+SQL_CRIAR_STAGING = [
+    text("""
+        CREATE UNLOGGED TABLE IF NOT EXISTS camara.stg_projeto (
+            id_projeto integer, titulo_projeto text, descricao text, ano_inicio varchar(4),
+            data_hora timestamp, sigla_orgao varchar(100), despacho text,
+            id_ultima_situacao integer, id_ultima_tramitacao integer
+        )
+    """),
+    text("""
+        CREATE UNLOGGED TABLE IF NOT EXISTS camara.stg_tramitacoes (
+            id_projeto integer, sequencia integer, data_hora timestamp,
+            id_situacao integer, id_tramitacao integer, sigla_orgao varchar(100)
+        )
+    """),
+    # Staging criada antes de sigla_orgao existir
+    text("ALTER TABLE camara.stg_tramitacoes ADD COLUMN IF NOT EXISTS sigla_orgao varchar(100)"),
+    text("CREATE UNLOGGED TABLE IF NOT EXISTS camara.stg_temas (id_projeto integer, id_tema integer)"),
+]
+
+# Último registro de cada projeto vence; campos de status só mudam se a API trouxe tramitações
+SQL_MERGE_PROJETOS = text("""
+    INSERT INTO camara.tb_projeto (
+        id_projeto, titulo_projeto, descricao, ano_inicio, data_hora,
+        sigla_orgao, despacho, id_ultima_situacao, id_ultima_tramitacao
+    )
+    SELECT DISTINCT ON (s.id_projeto)
+           s.id_projeto, s.titulo_projeto, s.descricao, s.ano_inicio, s.data_hora,
+           s.sigla_orgao, s.despacho, sit.id_situacao, tra.id_tramitacao
+    FROM camara.stg_projeto s
+    LEFT JOIN camara.tp_situacao sit ON sit.id_situacao = s.id_ultima_situacao
+    LEFT JOIN camara.tp_tramitacao tra ON tra.id_tramitacao = s.id_ultima_tramitacao
+    ORDER BY s.id_projeto, s.ctid DESC
+    ON CONFLICT (id_projeto) DO UPDATE SET
+        titulo_projeto = EXCLUDED.titulo_projeto,
+        descricao = EXCLUDED.descricao,
+        ano_inicio = EXCLUDED.ano_inicio,
+        data_hora = COALESCE(EXCLUDED.data_hora, camara.tb_projeto.data_hora),
+        sigla_orgao = COALESCE(EXCLUDED.sigla_orgao, camara.tb_projeto.sigla_orgao),
+        despacho = COALESCE(EXCLUDED.despacho, camara.tb_projeto.despacho),
+        id_ultima_situacao = COALESCE(EXCLUDED.id_ultima_situacao, camara.tb_projeto.id_ultima_situacao),
+        id_ultima_tramitacao = COALESCE(EXCLUDED.id_ultima_tramitacao, camara.tb_projeto.id_ultima_tramitacao)
+    RETURNING id_projeto
+""")
+
+# Só entram tramitações com códigos conhecidos (FK) e que ainda não existem (id_projeto, sequencia)
+SQL_MERGE_TRAMITACOES = text("""
+    INSERT INTO camara.rl_tramitacoes (id_projeto, sequencia, data_hora, id_situacao, id_tramitacao, sigla_orgao)
+    SELECT DISTINCT ON (s.id_projeto, s.sequencia)
+           s.id_projeto, s.sequencia, s.data_hora, s.id_situacao, s.id_tramitacao, s.sigla_orgao
+    FROM camara.stg_tramitacoes s
+    JOIN camara.tb_projeto p ON p.id_projeto = s.id_projeto
+    JOIN camara.tp_situacao sit ON sit.id_situacao = s.id_situacao
+    JOIN camara.tp_tramitacao tra ON tra.id_tramitacao = s.id_tramitacao
+    WHERE NOT EXISTS (
+        SELECT 1 FROM camara.rl_tramitacoes t
+        WHERE t.id_projeto = s.id_projeto AND t.sequencia = s.sequencia
+    )
+    ORDER BY s.id_projeto, s.sequencia
+    RETURNING id_projeto, sequencia
+""")
+
+# Tramitações já gravadas sem órgão (anteriores à coluna) recebem o da API
+SQL_PREENCHER_ORGAOS = text("""
+    UPDATE camara.rl_tramitacoes t
+    SET sigla_orgao = s.sigla_orgao
+    FROM (
+        SELECT DISTINCT ON (id_projeto, sequencia) id_projeto, sequencia, sigla_orgao
+        FROM camara.stg_tramitacoes
+        WHERE sigla_orgao IS NOT NULL
+        ORDER BY id_projeto, sequencia
+    ) s
+    WHERE t.id_projeto = s.id_projeto AND t.sequencia = s.sequencia AND t.sigla_orgao IS NULL
+    RETURNING t.id_projeto, t.sequencia
+""")
+
+SQL_MERGE_TEMAS = text("""
+    INSERT INTO camara.rl_temas (id_projeto, id_tema)
+    SELECT DISTINCT s.id_projeto, s.id_tema
+    FROM camara.stg_temas s
+    JOIN camara.tb_projeto p ON p.id_projeto = s.id_projeto
+    JOIN camara.tp_temas tm ON tm.id_tema = s.id_tema
+    WHERE NOT EXISTS (
+        SELECT 1 FROM camara.rl_temas rt
+        WHERE rt.id_projeto = s.id_projeto AND rt.id_tema = s.id_tema
+    )
+""")
+
+# Tabelas cujos índices secundários são recriados numa carga inicial
+TABELAS_CARGA = (TB_Projeto.__table__, RL_Tramitacoes.__table__, rel_temas)
+
+
+def buscar_detalhes_projeto(resumo, tentativas=3):
+    """
+    Baixa tramitações e temas de um projeto. Só faz rede (seguro em threads);
+    retorna (resumo, tramitacoes, temas) ou None se a API falhar em todas as tentativas.
+    """
+    id_projeto = resumo.get("id")
+    for tentativa in range(tentativas):
+        try:
+            detalhes = []
+            for recurso in ("tramitacoes", "temas"):
+                resposta = requests.get(URL_PROPOSICAO.format(id=id_projeto, recurso=recurso), timeout=10)
+                resposta.raise_for_status()
+                detalhes.append([item for item in resposta.json().get("dados", []) if isinstance(item, dict)])
+            return resumo, detalhes[0], detalhes[1]
+        except (requests.RequestException, ValueError) as e:
+            print(f"CARGA: [ERRO REDE] Projeto {id_projeto}, tentativa {tentativa + 1}: {e}")
+            time.sleep(2)
+    return None
+
+
+def _data(valor):
+    return datetime.fromisoformat(valor) if valor else None
+
+
+def _inteiro(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+class CargaEmLote:
+    """Acumula linhas de projetos, tramitações e temas e as aplica com COPY + merge set-based."""
+
+    def __init__(self, projetos_por_merge=CARGA_PROJETOS_POR_MERGE):
+        self._buffers = {tabela: io.StringIO() for tabela in STAGING}
+        self._escritores = {tabela: csv.writer(buffer) for tabela, buffer in self._buffers.items()}
+        self._pendentes = 0
+        self.enviadas = {tabela: 0 for tabela in STAGING}
+        self.projetos_por_merge = projetos_por_merge
+        self._projetos_na_staging = 0
+        self.resultado = {"projetos": 0, "tramitacoes": 0, "temas": 0}
+        self._preparar_staging()
+
+    def _preparar_staging(self):
+        for ddl in SQL_CRIAR_STAGING:
+            db.session.execute(ddl)
+        db.session.execute(text(f"TRUNCATE {', '.join(STAGING)}"))
+        db.session.commit()
+
+    def _adicionar(self, tabela, linha):
+        # CSV do COPY: campo vazio sem aspas = NULL
+        self._escritores[tabela].writerow(["" if v is None else v for v in linha])
+        self.enviadas[tabela] += 1
+        self._pendentes += 1
+        if self._pendentes >= LINHAS_POR_COPY:
+            self.enviar()
+
+    def adicionar_da_api(self, resumo, tramitacoes_api, temas_api):
+        """Converte as respostas da API de um projeto (resumo, /tramitacoes, /temas) em linhas de staging."""
+        id_projeto = int(resumo["id"])
+        ultima = tramitacoes_api[-1] if tramitacoes_api else {}
+        self._projetos_na_staging += 1
+        self._adicionar("camara.stg_projeto", (
+            id_projeto,
+            resumo.get("ementa"),
+            f"{resumo.get('siglaTipo')} {resumo.get('numero')}/{resumo.get('ano')}",
+            str(resumo.get("ano")),
+            _data(ultima.get("dataHora")),
+            ultima.get("siglaOrgao"),
+            ultima.get("despacho"),
+            _inteiro(ultima.get("codSituacao")),
+            _inteiro(ultima.get("codTipoTramitacao")),
+        ))
+
+        for tram in tramitacoes_api:
+            try:
+                self._adicionar("camara.stg_tramitacoes", (
+                    id_projeto,
+                    int(tram["sequencia"]),
+                    datetime.fromisoformat(tram["dataHora"]),
+                    int(tram["codSituacao"]),
+                    int(tram["codTipoTramitacao"]),
+                    tram.get("siglaOrgao"),
+                ))
+            except (ValueError, TypeError, KeyError):
+                pass  # Mesmo critério dos seeders: item malformado é ignorado
+
+        for tema in temas_api:
+            id_tema = _inteiro(tema.get("cod")) if isinstance(tema, dict) else None
+            if id_tema is not None:
+                self._adicionar("camara.stg_temas", (id_projeto, id_tema))
+
+        if self._projetos_na_staging >= self.projetos_por_merge:
+            self._mesclar()
+
+    def enviar(self):
+        """Descarrega os buffers nas tabelas de staging via COPY FROM STDIN."""
+        if not self._pendentes:
+            return
+        cursor = db.session.connection().connection.cursor()
+        try:
+            for tabela, buffer in self._buffers.items():
+                if not buffer.tell():
+                    continue
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f"COPY {tabela} ({', '.join(STAGING[tabela])}) FROM STDIN WITH (FORMAT csv)", buffer
+                )
+                buffer.seek(0)
+                buffer.truncate()
+        finally:
+            cursor.close()
+        db.session.commit()
+        self._pendentes = 0
+
+    def _indices_secundarios(self):
+        return [indice for tabela in TABELAS_CARGA for indice in sorted(tabela.indexes, key=lambda i: i.name)]
+
+    def aplicar(self, recriar_indices=None):
+        """
+        Mescla o que restou na staging (último checkpoint).
+        recriar_indices=None decide sozinho: só remove/recria índices se tb_projeto estiver vazia.
+        Retorna a quantidade de linhas inseridas/atualizadas por tabela na carga inteira.
+        """
+        if self._projetos_na_staging:
+            self._mesclar(recriar_indices)
+        return self.resultado
+
+    def _mesclar(self, recriar_indices=None):
+        """
+        Mescla a staging nas tabelas reais (um statement por tabela), atualiza resumos, agregados
+        e feed e esvazia a staging. Tudo isso numa transação só (as partições vêm antes, em outra).
+        """
+        self.enviar()
+        # O histórico vai para as partições anuais dos seus anos, não para a DEFAULT
+        mais_antiga = db.session.scalar(text("SELECT min(data_hora) FROM camara.stg_tramitacoes"))
+        preparar_historico_tramitacoes(mais_antiga.date() if mais_antiga else None)
+
+        if recriar_indices is None:
+            recriar_indices = db.session.scalar(text("SELECT NOT EXISTS (SELECT 1 FROM camara.tb_projeto)"))
+
+        indices = self._indices_secundarios() if recriar_indices else []
+        for indice in indices:
+            print(f"CARGA: Removendo índice {indice.name} durante a carga...")
+            db.session.execute(text(f"DROP INDEX IF EXISTS {indice.table.schema}.{indice.name}"))
+
+        ids_projetos = db.session.scalars(SQL_MERGE_PROJETOS).all()
+        # Antes do merge: só as tramitações que já existiam ganham órgão aqui
+        preenchidas = db.session.execute(SQL_PREENCHER_ORGAOS).all()
+        tramitacoes = db.session.execute(SQL_MERGE_TRAMITACOES).all()
+        resultado = {
+            "projetos": len(ids_projetos),
+            "tramitacoes": len(tramitacoes),
+            "temas": db.session.execute(SQL_MERGE_TEMAS).rowcount,
+        }
+
+        for indice in indices:
+            print(f"CARGA: Recriando índice {indice.name}...")
+            db.session.execute(text(ddl_indice(indice, db.engine.dialect, concorrente=False)))
+
+        atualizar_resumos(ids_projetos)
+        # Carga inicial (banco vazio): um agregado só sobre o histórico em vez de somar par a par
+        if recriar_indices:
+            reconstruir_agregados()
+        else:
+            acumular_tramitacoes(tramitacoes)
+            acumular_orgaos(preenchidas)
+        atualizar_feed_projetos(ids_projetos)
+        db.session.execute(text(f"TRUNCATE {', '.join(STAGING)}"))
+        db.session.commit()
+        self._projetos_na_staging = 0
+
+        for tabela in TABELAS_CARGA:
+            db.session.execute(text(f"ANALYZE {tabela.fullname}"))
+        db.session.commit()
+
+        for chave, qtd in resultado.items():
+            self.resultado[chave] += qtd
+        print(f"CARGA: Merge concluído: {resultado} (total da carga: {self.resultado})")
+        return resultado
@@ -0,0 +1,223 @@
+"""
+Dispatcher de notificações: drena a outbox (usuarios.tb_eventos_notificacao)
+gravada pelo worker e faz o fan-out para os usuários (app.notificacoes).
+
+Cada thread reserva um lote de eventos pendentes com FOR UPDATE SKIP LOCKED,
+processa e marca a entrega na mesma transação. Por isso várias threads e
+vários processos podem rodar ao mesmo tempo sem entregar o mesmo evento duas
+vezes, e um processo que morre no meio devolve o lote para a fila (rollback).
+Os projetos do lote também são travados (advisory lock): eventos do mesmo
+projeto nunca são entregues em paralelo; os de um projeto já travado por
+outra thread ficam para um lote seguinte.
+
+Ordem por projeto: a cobertura de app.notificacoes só avança, então uma
+tramitação entregue depois de uma mais nova do mesmo projeto seria descartada
+em silêncio. Por isso só é reservado o evento pendente mais antigo de cada
+projeto (nenhum outro do mesmo projeto e tipo na frente, nem um que falhou e
+espera nova tentativa). Os eventos de tramitação seguintes desse projeto vão
+junto, num único fan-out com a união das sequências, e são entregues ou
+falham juntos. Um evento que falha é tentado de novo no próximo lote, até
+DISPATCHER_MAX_TENTATIVAS; depois fica na tabela com o erro para inspeção (e
+deixa de segurar os seguintes).
+
+Contrapressão: o lote se adapta ao tempo de processamento. Lotes mais lentos
+que DISPATCHER_LOTE_MAX_SEGUNDOS reduzem o tamanho pela metade; lotes rápidos
+voltam a crescer até DISPATCHER_LOTE. Sem eventos, a thread dorme
+DISPATCHER_INTERVALO segundos.
+
+Uso:
+    python -m app.dispatcher
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from . import criar_app_dados, db, wait_for_db
+from .notificacoes import notificar_tramitacoes, notificar_temas
+from .pool import estatisticas_pool
+
+THREADS = int(os.getenv('DISPATCHER_THREADS', '4'))
+LOTE = int(os.getenv('DISPATCHER_LOTE', '100'))
+LOTE_MINIMO = int(os.getenv('DISPATCHER_LOTE_MINIMO', '5'))
+LOTE_MAX_SEGUNDOS = float(os.getenv('DISPATCHER_LOTE_MAX_SEGUNDOS', '10'))
+INTERVALO = float(os.getenv('DISPATCHER_INTERVALO', '5'))
+MAX_TENTATIVAS = int(os.getenv('DISPATCHER_MAX_TENTATIVAS', '5'))
+RETENCAO_DIAS = int(os.getenv('DISPATCHER_RETENCAO_DIAS', '7'))
+
+# Só o primeiro pendente de cada projeto: um mais novo nunca passa na frente (nem de uma nova tentativa)
+SQL_RESERVAR = text("""
+    SELECT e.id, e.tipo, e.id_projeto, e.sequencias
+    FROM usuarios.tb_eventos_notificacao e
+    WHERE e.entregue_em IS NULL AND e.tentativas < :max_tentativas
+      AND NOT EXISTS (
+          SELECT 1 FROM usuarios.tb_eventos_notificacao anterior
+          WHERE anterior.id_projeto = e.id_projeto AND anterior.tipo = e.tipo AND anterior.id < e.id
+            AND anterior.entregue_em IS NULL AND anterior.tentativas < :max_tentativas
+      )
+    ORDER BY e.id
+    LIMIT :lote
+    FOR UPDATE SKIP LOCKED
+""")
+
+# Tramitações pendentes seguintes dos projetos já travados: entram no mesmo fan-out
+SQL_RESERVAR_SEGUINTES = text("""
+    SELECT id, id_projeto, sequencias
+    FROM usuarios.tb_eventos_notificacao
+    WHERE id_projeto = ANY(CAST(:ids_projetos AS integer[])) AND tipo = 'tramitacao'
+      AND entregue_em IS NULL AND tentativas < :max_tentativas
+      AND NOT (id = ANY(CAST(:ids AS bigint[])))
+    ORDER BY id
+    FOR UPDATE SKIP LOCKED
+""")
+
+# Classe dos advisory locks por projeto: pg_try_advisory_xact_lock(classe, id_projeto)
+CLASSE_LOCK_PROJETO = 4040
+
+# Um projeto por vez: dois eventos do mesmo projeto em threads diferentes criariam, cada
+# um no seu snapshot, uma notificação não lida em vez de agrupar. Travado até o commit
+SQL_TRAVAR_PROJETOS = text(f"""
+    SELECT id_projeto
+    FROM unnest(CAST(:ids AS integer[])) AS id_projeto
+    WHERE pg_try_advisory_xact_lock({CLASSE_LOCK_PROJETO}, id_projeto)
+""")
+
+SQL_ENTREGUE = text("""
+    UPDATE usuarios.tb_eventos_notificacao
+    SET entregue_em = now(), qtd_notificacoes = :qtd, tentativas = tentativas + 1, erro = NULL
+    WHERE id = ANY(CAST(:ids AS bigint[]))
+""")
+
+SQL_FALHOU = text("""
+    UPDATE usuarios.tb_eventos_notificacao
+    SET tentativas = tentativas + 1, erro = :erro
+    WHERE id = ANY(CAST(:ids AS bigint[]))
+""")
+
+
+def _entregar(ids, fan_out):
+    """Executa o fan-out num savepoint e registra o resultado dos eventos `ids`."""
+    try:
+        with db.session.begin_nested():
+            qtd = fan_out()
+        db.session.execute(SQL_ENTREGUE, {"ids": ids, "qtd": qtd})
+        return qtd
+    except Exception as e:
+        db.session.execute(SQL_FALHOU, {"ids": ids, "erro": str(e)[:1000]})
+        print(f"DISPATCHER: Erro nos eventos {ids}: {e}")
+        return 0
+
+
+def processar_lote(lote):
+    """
+    Reserva e entrega até `lote` eventos numa transação.
+    Retorna (eventos reservados, notificações criadas).
+    """
+    eventos = db.session.execute(SQL_RESERVAR, {"lote": lote, "max_tentativas": MAX_TENTATIVAS}).all()
+    if not eventos:
+        db.session.rollback()
+        return 0, 0
+
+    # Projeto travado por outra thread/processo: o evento volta para a fila no commit
+    travados = set(db.session.scalars(SQL_TRAVAR_PROJETOS, {"ids": sorted({e.id_projeto for e in eventos})}))
+    eventos = [e for e in eventos if e.id_projeto in travados]
+
+    # Cada projeto: o primeiro evento e os seguintes, numa chamada com a união das sequências
+    tramitacoes = [e for e in eventos if e.tipo == 'tramitacao']
+    seguintes = db.session.execute(SQL_RESERVAR_SEGUINTES, {
+        "ids_projetos": [e.id_projeto for e in tramitacoes],
+        "ids": [e.id for e in tramitacoes],
+        "max_tentativas": MAX_TENTATIVAS,
+    }).all() if tramitacoes else []
+    por_projeto = {}
+    for evento in tramitacoes + seguintes:
+        ids, sequencias = por_projeto.setdefault(evento.id_projeto, ([], set()))
+        ids.append(evento.id)
+        sequencias.update(evento.sequencias or [])
+
+    criadas = 0
+    for id_projeto, (ids, sequencias) in por_projeto.items():
+        criadas += _entregar(ids, lambda p=id_projeto, s=sorted(sequencias): notificar_tramitacoes(p, s))
+
+    # Projetos novos do lote vão juntos numa passada pelo índice de interesses
+    novos = [e for e in eventos if e.tipo == 'projeto_novo']
+    if novos:
+        criadas += _entregar([e.id for e in novos], lambda: notificar_temas({e.id_projeto for e in novos}))
+
+    db.session.commit()
+    return len(eventos) + len(seguintes), criadas
+
+
+def limpar_entregues(dias=RETENCAO_DIAS):
+    """Apaga eventos entregues há mais de `dias` dias."""
+    resultado = db.session.execute(text("""
+        DELETE FROM usuarios.tb_eventos_notificacao
+        WHERE entregue_em < :limite
+    """), {"limite": datetime.now() - timedelta(days=dias)})
+    db.session.commit()
+    return resultado.rowcount
+
+
+def pendentes():
+    return db.session.scalar(text(
+        "SELECT count(*) FROM usuarios.tb_eventos_notificacao WHERE entregue_em IS NULL AND tentativas < :max"
+    ), {"max": MAX_TENTATIVAS})
+
+
+def executar_thread(app, indice, parar):
+    """Laço de uma thread: lotes seguidos enquanto houver fila, com o tamanho ajustado pela duração."""
+    lote = LOTE
+    with app.app_context():
+        while not parar.is_set():
+            inicio = time.perf_counter()
+            try:
+                qtd_eventos, qtd_notificacoes = processar_lote(lote)
+            except Exception as e:
+                db.session.rollback()
+                print(f"DISPATCHER[{indice}]: Erro ao processar lote: {e}")
+                parar.wait(INTERVALO)
+                continue
+            decorrido = time.perf_counter() - inicio
+
+            if not qtd_eventos:
+                parar.wait(INTERVALO)
+                continue
+
+            if decorrido > LOTE_MAX_SEGUNDOS:
+                lote = max(LOTE_MINIMO, lote // 2)
+            elif decorrido < LOTE_MAX_SEGUNDOS / 4:
+                lote = min(LOTE, lote * 2)
+            print(f"DISPATCHER[{indice}]: {qtd_eventos} eventos, {qtd_notificacoes} notificações "
+                  f"em {decorrido:.1f}s (próximo lote: {lote})")
+
+
+if __name__ == "__main__":
+    app = criar_app_dados('worker')
+    with app.app_context():
+        if not wait_for_db("DISPATCHER"):
+            exit(1)
+
+    parar = threading.Event()
+    threads = [
+        threading.Thread(target=executar_thread, args=(app, i, parar), daemon=True, name=f"dispatcher-{i}")
+        for i in range(THREADS)
+    ]
+    print(f"DISPATCHER: Iniciando {THREADS} threads (lote até {LOTE}, pausa {INTERVALO}s)")
+    for t in threads:
+        t.start()
+
+    try:
+        while True:
+            time.sleep(600)
+            with app.app_context():
+                try:
+                    apagados = limpar_entregues()
+                    print(f"DISPATCHER: {pendentes()} eventos pendentes; {apagados} entregues antigos apagados. "
+                          f"Pool: {estatisticas_pool(db.engine)}")
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"DISPATCHER: Erro na limpeza da outbox: {e}")
+    except KeyboardInterrupt:
+        parar.set()
+        for t in threads:
+            t.join()
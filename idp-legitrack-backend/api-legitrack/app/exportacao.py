@@ -0,0 +1,183 @@
+"""
+Exportação em massa de projetos com tramitações e temas (NDJSON ou CSV).
+
+Uma única consulta, lida por cursor do lado do servidor (yield_per): o
+Postgres monta cada projeto já como JSON (tramitações e temas agregados por
+subconsultas indexadas) e o Python só repassa as linhas. A memória fica
+constante qualquer que seja o tamanho da exportação; os filtros (ano, tema,
+situação, atualizados desde) são aplicados no SQL.
+
+Formatos:
+  - ndjson: uma linha JSON por projeto, com "tramitacoes" e "temas" aninhados;
+  - csv: uma linha por tramitação (projetos sem tramitação saem com as
+    colunas da tramitação vazias); temas separados por "|".
+
+Usado pela rota GET /api/exportar e pela linha de comando:
+
+    python -m app.exportacao --formato csv [--ano 2024] [--tema 40] [--situacao 1140] \
+        [--desde 2024-01-01] [--saida projetos.csv]
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from datetime import date
+from sqlalchemy import text
+from .banco import db
+
+# Linhas buscadas do cursor por vez
+LOTE = int(os.getenv('EXPORTACAO_LOTE', '1000'))
+
+FORMATOS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+COLUNAS_CSV = [
+    "id_projeto", "descricao", "titulo", "ano", "data_hora", "situacao", "temas",
+    "sequencia", "tramitacao_data_hora", "tramitacao_situacao", "tramitacao_tipo",
+]
+
+SQL_EXPORTACAO = """
+    SELECT json_build_object(
+        'id_projeto', p.id_projeto,
+        'descricao', p.descricao,
+        'titulo', p.titulo_projeto,
+        'ano', p.ano_inicio,
+        'data_hora', p.data_hora,
+        'situacao', s.ds_situacao,
+        'temas', COALESCE((
+            SELECT json_agg(tp.ds_tema ORDER BY tp.ds_tema)
+            FROM camara.rl_temas rt
+            JOIN camara.tp_temas tp ON tp.id_tema = rt.id_tema
+            WHERE rt.id_projeto = p.id_projeto
+        ), '[]'::json),
+        'tramitacoes', COALESCE((
+            SELECT json_agg(json_build_object(
+                'sequencia', t.sequencia,
+                'data_hora', t.data_hora,
+                'situacao', ts.ds_situacao,
+                'tipo', tt.ds_tramitacao
+            ) ORDER BY t.sequencia)
+            FROM camara.rl_tramitacoes t
+            LEFT JOIN camara.tp_situacao ts ON ts.id_situacao = t.id_situacao
+            LEFT JOIN camara.tp_tramitacao tt ON tt.id_tramitacao = t.id_tramitacao
+            WHERE t.id_projeto = p.id_projeto
+        ), '[]'::json)
+    )::text
+    FROM camara.tb_projeto p
+    LEFT JOIN camara.tp_situacao s ON s.id_situacao = p.id_ultima_situacao
+    {filtros}
+    ORDER BY p.id_projeto
+"""
+
+
+def validar_filtros(ano=None, tema=None, situacao=None, desde=None):
+    """
+    Converte os filtros recebidos como texto (query string ou CLI).
+    ValueError com a mensagem para o usuário se algum for inválido.
+    """
+    filtros = {}
+    try:
+        if ano:
+            filtros["ano"] = str(int(ano))
+        if tema:
+            filtros["tema"] = int(tema)
+        if situacao:
+            filtros["situacao"] = int(situacao)
+        if desde:
+            filtros["desde"] = date.fromisoformat(desde)
+    except ValueError:
+        raise ValueError("Filtros inválidos: ano, tema e situacao são números; desde é AAAA-MM-DD")
+    return filtros
+
+
+def consulta_exportacao(filtros):
+    condicoes = []
+    if "ano" in filtros:
+        condicoes.append("p.ano_inicio = :ano")
+    if "tema" in filtros:
+        condicoes.append("EXISTS (SELECT 1 FROM camara.rl_temas f WHERE f.id_projeto = p.id_projeto AND f.id_tema = :tema)")
+    if "situacao" in filtros:
+        condicoes.append("p.id_ultima_situacao = :situacao")
+    if "desde" in filtros:
+        condicoes.append("p.data_hora >= :desde")
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+    return text(SQL_EXPORTACAO.format(filtros=where)).bindparams(**filtros)
+
+
+def _linhas_json(filtros):
+    # yield_per liga stream_results: cursor nomeado no psycopg2, LOTE linhas por FETCH
+    resultado = db.session.execute(consulta_exportacao(filtros).execution_options(yield_per=LOTE))
+    for (linha,) in resultado:
+        yield linha
+
+
+def gerar_ndjson(filtros):
+    for linha in _linhas_json(filtros):
+        yield linha + "\n"
+
+
+def gerar_csv(filtros):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+
+    def esvaziar():
+        conteudo = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return conteudo
+
+    escritor.writerow(COLUNAS_CSV)
+    yield esvaziar()
+    for linha in _linhas_json(filtros):
+        projeto = json.loads(linha)
+        base = [
+            projeto["id_projeto"], projeto["descricao"], projeto["titulo"], projeto["ano"],
+            projeto["data_hora"], projeto["situacao"], "|".join(projeto["temas"]),
+        ]
+        for tram in projeto["tramitacoes"] or [{}]:
+            escritor.writerow(base + [
+                tram.get("sequencia"), tram.get("data_hora"), tram.get("situacao"), tram.get("tipo"),
+            ])
+        yield esvaziar()
+
+
+def gerar(formato, filtros):
+    """Gerador de pedaços de texto no formato pedido ('ndjson' ou 'csv')."""
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato inválido: use {', '.join(FORMATOS)}")
+    return gerar_csv(filtros) if formato == "csv" else gerar_ndjson(filtros)
+
+
+if __name__ == "__main__":
+    from . import criar_app_dados
+
+    parser = argparse.ArgumentParser(description="Exporta projetos, tramitações e temas.")
+    parser.add_argument("--formato", choices=list(FORMATOS), default="ndjson")
+    parser.add_argument("--ano", help="Ano do projeto")
+    parser.add_argument("--tema", help="Código do tema")
+    parser.add_argument("--situacao", help="Código da situação atual")
+    parser.add_argument("--desde", help="Só projetos movimentados a partir desta data (AAAA-MM-DD)")
+    parser.add_argument("--saida", help="Arquivo de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    try:
+        filtros = validar_filtros(args.ano, args.tema, args.situacao, args.desde)
+    except ValueError as e:
+        print(f"EXPORTACAO: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    # Perfil worker: sem statement_timeout da API
+    app = criar_app_dados('worker')
+    with app.app_context():
+        saida = open(args.saida, "w", encoding="utf-8", newline="") if args.saida else sys.stdout
+        try:
+            for pedaco in gerar(args.formato, filtros):
+                saida.write(pedaco)
+        finally:
+            if args.saida:
+                saida.close()
+        db.session.rollback()
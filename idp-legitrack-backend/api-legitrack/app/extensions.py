@@ -1,12 +1,17 @@
-from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 from flasgger import Swagger
 from flask_migrate import Migrate
 from flask_cors import CORS
+from .stream import NotificacaoBroker
+from .profiling import ProfilerSQL
+from .limites import LimitadorRequisicoes
+from .banco import db  # Definido em app/banco.py para processos sem HTTP não importarem o resto
 
 # Inicializamos as extensões vazias aqui para evitar circular imports
-db = SQLAlchemy()
 jwt = JWTManager()
 swagger = Swagger()
 migrate = Migrate()
-cors = CORS()
\ No newline at end of file
+cors = CORS()
+broker = NotificacaoBroker()
+profiler = ProfilerSQL()
+limitador = LimitadorRequisicoes()
\ No newline at end of file
@@ -0,0 +1,186 @@
+"""
+Contagens por tema e por situação (facetas) da busca de projetos.
+
+camara.tb_projeto.ids_temas é uma cópia desnormalizada dos temas de
+camara.rl_temas, mantida por gatilhos de instrução (tabelas de transição: um
+UPDATE por INSERT/DELETE em lote, não por linha) e indexada com GIN. Com ela:
+
+  - o filtro por temas da busca é um `ids_temas && ARRAY[...]` no índice GIN,
+    sem semi-join em rl_temas;
+  - as facetas saem de um único agregado com GROUPING SETS sobre a própria
+    tb_projeto (unnest de ids_temas + id_ultima_situacao).
+
+O resultado das facetas fica em cache por consulta (termo + temas) durante
+FACETAS_CACHE_TTL segundos, em cada processo da API.
+
+Uso:
+    python -m app.facetas    # cria coluna, gatilhos e preenche ids_temas (idempotente)
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import Integer, bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from .banco import db
+
+CACHE_TTL = float(os.getenv('FACETAS_CACHE_TTL', '60'))
+CACHE_TAMANHO = int(os.getenv('FACETAS_CACHE_TAMANHO', '1024'))
+
+SQL_RECALCULAR = """
+    UPDATE camara.tb_projeto p
+    SET ids_temas = COALESCE((
+        SELECT array_agg(DISTINCT rt.id_tema ORDER BY rt.id_tema)
+        FROM camara.rl_temas rt WHERE rt.id_projeto = p.id_projeto
+    ), '{{}}')
+    WHERE p.id_projeto IN (SELECT DISTINCT id_projeto FROM {origem})
+"""
+
+DDL_FUNCOES = [
+    f"""
+    CREATE OR REPLACE FUNCTION camara.fn_ids_temas_insert() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        {SQL_RECALCULAR.format(origem='novos')};
+        RETURN NULL;
+    END $$
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION camara.fn_ids_temas_delete() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        {SQL_RECALCULAR.format(origem='antigos')};
+        RETURN NULL;
+    END $$
+    """,
+]
+
+# Tabelas de transição não aceitam mais de um evento por gatilho: um para INSERT e outro para DELETE.
+# rl_temas não recebe UPDATE (a troca de temas é DELETE + INSERT).
+GATILHOS = [
+    ("tg_ids_temas_insert",
+     "AFTER INSERT ON camara.rl_temas REFERENCING NEW TABLE AS novos "
+     "FOR EACH STATEMENT EXECUTE FUNCTION camara.fn_ids_temas_insert()"),
+    ("tg_ids_temas_delete",
+     "AFTER DELETE ON camara.rl_temas REFERENCING OLD TABLE AS antigos "
+     "FOR EACH STATEMENT EXECUTE FUNCTION camara.fn_ids_temas_delete()"),
+]
+
+
+def instalar():
+    """Cria a coluna e os gatilhos e recalcula ids_temas de todos os projetos."""
+    with db.engine.begin() as conn:
+        conn.execute(text(
+            "ALTER TABLE camara.tb_projeto ADD COLUMN IF NOT EXISTS ids_temas integer[] NOT NULL DEFAULT '{}'"
+        ))
+        for ddl in DDL_FUNCOES:
+            conn.execute(text(ddl))
+        for nome, definicao in GATILHOS:
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {nome} ON camara.rl_temas"))
+            conn.execute(text(f"CREATE TRIGGER {nome} {definicao}"))
+        atualizados = conn.execute(text(SQL_RECALCULAR.format(origem="camara.rl_temas"))).rowcount
+    print(f"FACETAS: Gatilhos instalados; ids_temas recalculado em {atualizados} projetos.")
+
+
+# ============================================================================
+# AGREGADO E CACHE
+# ============================================================================
+
+SQL_FACETAS = """
+    WITH filtrados AS (
+        SELECT p.id_projeto, p.id_ultima_situacao, p.ids_temas
+        FROM camara.tb_projeto p
+        {filtros}
+    )
+    SELECT g.por_situacao, g.id_tema, tp.ds_tema, g.id_situacao, ts.ds_situacao, g.qtd
+    FROM (
+        SELECT GROUPING(t.id_tema) = 1 AS por_situacao, t.id_tema, f.id_ultima_situacao AS id_situacao,
+               count(DISTINCT f.id_projeto) AS qtd
+        FROM filtrados f
+        LEFT JOIN LATERAL unnest(f.ids_temas) AS t(id_tema) ON true
+        GROUP BY GROUPING SETS ((t.id_tema), (f.id_ultima_situacao))
+    ) g
+    LEFT JOIN camara.tp_temas tp ON tp.id_tema = g.id_tema
+    LEFT JOIN camara.tp_situacao ts ON ts.id_situacao = g.id_situacao
+    ORDER BY g.qtd DESC
+"""
+
+
+def consulta_facetas(ids_temas=None, termo_busca=''):
+    """Mesmos filtros de routes.consulta_projetos, sem o LIMIT da listagem."""
+    condicoes, parametros = [], []
+    if termo_busca:
+        condicoes.append("(p.titulo_projeto ILIKE :termo OR p.descricao ILIKE :termo)")
+        parametros.append(bindparam("termo", f"%{termo_busca}%"))
+    if ids_temas:
+        # Tipado: permite renderizar a consulta com literal_binds (app.verificar_planos)
+        condicoes.append("p.ids_temas && :ids_temas")
+        parametros.append(bindparam("ids_temas", sorted(ids_temas), type_=ARRAY(Integer)))
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+    return text(SQL_FACETAS.format(filtros=where)).bindparams(*parametros)
+
+
+class CacheTTL:
+    """Dicionário com validade por entrada e tamanho máximo (descarta a mais antiga)."""
+
+    def __init__(self, ttl, tamanho):
+        self.ttl = ttl
+        self.tamanho = tamanho
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is None:
+                return None
+            expira_em, valor = item
+            if expira_em < time.monotonic():
+                del self._dados[chave]
+                return None
+            return valor
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._dados[chave] = (time.monotonic() + self.ttl, valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.tamanho:
+                self._dados.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._dados.clear()
+
+
+cache_facetas = CacheTTL(CACHE_TTL, CACHE_TAMANHO)
+
+
+def calcular_facetas(ids_temas=None, termo_busca=''):
+    """
+    Devolve {"temas": [...], "situacoes": [...]} para a consulta, cada item com id,
+    rótulo e quantidade de projetos, do mais frequente para o menos.
+    """
+    ids = sorted({int(i) for i in ids_temas}) if ids_temas else []
+    termo_busca = (termo_busca or '').strip()
+    chave = (termo_busca.lower(), tuple(ids))
+    facetas = cache_facetas.obter(chave)
+    if facetas is not None:
+        return facetas
+
+    facetas = {"temas": [], "situacoes": []}
+    for por_situacao, id_tema, tema, id_situacao, situacao, qtd in db.session.execute(consulta_facetas(ids, termo_busca)):
+        # Projetos sem tema / sem situação formam um grupo NULL que não vira faceta
+        if por_situacao and id_situacao is not None:
+            facetas["situacoes"].append({"id_situacao": id_situacao, "situacao": situacao, "qtd": qtd})
+        elif not por_situacao and id_tema is not None:
+            facetas["temas"].append({"id_tema": id_tema, "tema": tema, "qtd": qtd})
+    cache_facetas.guardar(chave, facetas)
+    return facetas
+
+
+if __name__ == "__main__":
+    from . import criar_app_dados
+
+    app = criar_app_dados('worker')
+    with app.app_context():
+        print("--- [FACETAS] INICIANDO ---")
+        instalar()
+        print("--- [FACETAS] CONCLUÍDO ---")
@@ -0,0 +1,86 @@
+"""
+Manutenção do feed personalizado (usuarios.tb_feed).
+
+O worker chama atualizar_feed_projetos() ao fim de cada ciclo apenas com os
+projetos que mudaram; a rota de interesses chama reconstruir_feed_usuario()
+quando o usuário troca os temas que segue. Assim a tela Home vira uma leitura
+indexada por (id_user, data_hora) em vez de um EXISTS sobre tb_projeto inteira.
+"""
+import os
+from sqlalchemy import text
+from .banco import db
+
+# Quantos projetos cada feed guarda (o app mostra no máximo 50 por vez)
+FEED_TAMANHO = int(os.getenv('FEED_TAMANHO', '200'))
+
+SQL_ATUALIZAR_PROJETOS = text("""
+    INSERT INTO usuarios.tb_feed (id_user, id_projeto, data_hora)
+    SELECT DISTINCT i.id_user, p.id_projeto, p.data_hora
+    FROM camara.tb_projeto p
+    JOIN camara.rl_temas rt ON rt.id_projeto = p.id_projeto
+    JOIN usuarios.tb_interesses i ON i.id_interesse = rt.id_tema
+    WHERE p.id_projeto = ANY(CAST(:ids AS integer[]))
+    ON CONFLICT (id_user, id_projeto) DO UPDATE SET data_hora = EXCLUDED.data_hora
+    RETURNING id_user
+""")
+
+SQL_APARAR = text("""
+    DELETE FROM usuarios.tb_feed f
+    USING (
+        SELECT id_user, id_projeto,
+               row_number() OVER (PARTITION BY id_user ORDER BY data_hora DESC NULLS LAST) AS posicao
+        FROM usuarios.tb_feed
+        WHERE id_user = ANY(CAST(:ids AS integer[]))
+    ) r
+    WHERE f.id_user = r.id_user AND f.id_projeto = r.id_projeto AND r.posicao > :limite
+""")
+
+SQL_RECONSTRUIR_USUARIO = text("""
+    INSERT INTO usuarios.tb_feed (id_user, id_projeto, data_hora)
+    SELECT :id_user, p.id_projeto, p.data_hora
+    FROM camara.tb_projeto p
+    WHERE EXISTS (
+        SELECT 1
+        FROM camara.rl_temas rt
+        JOIN usuarios.tb_interesses i ON i.id_interesse = rt.id_tema
+        WHERE rt.id_projeto = p.id_projeto AND i.id_user = :id_user
+    )
+    ORDER BY p.data_hora DESC NULLS LAST
+    LIMIT :limite
+""")
+
+
+def atualizar_feed_projetos(ids_projetos):
+    """
+    Propaga projetos novos/alterados para o feed de quem segue algum dos seus temas.
+    Não faz commit: o chamador decide a transação. Retorna quantos usuários foram afetados.
+    """
+    ids = sorted({int(i) for i in ids_projetos})
+    if not ids:
+        return 0
+
+    afetados = {row[0] for row in db.session.execute(SQL_ATUALIZAR_PROJETOS, {"ids": ids})}
+    if afetados:
+        db.session.execute(SQL_APARAR, {"ids": sorted(afetados), "limite": FEED_TAMANHO})
+    return len(afetados)
+
+
+def reconstruir_feed_usuario(id_user):
+    """Recalcula do zero o feed de um usuário (usado quando ele altera os interesses)."""
+    db.session.execute(text("DELETE FROM usuarios.tb_feed WHERE id_user = :id_user"), {"id_user": id_user})
+    db.session.execute(SQL_RECONSTRUIR_USUARIO, {"id_user": id_user, "limite": FEED_TAMANHO})
+
+
+if __name__ == "__main__":
+    # Carga inicial: monta o feed de todos os usuários que já possuem interesses
+    from . import criar_app_dados
+    from .models import TB_Interesses
+
+    app = criar_app_dados('worker')
+    with app.app_context():
+        ids_usuarios = db.session.scalars(db.select(TB_Interesses.id_user).distinct()).all()
+        print(f"FEED: Reconstruindo feed de {len(ids_usuarios)} usuários...")
+        for id_user in ids_usuarios:
+            reconstruir_feed_usuario(id_user)
+            db.session.commit()
+        print("FEED: Concluído.")
@@ -0,0 +1,45 @@
+"""
+Aplica os índices secundários declarados em models.py em um banco já existente.
+
+Bancos novos recebem os índices junto com as tabelas (flask db migrate/upgrade);
+este script cobre bases que já estão em produção, criando cada índice com
+CREATE INDEX CONCURRENTLY IF NOT EXISTS para não bloquear escritas do worker.
+
+Uso:
+    python -m app.indices
+"""
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex
+from .banco import db
+
+
+def ddl_indice(indice, dialect, concorrente):
+    ddl = str(CreateIndex(indice, if_not_exists=True).compile(dialect=dialect))
+    if concorrente:
+        ddl = ddl.replace(" INDEX ", " INDEX CONCURRENTLY ", 1)
+    return ddl
+
+
+def criar_indices(concorrente=True):
+    """Cria (se faltarem) todos os índices do metadata e atualiza as estatísticas das tabelas."""
+    # CONCURRENTLY não pode rodar dentro de transação
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for tabela in db.metadata.sorted_tables:
+            if not tabela.indexes:
+                continue
+            # Tabelas particionadas não aceitam CONCURRENTLY (o índice é criado na mãe e propagado)
+            particionada = bool(tabela.dialect_options["postgresql"].get("partition_by"))
+            for indice in sorted(tabela.indexes, key=lambda i: i.name):
+                print(f"INDICES: {tabela.fullname}.{indice.name}...")
+                conn.execute(text(ddl_indice(indice, conn.dialect, concorrente and not particionada)))
+            conn.execute(text(f"ANALYZE {tabela.fullname}"))
+
+
+if __name__ == "__main__":
+    from . import criar_app_dados
+
+    app = criar_app_dados('worker')
+    with app.app_context():
+        print("--- [INDICES] INICIANDO ---")
+        criar_indices()
+        print("--- [INDICES] CONCLUÍDO ---")
@@ -0,0 +1,129 @@
+"""
+Tempo de inicialização de cada tipo de processo.
+
+Cada medição roda num interpretador novo, como um restart de container ou uma
+execução avulsa de `python -m app.<módulo>`, e reporta a mediana de
+--repeticoes execuções: o tempo do import + criação do app dentro do processo
+e o tempo total do subprocesso (com a subida do interpretador). Não conecta ao
+banco (o engine só abre conexões no primeiro uso).
+
+Além dos tempos, falha (saída 1) se:
+  - um processo sem HTTP (criar_app_dados, worker, seeders) carregar Swagger,
+    JWT, CORS ou Migrate;
+  - create_app() já tiver gerado a especificação do Swagger (ela deve ser
+    montada na primeira requisição a /apispec_1.json e reaproveitada depois).
+
+Uso:
+    python -m app.inicializacao [--repeticoes 5] [--saida resultados/inicializacao.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Pacotes que só o servidor HTTP deve carregar
+SO_HTTP = ["flasgger", "flask_migrate", "flask_jwt_extended", "flask_cors", "alembic"]
+
+# nome: (preparo, código medido, processo sem HTTP)
+PROCESSOS = {
+    "dados: criar_app_dados()": (
+        "", "from app import criar_app_dados; criar_app_dados('worker')", True
+    ),
+    "worker: python -m app.worker": (
+        "", "import app.worker; from app import criar_app_dados; criar_app_dados('worker')", True
+    ),
+    "seed: python -m app.seed": (
+        "", "import app.seed; from app import criar_app_dados; criar_app_dados('worker')", True
+    ),
+    "api: create_app()": (
+        "", "from app import create_app; app = create_app('api')", False
+    ),
+    "api: primeira /apispec_1.json": (
+        "from app import create_app; app = create_app('api'); cliente = app.test_client()",
+        "cliente.get('/apispec_1.json')", False
+    ),
+    "api: segunda /apispec_1.json": (
+        "from app import create_app; app = create_app('api'); cliente = app.test_client(); "
+        "cliente.get('/apispec_1.json')",
+        "cliente.get('/apispec_1.json')", False
+    ),
+}
+
+# Impresso pelo subprocesso na última linha (a criação do app pode imprimir antes)
+SCRIPT = """
+import contextlib, json, sys, time
+with contextlib.redirect_stdout(sys.stderr):
+    {preparo}
+    inicio = time.perf_counter()
+    {medido}
+    segundos = time.perf_counter() - inicio
+extras = {{}}
+if "app.extensions" in sys.modules:
+    from app.extensions import swagger
+    extras["specs_em_cache"] = len(swagger.apispecs)
+print(json.dumps({{"segundos": segundos, "so_http": sorted(m for m in {so_http!r} if m in sys.modules), **extras}}))
+"""
+
+DIRETORIO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def executar_uma(preparo, medido):
+    """Roda um interpretador novo e devolve (medição do subprocesso, segundos totais)."""
+    codigo = SCRIPT.format(preparo=preparo or "pass", medido=medido, so_http=SO_HTTP)
+    inicio = time.perf_counter()
+    saida = subprocess.run(
+        [sys.executable, "-c", codigo], cwd=DIRETORIO, capture_output=True, text=True, check=True
+    ).stdout
+    total = time.perf_counter() - inicio
+    return json.loads(saida.strip().splitlines()[-1]), total
+
+
+def medir(repeticoes):
+    """{nome: {ms, total_ms, so_http, specs_em_cache?}} com a mediana de cada processo."""
+    resultados = {}
+    for nome, (preparo, medido, _) in PROCESSOS.items():
+        execucoes = [executar_uma(preparo, medido) for _ in range(repeticoes)]
+        ultima = execucoes[-1][0]
+        resultados[nome] = {
+            "ms": round(statistics.median(r["segundos"] for r, _ in execucoes) * 1000, 1),
+            "total_ms": round(statistics.median(total for _, total in execucoes) * 1000, 1),
+            "so_http": ultima["so_http"],
+            **({"specs_em_cache": ultima["specs_em_cache"]} if "specs_em_cache" in ultima else {}),
+        }
+        print(f"INICIALIZACAO: {nome:<32} {resultados[nome]['ms']:>8.1f} ms "
+              f"(processo inteiro {resultados[nome]['total_ms']:.1f} ms)")
+    return resultados
+
+
+def verificar(resultados):
+    """Lista de falhas (texto)."""
+    falhas = []
+    for nome, (_, _, sem_http) in PROCESSOS.items():
+        if sem_http and resultados[nome]["so_http"]:
+            falhas.append(f"{nome} carregou {', '.join(resultados[nome]['so_http'])}")
+    if resultados["api: create_app()"].get("specs_em_cache"):
+        falhas.append("create_app() gerou a especificação do Swagger antes da primeira requisição")
+    return falhas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mede o tempo de inicialização dos processos.")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--saida", help="Arquivo JSON para gravar os resultados")
+    args = parser.parse_args()
+
+    resultados = medir(args.repeticoes)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"INICIALIZACAO: Resultados gravados em {args.saida}")
+
+    falhas = verificar(resultados)
+    for falha in falhas:
+        print(f"INICIALIZACAO: [FALHOU] {falha}")
+    if falhas:
+        sys.exit(1)
+    print("INICIALIZACAO: Processos sem HTTP não carregam a pilha da API.")
@@ -0,0 +1,127 @@
+"""
+Limite de requisições por usuário (token bucket), antes de a rota tocar no banco.
+
+Cada requisição consome uma ficha do balde (identidade, classe da rota):
+
+  - identidade: o usuário do JWT; sem token válido, o IP (login e cadastro);
+  - classe: 'busca' (listagem com filtros e exportação, as rotas mais caras),
+    'escrita' (POST/PUT/DELETE), 'leitura' (demais GET) e 'autenticacao'
+    (login, cadastro e refresh, por IP).
+
+Os limites vêm de LIMITE_<CLASSE> no formato "fichas/segundos" (ex.: 30/60 =
+rajada de até 30 requisições, repostas à razão de 30 por minuto). Sem ficha a
+resposta é 429 com Retry-After. Os baldes ficam em app.armazenamento (memória
+do processo ou Redis); quem foi limitado aparece em /admin/limites. Se o
+armazenamento falhar a requisição passa (o limitador nunca derruba a API).
+"""
+import logging
+import math
+
+from flask import current_app, jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+from .armazenamento import armazenamento_do_app
+
+logger = logging.getLogger("legitrack.limites")
+
+LIMITES_PADRAO = {
+    "busca": "30/60",
+    "leitura": "300/60",
+    "escrita": "60/60",
+    "autenticacao": "10/60",
+}
+
+# Rotas com classe fixa; as demais dos blueprints limitados seguem o método HTTP
+CLASSES_ROTAS = {
+    "api.listar_projetos": "busca",
+    "api.exportar_projetos": "busca",
+    "auth.login": "autenticacao",
+    "auth.registrar": "autenticacao",
+    "auth.renovar_token": "autenticacao",
+}
+
+BLUEPRINTS_LIMITADOS = ("api", "auth", "painel")
+
+
+def ler_limite(valor):
+    """'30/60' -> (capacidade 30, taxa 0.5 ficha/s). ValueError se o formato for inválido."""
+    try:
+        fichas, segundos = (float(parte) for parte in valor.split("/"))
+    except (AttributeError, ValueError):
+        raise ValueError(f"Limite inválido: {valor!r} (use fichas/segundos, ex.: 30/60)")
+    if fichas < 1 or segundos <= 0:
+        raise ValueError(f"Limite inválido: {valor!r} (use fichas/segundos, ex.: 30/60)")
+    return fichas, fichas / segundos
+
+
+def classe_da_rota(endpoint, metodo):
+    """Classe de limite do endpoint, ou None para rotas não limitadas (admin, Swagger, estáticos)."""
+    if not endpoint or endpoint.split(".")[0] not in BLUEPRINTS_LIMITADOS:
+        return None
+    if endpoint in CLASSES_ROTAS:
+        return CLASSES_ROTAS[endpoint]
+    return "leitura" if metodo in ("GET", "HEAD") else "escrita"
+
+
+class LimitadorRequisicoes:
+    """Extensão Flask que aplica os baldes em before_request."""
+
+    def __init__(self, app=None):
+        self.limites = {}
+        self.armazenamento = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions["limitador"] = self
+        self.limites = {classe: ler_limite(valor) for classe, valor in app.config["LIMITES"].items()}
+        self.armazenamento = armazenamento_do_app(app)
+        if not app.config.get("LIMITES_ATIVOS"):
+            return
+        app.before_request(self._verificar)
+
+    def _identidade(self):
+        try:
+            verify_jwt_in_request(optional=True)
+            usuario = get_jwt_identity()
+        except Exception:
+            # Token vencido/inválido: a própria rota responde 401; aqui conta pelo IP
+            usuario = None
+        return f"usuario:{usuario}" if usuario else f"ip:{request.remote_addr}"
+
+    def _verificar(self):
+        if request.method == "OPTIONS":
+            return None
+        classe = classe_da_rota(request.endpoint, request.method)
+        if classe is None:
+            return None
+
+        identidade = self._identidade()
+        capacidade, taxa = self.limites[classe]
+        try:
+            permitido, espera = self.armazenamento.consumir(f"limite:{classe}:{identidade}", capacidade, taxa)
+            if not permitido:
+                self.armazenamento.registrar_bloqueio(identidade, classe)
+        except Exception as e:
+            logger.warning("Limitador indisponível, requisição liberada: %s", e)
+            return None
+        if permitido:
+            return None
+
+        segundos = max(1, math.ceil(espera))
+        resposta = jsonify({"erro": "Muitas requisições. Tente novamente em instantes.", "tentar_em": segundos})
+        resposta.status_code = 429
+        resposta.headers["Retry-After"] = str(segundos)
+        return resposta
+
+    def resumo(self, limite=50):
+        """Configuração efetiva e quem mais foi limitado (para /admin/limites)."""
+        return {
+            "ativo": bool(current_app.config.get("LIMITES_ATIVOS")),
+            "armazenamento": type(self.armazenamento).__name__,
+            "limites": {
+                classe: {"capacidade": capacidade, "fichas_por_segundo": round(taxa, 4)}
+                for classe, (capacidade, taxa) in self.limites.items()
+            },
+            "bloqueios": self.armazenamento.bloqueios(limite),
+        }
@@ -1,4 +1,5 @@
-from .extensions import db
+from .banco import db
+from sqlalchemy.dialects.postgresql import ARRAY
 from datetime import datetime, timezone
 from werkzeug.security import generate_password_hash, check_password_hash
 
@@ -39,6 +40,10 @@ class TB_Projeto(db.Model):
     despacho = db.Column(db.Text)
     id_ultima_situacao = db.Column(db.Integer, db.ForeignKey('camara.tp_situacao.id_situacao'))
     id_ultima_tramitacao = db.Column(db.Integer, db.ForeignKey('camara.tp_tramitacao.id_tramitacao'))
+    # Mantida por gatilho (app.sincronizacao): muda quando data_hora ou a última situação mudam
+    versao = db.Column(db.BigInteger, nullable=True)
+    # Cópia de rl_temas mantida por gatilho (app.facetas): filtro e facetas por tema sem join
+    ids_temas = db.Column(ARRAY(db.Integer), nullable=False, default=list, server_default='{}')
 
     # Relacionamentos
     tramitacoes = db.relationship('RL_Tramitacoes', backref='projeto', lazy='dynamic', order_by="RL_Tramitacoes.data_hora.desc()")
@@ -47,20 +52,83 @@ class TB_Projeto(db.Model):
     ultima_situacao = db.relationship('TP_Situacao', foreign_keys=[id_ultima_situacao])
     ultima_tramitacao = db.relationship('TP_Tramitacao', foreign_keys=[id_ultima_tramitacao])
 
+class TB_ProjetoResumo(db.Model):
+    """
+    Resumo de leitura das listagens (busca, favoritos, feed, lote): os campos já
+    renderizados de cada projeto numa linha só, sem joins. Reescrito por
+    app.resumos na mesma transação em que o worker/seeder altera o projeto.
+    """
+    __tablename__ = 'tb_projeto_resumo'
+    __table_args__ = {'schema': 'camara'}
+
+    id_projeto = db.Column(db.Integer, db.ForeignKey('camara.tb_projeto.id_projeto', ondelete='CASCADE'),
+                           primary_key=True, autoincrement=False)
+    titulo = db.Column(db.Text)            # ementa
+    descricao = db.Column(db.Text)         # "PL 123/2024"
+    situacao = db.Column(db.String(255))   # rótulo da última situação
+    data = db.Column(db.String(20))        # data_hora formatada ('05 de Mar. de 2024')
+    data_hora = db.Column(db.DateTime)     # ordenação
+    ids_temas = db.Column(ARRAY(db.Integer), nullable=False, default=list, server_default='{}')
+    qtd_seguidores = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    ultima_sequencia = db.Column(db.Integer)
+    atualizado_em = db.Column(db.DateTime)
+
+class TB_ProjetoSemelhante(db.Model):
+    """
+    Vizinhos mais próximos de cada projeto pela similaridade TF-IDF das ementas,
+    em ordem decrescente de score. Calculado fora da requisição por app.semelhantes.
+    """
+    __tablename__ = 'tb_projeto_semelhantes'
+    __table_args__ = {'schema': 'camara'}
+
+    id_projeto = db.Column(db.Integer, db.ForeignKey('camara.tb_projeto.id_projeto', ondelete='CASCADE'),
+                           primary_key=True, autoincrement=False)
+    ids_semelhantes = db.Column(ARRAY(db.Integer), nullable=False, default=list, server_default='{}')
+    scores = db.Column(ARRAY(db.Float), nullable=False, default=list, server_default='{}')
+    atualizado_em = db.Column(db.DateTime)
+
 class RL_Tramitacoes(db.Model):
+    """
+    Histórico de tramitações, particionado por ano em data_hora (app.particoes).
+    Anos antigos de projetos encerrados vão para um nível de arquivo compacto.
+    """
     __tablename__ = 'rl_tramitacoes'
-    __table_args__ = {'schema': 'camara'}
+    __table_args__ = {'schema': 'camara', 'postgresql_partition_by': 'RANGE (data_hora)'}
     
-    id_rl_tramitacao = db.Column(db.Integer, primary_key=True)
+    id_rl_tramitacao = db.Column(db.Integer, primary_key=True, autoincrement=True)
     id_projeto = db.Column(db.Integer, db.ForeignKey('camara.tb_projeto.id_projeto'), nullable=False)
     sequencia = db.Column(db.Integer, nullable=False)
-    data_hora = db.Column(db.DateTime, nullable=False)
+    data_hora = db.Column(db.DateTime, primary_key=True)
     id_situacao = db.Column(db.Integer, db.ForeignKey('camara.tp_situacao.id_situacao'), nullable=False)
     id_tramitacao = db.Column(db.Integer, db.ForeignKey('camara.tp_tramitacao.id_tramitacao'), nullable=False)
+    sigla_orgao = db.Column(db.String(100), nullable=True)  # Órgão onde a tramitação aconteceu (siglaOrgao da API)
     
     situacao = db.relationship('TP_Situacao')
     tipo_tramitacao = db.relationship('TP_Tramitacao')
 
+class TB_AtividadeDiaria(db.Model):
+    """
+    Agregado das tramitações por dia × situação × tema, mantido por app.agregados
+    a cada lote gravado. id_tema = 0 é o total do dia/situação (um projeto com
+    vários temas conta uma vez em cada tema, então a soma dos temas não é o total).
+    """
+    __tablename__ = 'tb_atividade_diaria'
+    __table_args__ = {'schema': 'camara'}
+
+    dia = db.Column(db.Date, primary_key=True)
+    id_situacao = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    id_tema = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    qtd_tramitacoes = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+class TB_AtividadeOrgao(db.Model):
+    """Agregado das tramitações por dia × órgão do projeto (sigla_orgao), mantido por app.agregados."""
+    __tablename__ = 'tb_atividade_orgao'
+    __table_args__ = {'schema': 'camara'}
+
+    dia = db.Column(db.Date, primary_key=True)
+    sigla_orgao = db.Column(db.String(100), primary_key=True)
+    qtd_tramitacoes = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
 # Tabela Associativa (Many-to-Many)
 rel_temas = db.Table('rl_temas',
     db.Column('id_rl_temas', db.Integer, primary_key=True),
@@ -104,25 +172,154 @@ class RL_Favoritos(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     id_user = db.Column(db.Integer, db.ForeignKey('usuarios.tb_users.id'), nullable=False)
     id_projeto = db.Column(db.Integer, db.ForeignKey('camara.tb_projeto.id_projeto'), nullable=False)
+    versao = db.Column(db.BigInteger, nullable=True)  # Gatilho (app.sincronizacao)
 
     projeto = db.relationship('TB_Projeto')
     user = db.relationship('TB_User', backref=db.backref('meus_favoritos', lazy='dynamic'))
 
+class TB_Feed(db.Model):
+    """
+    Feed personalizado pré-calculado pelo worker: projetos dos temas que o usuário segue
+    """
+    __tablename__ = 'tb_feed'
+    __table_args__ = {'schema': 'usuarios'}
+    id_user = db.Column(db.Integer, db.ForeignKey('usuarios.tb_users.id'), primary_key=True)
+    id_projeto = db.Column(db.Integer, db.ForeignKey('camara.tb_projeto.id_projeto'), primary_key=True)
+    data_hora = db.Column(db.DateTime)  # Cópia de tb_projeto.data_hora, usada na ordenação
+
+    projeto = db.relationship('TB_Projeto')
+
 class TB_Notificacao(db.Model):
     """
     Tabela para armazenar notificações do usuário (Sininho)
+
+    Particionada por mês em data_hora (partições criadas e expiradas por
+    app.particoes). Por isso a PK inclui data_hora; o id continua único
+    (uma sequência só) e é o cursor do stream SSE.
     """
     __tablename__ = 'tb_notificacoes'
-    __table_args__ = {'schema': 'usuarios'}
+    __table_args__ = {'schema': 'usuarios', 'postgresql_partition_by': 'RANGE (data_hora)'}
 
-    id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     id_user = db.Column(db.Integer, db.ForeignKey('usuarios.tb_users.id'), nullable=False)
     titulo = db.Column(db.String(255), nullable=False)
     descricao = db.Column(db.Text, nullable=True)
-    data_hora = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    data_hora = db.Column(db.DateTime, primary_key=True, default=lambda: datetime.now(timezone.utc))
     lida = db.Column(db.Boolean, default=False)
     
     # Opcional: Linkar com um projeto específico para abrir ao clicar
     id_projeto = db.Column(db.Integer, db.ForeignKey('camara.tb_projeto.id_projeto'), nullable=True)
+
+    # Geração idempotente e agrupada (app.notificacoes): sequência da última tramitação
+    # coberta e quantas tramitações a notificação resume
+    sequencia = db.Column(db.Integer, nullable=True)
+    qtd_tramitacoes = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    versao = db.Column(db.BigInteger, nullable=True)  # Gatilho (app.sincronizacao)
     
-    user = db.relationship('TB_User', backref=db.backref('notificacoes', lazy='dynamic', order_by="desc(TB_Notificacao.data_hora)"))
\ No newline at end of file
+    user = db.relationship('TB_User', backref=db.backref('notificacoes', lazy='dynamic', order_by="desc(TB_Notificacao.data_hora)"))
+
+class TB_NotificacaoCobertura(db.Model):
+    """
+    Chave de idempotência das notificações de tramitação: a maior sequência já
+    notificada para cada (usuário, projeto). Fica fora de tb_notificacoes
+    porque lá um índice único precisaria incluir data_hora (chave de partição).
+    """
+    __tablename__ = 'tb_notificacoes_cobertura'
+    __table_args__ = {'schema': 'usuarios'}
+
+    id_user = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    id_projeto = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    sequencia = db.Column(db.Integer, nullable=False)
+
+class TB_EventoNotificacao(db.Model):
+    """
+    Outbox das notificações. O worker grava aqui, na mesma transação do projeto,
+    só o fato ("projeto X chegou à sequência Y" ou "projeto X é novo"); o fan-out
+    para os usuários é feito depois por app.dispatcher, que marca a entrega.
+    """
+    __tablename__ = 'tb_eventos_notificacao'
+    __table_args__ = {'schema': 'usuarios'}
+
+    id = db.Column(db.BigInteger, primary_key=True)
+    tipo = db.Column(db.String(20), nullable=False)  # 'tramitacao' | 'projeto_novo'
+    id_projeto = db.Column(db.Integer, db.ForeignKey('camara.tb_projeto.id_projeto'), nullable=False)
+    # Tramitações novas do ciclo (a maior é a sequência Y); vazio em 'projeto_novo'
+    sequencias = db.Column(db.ARRAY(db.Integer), nullable=True)
+    criado_em = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    # Entrega (preenchidos pelo dispatcher)
+    entregue_em = db.Column(db.DateTime, nullable=True)
+    qtd_notificacoes = db.Column(db.Integer, nullable=True)
+    tentativas = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    erro = db.Column(db.Text, nullable=True)
+
+class TB_Remocao(db.Model):
+    """
+    Lápides para o GET /api/sync: registros apagados (hoje, favoritos removidos),
+    gravadas por gatilho com a mesma sequência de versões das tabelas rastreadas.
+    """
+    __tablename__ = 'tb_remocoes'
+    __table_args__ = {'schema': 'usuarios'}
+
+    versao = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    tabela = db.Column(db.String(63), nullable=False)
+    id_user = db.Column(db.Integer, nullable=False)
+    id_registro = db.Column(db.Integer, nullable=False)
+    removido_em = db.Column(db.DateTime, nullable=False)
+
+# ========================================================
+# ÍNDICES SECUNDÁRIOS (caminhos quentes da API e do worker)
+# ========================================================
+
+# Listagem/busca de projetos: ORDER BY data_hora DESC NULLS LAST LIMIT 50
+db.Index('ix_tb_projeto_data_hora', TB_Projeto.data_hora.desc().nullslast())
+
+# Busca por temas (ids_temas && ARRAY[...]) e facetas
+db.Index('ix_tb_projeto_ids_temas', TB_Projeto.ids_temas, postgresql_using='gin')
+
+# Listagens lidas do resumo: mesma ordenação e mesmo filtro por temas
+db.Index('ix_tb_projeto_resumo_data_hora', TB_ProjetoResumo.data_hora.desc().nullslast())
+db.Index('ix_tb_projeto_resumo_ids_temas', TB_ProjetoResumo.ids_temas, postgresql_using='gin')
+
+# Atualização incremental dos semelhantes: listas que citam um projeto alterado
+db.Index('ix_tb_projeto_semelhantes_ids', TB_ProjetoSemelhante.ids_semelhantes, postgresql_using='gin')
+
+# Painel: séries por tema (id_tema = 0 é o total) numa faixa de dias
+db.Index('ix_tb_atividade_diaria_tema_dia', TB_AtividadeDiaria.id_tema, TB_AtividadeDiaria.dia)
+
+# Timeline do projeto e checagem de sequências já importadas
+db.Index('ix_rl_tramitacoes_projeto_data', RL_Tramitacoes.id_projeto, RL_Tramitacoes.data_hora.desc())
+
+# Filtro por tema (EXISTS em rl_temas) e carga dos temas de um projeto
+db.Index('ix_rl_temas_tema_projeto', rel_temas.c.id_tema, rel_temas.c.id_projeto)
+db.Index('ix_rl_temas_projeto_tema', rel_temas.c.id_projeto, rel_temas.c.id_tema)
+
+# Fan-out por tema: quem segue o tema X (id_user já é prefixo de uq_user_interesse)
+db.Index('ix_tb_interesses_tema', TB_Interesses.id_interesse)
+
+# Fan-out de notificações: quem favoritou o projeto X (id_user já é prefixo de uq_user_projeto_favorito)
+db.Index('ix_rl_favoritos_projeto', RL_Favoritos.id_projeto)
+
+# Home personalizada: feed do usuário já na ordem de exibição
+db.Index('ix_tb_feed_user_data', TB_Feed.id_user, TB_Feed.data_hora.desc().nullslast())
+
+# Sininho: notificações do usuário por data, e contagem das não lidas (índice parcial)
+db.Index('ix_tb_notificacoes_user_data', TB_Notificacao.id_user, TB_Notificacao.data_hora.desc())
+db.Index('ix_tb_notificacoes_nao_lidas', TB_Notificacao.id_user, postgresql_where=(TB_Notificacao.lida == False))
+
+# Agrupamento e "já notificado deste projeto" (a idempotência fica em tb_notificacoes_cobertura)
+db.Index('ix_tb_notificacoes_user_projeto', TB_Notificacao.id_user, TB_Notificacao.id_projeto)
+
+# Fila do dispatcher: só os eventos pendentes, na ordem de chegada
+db.Index('ix_tb_eventos_notificacao_pendentes', TB_EventoNotificacao.id, postgresql_where=TB_EventoNotificacao.entregue_em.is_(None))
+# Ordem por projeto: "há evento pendente mais antigo deste projeto?" (app.dispatcher)
+db.Index('ix_tb_eventos_notificacao_projeto_pendentes', TB_EventoNotificacao.id_projeto, TB_EventoNotificacao.id,
+         postgresql_where=TB_EventoNotificacao.entregue_em.is_(None))
+
+# GET /api/sync: "o que mudou depois da versão X" vira leitura por faixa
+db.Index('ix_tb_projeto_versao', TB_Projeto.versao)
+db.Index('ix_rl_favoritos_user_versao', RL_Favoritos.id_user, RL_Favoritos.versao)
+# Favoritos alterados desde a última passada do worker (contagem de seguidores do resumo)
+db.Index('ix_rl_favoritos_versao', RL_Favoritos.versao)
+db.Index('ix_tb_notificacoes_user_versao', TB_Notificacao.id_user, TB_Notificacao.versao)
+db.Index('ix_tb_remocoes_user_versao', TB_Remocao.id_user, TB_Remocao.versao)
@@ -0,0 +1,319 @@
+"""
+Geração das notificações (fan-out feito por app.dispatcher a partir da outbox).
+
+Movimentação de projeto favoritado (notificar_tramitacoes). Cada chamada é
+idempotente e agrupa por (usuário, projeto):
+
+  - tb_notificacoes_cobertura guarda a maior sequência já notificada por
+    (usuário, projeto). Só quem ainda não cobre a tramitação segue adiante:
+    uma tramitação já coberta nunca gera outra linha, mesmo que o dispatcher
+    reprocesse um evento depois de uma falha parcial. A chave primária da
+    cobertura garante isso também sob concorrência (tb_notificacoes é
+    particionada e não tem índice único sem data_hora);
+  - se o seguidor ainda tem uma notificação não lida do projeto dentro da
+    janela NOTIFICACOES_JANELA_HORAS, ela é atualizada ("3 novas tramitações")
+    e mantém o id; o gatilho de app.sincronizacao dá a ela uma versão nova, e
+    é por ela que o stream SSE e o GET /api/sync reenviam a notificação;
+  - senão, uma linha nova é inserida.
+
+data_hora é o momento em que a notificação foi criada ou agrupada (não o da
+tramitação), então ela cai na partição do mês corrente. Tudo é feito num
+statement set-based por projeto, sem carregar os seguidores no Python.
+
+Uso:
+    python -m app.notificacoes    # cria a tabela de cobertura (idempotente)
+
+Projeto novo em tema de interesse (notificar_temas). O dispatcher mantém em
+memória um índice invertido tema -> ids de usuários (IndiceInteresses),
+arrays ordenados de int32 (~4 bytes por interesse: 100k usuários com 5
+temas cada ocupam ~2 MB). Os projetos novos do ciclo são cruzados com ele
+numa passada só e as notificações vão para o banco em lote.
+"""
+import heapq
+import os
+import threading
+from array import array
+from collections import defaultdict
+from sqlalchemy import text
+from sqlalchemy.schema import CreateTable
+from .banco import db
+from .models import TB_NotificacaoCobertura
+from .stream import sinalizar_usuarios
+
+JANELA_HORAS = int(os.getenv('NOTIFICACOES_JANELA_HORAS', '24'))
+LOTE_TEMAS = int(os.getenv('NOTIFICACOES_LOTE_TEMAS', '20000'))
+
+# Tramitações do lote ainda não cobertas pela notificação (o UPDATE não aceita LATERAL sobre a própria tabela)
+_NOVAS = "(SELECT count(*) FROM unnest(CAST(:sequencias AS integer[])) s WHERE s > n.sequencia)"
+
+SQL_NOTIFICAR = text("""
+    WITH cobertos AS (
+        -- Avança a sequência coberta de cada seguidor; quem já cobre :sequencia fica de fora.
+        -- A linha fica travada até o commit: outro fan-out do mesmo par espera e reavalia
+        INSERT INTO usuarios.tb_notificacoes_cobertura AS c (id_user, id_projeto, sequencia)
+        SELECT f.id_user, f.id_projeto, :sequencia
+        FROM usuarios.rl_favoritos f
+        WHERE f.id_projeto = :id_projeto
+        ON CONFLICT (id_user, id_projeto) DO UPDATE SET sequencia = EXCLUDED.sequencia
+        WHERE c.sequencia < EXCLUDED.sequencia
+        RETURNING c.id_user
+    ),
+    agrupados AS (
+        UPDATE usuarios.tb_notificacoes n
+        SET titulo = :titulo,
+            descricao = (n.qtd_tramitacoes + {novas}) || ' novas tramitações. Última: ' || :situacao,
+            data_hora = now(),
+            sequencia = :sequencia,
+            qtd_tramitacoes = n.qtd_tramitacoes + {novas}
+        FROM cobertos c
+        WHERE n.id_user = c.id_user
+          AND n.id_projeto = :id_projeto
+          AND n.lida IS NOT TRUE
+          AND n.sequencia < :sequencia
+          AND n.data_hora >= now() - make_interval(hours => :janela)
+          AND NOT EXISTS (
+              SELECT 1 FROM usuarios.tb_notificacoes mais_nova
+              WHERE mais_nova.id_user = n.id_user AND mais_nova.id_projeto = n.id_projeto AND mais_nova.id > n.id
+          )
+        RETURNING n.id_user
+    ),
+    inseridos AS (
+        INSERT INTO usuarios.tb_notificacoes (
+            id_user, id_projeto, titulo, descricao, data_hora, lida, sequencia, qtd_tramitacoes
+        )
+        SELECT c.id_user, :id_projeto, :titulo, :descricao, now(), false, :sequencia, :qtd
+        FROM cobertos c
+        WHERE NOT EXISTS (SELECT 1 FROM agrupados a WHERE a.id_user = c.id_user)
+        RETURNING id_user
+    )
+    SELECT id_user FROM agrupados
+    UNION ALL
+    SELECT id_user FROM inseridos
+""".format(novas=_NOVAS))
+
+
+def instalar():
+    """
+    Cria tb_notificacoes_cobertura, preenchida com o que as notificações existentes já cobrem,
+    e remove o antigo índice "único" de tb_notificacoes (incluía data_hora, não garantia nada).
+    """
+    with db.engine.begin() as conn:
+        conn.execute(CreateTable(TB_NotificacaoCobertura.__table__, if_not_exists=True))
+        qtd = conn.execute(text("""
+            INSERT INTO usuarios.tb_notificacoes_cobertura (id_user, id_projeto, sequencia)
+            SELECT id_user, id_projeto, max(sequencia)
+            FROM usuarios.tb_notificacoes
+            WHERE sequencia IS NOT NULL AND id_projeto IS NOT NULL
+            GROUP BY id_user, id_projeto
+            ON CONFLICT DO NOTHING
+        """)).rowcount
+        conn.execute(text("DROP INDEX IF EXISTS usuarios.uq_tb_notificacoes_idempotencia"))
+    print(f"NOTIFICACOES: Cobertura pronta ({qtd} pares usuário/projeto importados).")
+
+
+def _descricao(qtd, situacao):
+    if qtd == 1:
+        return f"Nova tramitação: {situacao}"
+    return f"{qtd} novas tramitações. Última: {situacao}"
+
+
+SQL_CONTEXTO = text("""
+    SELECT p.titulo_projeto, s.ds_situacao
+    FROM camara.tb_projeto p
+    JOIN camara.rl_tramitacoes t ON t.id_projeto = p.id_projeto AND t.sequencia = :sequencia
+    LEFT JOIN camara.tp_situacao s ON s.id_situacao = t.id_situacao
+    WHERE p.id_projeto = :id_projeto
+    LIMIT 1
+""")
+
+
+def notificar_tramitacoes(id_projeto, sequencias, janela_horas=JANELA_HORAS):
+    """
+    Notifica quem favoritou o projeto sobre as tramitações novas (`sequencias`, já gravadas
+    em rl_tramitacoes). Não faz commit; o NOTIFY para o SSE só é entregue no commit do chamador.
+    Retorna quantos usuários foram notificados.
+    """
+    if not sequencias:
+        return 0
+
+    sequencia = max(sequencias)
+    contexto = db.session.execute(SQL_CONTEXTO, {"id_projeto": id_projeto, "sequencia": sequencia}).first()
+    if contexto is None:
+        return 0
+    titulo_projeto, situacao = contexto
+    situacao = situacao or "Atualização"
+    parametros = {
+        "id_projeto": id_projeto,
+        "titulo": f"Movimentação: {(titulo_projeto or '')[:30]}...",
+        "situacao": situacao,
+        "sequencia": sequencia,
+        "sequencias": sorted(sequencias),
+        "qtd": len(sequencias),
+        "descricao": _descricao(len(sequencias), situacao),
+        "janela": janela_horas,
+    }
+
+    usuarios = set(db.session.scalars(SQL_NOTIFICAR, parametros).all())
+    if usuarios:
+        sinalizar_usuarios(db.session, usuarios)
+    return len(usuarios)
+
+
+# ============================================================================
+# ALERTAS POR TEMA DE INTERESSE
+# ============================================================================
+
+class IndiceInteresses:
+    """
+    Índice invertido id_tema -> array('i') ordenado com os ids dos usuários que seguem o tema.
+
+    atualizar() compara a impressão digital de tb_interesses (quantidade de linhas e maior id):
+    se só entraram linhas novas, elas são intercaladas nos arrays; se alguma saiu (a rota de
+    interesses troca o conjunto inteiro do usuário), o índice é reconstruído com um GROUP BY.
+    """
+
+    def __init__(self):
+        self.usuarios_por_tema = {}
+        self._impressao = None
+        self._lock = threading.Lock()
+
+    def _reconstruir(self):
+        linhas = db.session.execute(text("""
+            SELECT id_interesse, array_agg(id_user ORDER BY id_user)
+            FROM usuarios.tb_interesses
+            GROUP BY id_interesse
+        """))
+        self.usuarios_por_tema = {id_tema: array('i', ids) for id_tema, ids in linhas}
+
+    def _acrescentar(self, desde_id):
+        novos = defaultdict(list)
+        linhas = db.session.execute(text(
+            "SELECT id_interesse, id_user FROM usuarios.tb_interesses WHERE id > :desde ORDER BY id_user"
+        ), {"desde": desde_id})
+        qtd = 0
+        for id_tema, id_user in linhas:
+            novos[id_tema].append(id_user)
+            qtd += 1
+        for id_tema, ids in novos.items():
+            atuais = self.usuarios_por_tema.get(id_tema, array('i'))
+            # (usuário, tema) é único e só houve inserções: a intercalação não gera repetidos
+            self.usuarios_por_tema[id_tema] = array('i', heapq.merge(atuais, ids))
+        return qtd
+
+    def atualizar(self):
+        """Sincroniza com tb_interesses. Retorna True se o índice mudou."""
+        with self._lock:
+            return self._atualizar()
+
+    def _atualizar(self):
+        impressao = tuple(db.session.execute(text(
+            "SELECT count(*), coalesce(max(id), 0) FROM usuarios.tb_interesses"
+        )).one())
+        if impressao == self._impressao:
+            return False
+
+        anterior = self._impressao
+        if anterior and impressao[1] > anterior[1] and impressao[0] > anterior[0]:
+            if self._acrescentar(anterior[1]) == impressao[0] - anterior[0]:
+                self._impressao = impressao
+                print(f"DISPATCHER: Índice de interesses atualizado (+{impressao[0] - anterior[0]} linhas).")
+                return True
+
+        self._reconstruir()
+        self._impressao = impressao
+        print(f"DISPATCHER: Índice de interesses reconstruído ({impressao[0]} linhas, "
+              f"{len(self.usuarios_por_tema)} temas).")
+        return True
+
+    def usuarios(self, ids_temas):
+        """
+        Usuários que seguem algum dos temas, cada um uma vez só, com o primeiro tema que casou.
+        Devolve dois arrays paralelos (ids_user, ids_tema).
+        """
+        ids_user, ids_tema = array('i'), array('i')
+        vistos = set()
+        for id_tema in ids_temas:
+            for id_user in self.usuarios_por_tema.get(id_tema, ()):
+                if id_user not in vistos:
+                    vistos.add(id_user)
+                    ids_user.append(id_user)
+                    ids_tema.append(id_tema)
+        return ids_user, ids_tema
+
+
+indice_interesses = IndiceInteresses()
+
+SQL_INSERIR_TEMAS = text("""
+    INSERT INTO usuarios.tb_notificacoes (
+        id_user, id_projeto, titulo, descricao, data_hora, lida, qtd_tramitacoes
+    )
+    SELECT a.id_user, a.id_projeto,
+           'Novo projeto: ' || left(coalesce(p.titulo_projeto, ''), 30) || '...',
+           'Tema de interesse: ' || t.ds_tema,
+           now(), false, 0
+    FROM unnest(CAST(:ids_user AS integer[]), CAST(:ids_projeto AS integer[]), CAST(:ids_tema AS integer[]))
+         AS a(id_user, id_projeto, id_tema)
+    JOIN camara.tb_projeto p ON p.id_projeto = a.id_projeto
+    JOIN camara.tp_temas t ON t.id_tema = a.id_tema
+    WHERE NOT EXISTS (
+        SELECT 1 FROM usuarios.tb_notificacoes n
+        WHERE n.id_user = a.id_user AND n.id_projeto = a.id_projeto
+    )
+    RETURNING id_user
+""")
+
+
+def notificar_temas(ids_projetos, indice=indice_interesses, tamanho_lote=LOTE_TEMAS):
+    """
+    Avisa quem segue os temas dos projetos novos. Um SELECT traz os temas de todos os
+    projetos, o cruzamento é feito no índice em memória e as notificações são inseridas
+    em lotes de `tamanho_lote`. Reexecutar não duplica: quem já tem notificação do projeto
+    é ignorado. Não faz commit. Retorna quantas notificações foram criadas.
+    """
+    if not ids_projetos:
+        return 0
+    indice.atualizar()
+
+    temas_por_projeto = db.session.execute(text("""
+        SELECT id_projeto, array_agg(id_tema ORDER BY id_tema)
+        FROM camara.rl_temas
+        WHERE id_projeto = ANY(CAST(:ids AS integer[]))
+        GROUP BY id_projeto
+    """), {"ids": sorted(ids_projetos)}).all()
+
+    lote = {"ids_user": array('i'), "ids_projeto": array('i'), "ids_tema": array('i')}
+    notificados = set()
+    criadas = 0
+
+    def gravar():
+        nonlocal criadas
+        if not lote["ids_user"]:
+            return
+        ids = db.session.scalars(SQL_INSERIR_TEMAS, {chave: list(v) for chave, v in lote.items()}).all()
+        notificados.update(ids)
+        criadas += len(ids)
+        for v in lote.values():
+            del v[:]
+
+    for id_projeto, ids_temas in temas_por_projeto:
+        ids_user, ids_tema = indice.usuarios(ids_temas)
+        lote["ids_user"].extend(ids_user)
+        lote["ids_tema"].extend(ids_tema)
+        lote["ids_projeto"].extend(array('i', [id_projeto]) * len(ids_user))
+        if len(lote["ids_user"]) >= tamanho_lote:
+            gravar()
+    gravar()
+
+    if notificados:
+        sinalizar_usuarios(db.session, notificados)
+    return criadas
+
+
+if __name__ == "__main__":
+    from . import criar_app_dados
+
+    app = criar_app_dados('worker')
+    with app.app_context():
+        print("--- [NOTIFICACOES] INICIANDO ---")
+        instalar()
+        print("--- [NOTIFICACOES] CONCLUÍDO ---")
@@ -0,0 +1,258 @@
+"""
+Orçamento de consultas SQL por endpoint (detector de N+1).
+
+Popula um banco DESCARTÁVEL em dois tamanhos, chama cada rota de routes.py e
+auth.py pelo cliente de teste do Flask e conta os statements executados
+(app.profiling.contar_consultas). Falha (exit 1) se um endpoint:
+
+  - passar do orçamento declarado em ORCAMENTOS; ou
+  - executar mais consultas no tamanho maior do que no menor, sinal de que
+    o número de consultas cresce com o tamanho do resultado (N+1).
+
+Uso:
+    python -m app.orcamento_consultas --confirmar
+"""
+import argparse
+import sys
+from sqlalchemy import text
+from .extensions import db
+from .facetas import cache_facetas
+from .feed import reconstruir_feed_usuario
+from .profiling import contar_consultas
+from .sincronizacao import emitir_token
+from .sintetico import EMAIL_PADRAO, SENHA_PADRAO, popular
+
+# Dois tamanhos: escala da massa sintética e quantidade de itens do usuário/projeto de amostra
+# (favoritos, interesses, notificações e tramitações). Itens abaixo do LIMIT das listagens (50).
+TAMANHOS = [
+    {"escala": 0.02, "itens": 3},
+    {"escala": 0.1, "itens": 30},
+]
+
+# Máximo de statements por requisição. Ajuste junto com a rota quando a mudança for intencional.
+ORCAMENTOS = {
+    "POST /auth/registrar": 2,
+    "POST /auth/login": 1,
+    "GET /auth/me": 1,
+    "POST /auth/refresh": 0,
+    "POST /auth/logout": 0,
+    "POST /api/projetos": 1,
+    "POST /api/projetos (ids_temas)": 1,
+    "POST /api/projetos (facetas)": 2,
+    "GET /api/projetos/<id>": 3,
+    "GET /api/projetos/<id>/semelhantes": 1,
+    "POST /api/projetos/lote": 1,
+    "GET /api/exportar": 1,
+    "GET /api/feed": 1,
+    "GET /api/favoritos": 1,
+    "POST /api/favoritar/<id> (adiciona)": 3,
+    "POST /api/favoritar/<id> (remove)": 3,
+    "POST /api/favoritos/lote (remove)": 1,
+    "POST /api/favoritos/lote (adiciona)": 1,
+    "GET /api/temas": 1,
+    "GET /api/usuario/interesses": 1,
+    "POST /api/usuario/interesses": 4,
+    "GET /api/notificacoes": 1,
+    "POST /api/notificacoes/<id>/ler": 1,
+    "GET /api/sync": 5,
+    "GET /api/painel/atividade": 1,
+    "GET /api/painel/situacoes": 1,
+    "GET /api/painel/temas": 1,
+    "GET /api/painel/orgaos": 1,
+}
+
+# Rotas que não entram na medição, com o motivo
+IGNORADAS = {
+    "api.stream_notificacoes": "resposta SSE não termina; a consulta por evento já é verificada em app.verificar_planos",
+}
+
+ID_USER = 1
+ID_PROJETO = 1
+
+
+def _preparar_amostra(itens):
+    """Dá ao usuário e ao projeto de amostra exatamente `itens` linhas em cada relação listada."""
+    parametros = {"id_user": ID_USER, "id_projeto": ID_PROJETO, "itens": itens}
+    db.session.execute(text("DELETE FROM usuarios.rl_favoritos WHERE id_user = :id_user"), parametros)
+    db.session.execute(text("""
+        INSERT INTO usuarios.rl_favoritos (id_user, id_projeto)
+        SELECT :id_user, g FROM generate_series(1, :itens) g
+    """), parametros)
+
+    db.session.execute(text("DELETE FROM usuarios.tb_interesses WHERE id_user = :id_user"), parametros)
+    db.session.execute(text("""
+        INSERT INTO usuarios.tb_interesses (id_user, id_interesse)
+        SELECT :id_user, id_tema FROM camara.tp_temas ORDER BY id_tema LIMIT :itens
+    """), parametros)
+    reconstruir_feed_usuario(ID_USER)
+
+    db.session.execute(text("DELETE FROM usuarios.tb_notificacoes WHERE id_user = :id_user"), parametros)
+    db.session.execute(text("""
+        INSERT INTO usuarios.tb_notificacoes (id_user, id_projeto, titulo, descricao, data_hora, lida)
+        SELECT :id_user, :id_projeto, 'Movimentação: PL sintético', 'Nova tramitação: Atualização',
+               now() - g * interval '1 hour', false
+        FROM generate_series(1, :itens) g
+    """), parametros)
+
+    db.session.execute(text("DELETE FROM camara.rl_tramitacoes WHERE id_projeto = :id_projeto"), parametros)
+    db.session.execute(text("""
+        INSERT INTO camara.rl_tramitacoes (id_projeto, sequencia, data_hora, id_situacao, id_tramitacao)
+        SELECT :id_projeto, g, now() - (:itens - g) * interval '1 day',
+               (SELECT min(id_situacao) FROM camara.tp_situacao),
+               (SELECT min(id_tramitacao) FROM camara.tp_tramitacao)
+        FROM generate_series(1, :itens) g
+    """), parametros)
+    db.session.commit()
+
+
+def _parametros_amostra():
+    """Ids usados nas requisições, lidos antes da medição para não entrarem na contagem."""
+    return {
+        "ids_temas": db.session.scalars(text(
+            "SELECT id_interesse FROM usuarios.tb_interesses WHERE id_user = :id_user"
+        ), {"id_user": ID_USER}).all(),
+        "id_notificacao": db.session.scalar(text(
+            "SELECT max(id) FROM usuarios.tb_notificacoes WHERE id_user = :id_user"
+        ), {"id_user": ID_USER}),
+        # Desde o início: todas as listas do sync vêm cheias (até o limite)
+        "token_sync": emitir_token(0),
+    }
+
+
+def _requisicoes(itens, amostra):
+    """
+    Lista (nome, endpoint, método, caminho, corpo, autenticada) na ordem de execução.
+    O login vem antes das rotas autenticadas porque fornece o token; autenticada =
+    "refresh" usa o refresh token. O logout vem por último porque revoga os dois.
+    """
+    return [
+        ("POST /auth/registrar", "auth.registrar", "POST", "/auth/registrar", {
+            "username": f"orcamento{itens}", "email": f"orcamento{itens}@legitrack.test", "password": SENHA_PADRAO
+        }, False),
+        ("POST /auth/login", "auth.login", "POST", "/auth/login", {
+            "email": EMAIL_PADRAO.format(n=ID_USER), "password": SENHA_PADRAO
+        }, False),
+        ("GET /auth/me", "auth.get_current_user", "GET", "/auth/me", None, True),
+        ("POST /api/projetos", "api.listar_projetos", "POST", "/api/projetos", {}, True),
+        ("POST /api/projetos (ids_temas)", "api.listar_projetos", "POST", "/api/projetos",
+         {"ids_temas": amostra["ids_temas"]}, True),
+        ("POST /api/projetos (facetas)", "api.listar_projetos", "POST", "/api/projetos",
+         {"ids_temas": amostra["ids_temas"], "facetas": True}, True),
+        ("GET /api/projetos/<id>", "api.detalhes_projeto", "GET", f"/api/projetos/{ID_PROJETO}", None, True),
+        ("GET /api/projetos/<id>/semelhantes", "api.listar_semelhantes", "GET",
+         f"/api/projetos/{ID_PROJETO}/semelhantes", None, True),
+        ("POST /api/projetos/lote", "api.lote_projetos", "POST", "/api/projetos/lote",
+         {"ids": list(range(1, itens + 1))}, True),
+        ("GET /api/exportar", "api.exportar_projetos", "GET", "/api/exportar?formato=csv", None, True),
+        ("GET /api/feed", "api.listar_feed", "GET", "/api/feed", None, True),
+        ("GET /api/favoritos", "api.listar_favoritos", "GET", "/api/favoritos", None, True),
+        # O projeto de amostra é favorito: o primeiro toggle remove, o segundo devolve o estado
+        ("POST /api/favoritar/<id> (remove)", "api.toggle_favorito", "POST", f"/api/favoritar/{ID_PROJETO}", None, True),
+        ("POST /api/favoritar/<id> (adiciona)", "api.toggle_favorito", "POST", f"/api/favoritar/{ID_PROJETO}", None, True),
+        # Remove e devolve todos os favoritos da amostra numa chamada (o estado final é o mesmo)
+        ("POST /api/favoritos/lote (remove)", "api.lote_favoritos", "POST", "/api/favoritos/lote",
+         {"remover": list(range(1, itens + 1))}, True),
+        ("POST /api/favoritos/lote (adiciona)", "api.lote_favoritos", "POST", "/api/favoritos/lote",
+         {"adicionar": list(range(1, itens + 1))}, True),
+        ("GET /api/temas", "api.listar_temas", "GET", "/api/temas", None, False),
+        ("GET /api/usuario/interesses", "api.gerenciar_interesses", "GET", "/api/usuario/interesses", None, True),
+        ("POST /api/usuario/interesses", "api.gerenciar_interesses", "POST", "/api/usuario/interesses",
+         {"ids_temas": amostra["ids_temas"]}, True),
+        ("GET /api/notificacoes", "api.listar_notificacoes", "GET", "/api/notificacoes", None, True),
+        ("POST /api/notificacoes/<id>/ler", "api.marcar_notificacao_lida", "POST",
+         f"/api/notificacoes/{amostra['id_notificacao']}/ler", None, True),
+        ("GET /api/sync", "api.sincronizar", "GET", f"/api/sync?since={amostra['token_sync']}", None, True),
+        ("GET /api/painel/atividade", "painel.atividade_mensal", "GET", "/api/painel/atividade", None, True),
+        ("GET /api/painel/situacoes", "painel.distribuicao_situacoes", "GET", "/api/painel/situacoes", None, True),
+        ("GET /api/painel/temas", "painel.vazao_temas", "GET", "/api/painel/temas", None, True),
+        ("GET /api/painel/orgaos", "painel.orgaos_mais_ativos", "GET", "/api/painel/orgaos", None, True),
+        ("POST /auth/refresh", "auth.renovar_token", "POST", "/auth/refresh", None, "refresh"),
+        ("POST /auth/logout", "auth.logout", "POST", "/auth/logout", None, True),
+    ]
+
+
+def rotas_sem_orcamento(app):
+    """Endpoints dos blueprints api/auth/painel que não são medidos nem estão em IGNORADAS."""
+    cobertos = {endpoint for _, endpoint, *_ in _requisicoes(0, {"ids_temas": [], "id_notificacao": 0, "token_sync": ""})}
+    return sorted(
+        regra.endpoint for regra in app.url_map.iter_rules()
+        if regra.endpoint.split(".")[0] in ("api", "auth", "painel")
+        and regra.endpoint not in cobertos and regra.endpoint not in IGNORADAS
+    )
+
+
+def medir(app, itens):
+    """Executa todas as requisições e devolve {nome: quantidade de statements}."""
+    cliente = app.test_client()
+    amostra = _parametros_amostra()
+    # Facetas em cache esconderiam o agregado no segundo tamanho
+    cache_facetas.limpar()
+
+    headers = {}
+    headers_refresh = {}
+    contagens = {}
+    for nome, _, metodo, caminho, corpo, autenticada in _requisicoes(itens, amostra):
+        # O cliente de teste reaproveita o app context daqui: sessão limpa para o identity map não esconder consultas
+        db.session.remove()
+        with contar_consultas() as contador:
+            # buffered: respostas em streaming são lidas inteiras dentro da contagem
+            resposta = cliente.open(caminho, method=metodo, json=corpo,
+                                    headers=headers_refresh if autenticada == "refresh" else headers if autenticada else {},
+                                    buffered=True)
+        if resposta.status_code >= 400:
+            raise RuntimeError(f"{nome} respondeu {resposta.status_code}: {resposta.get_data(as_text=True)[:200]}")
+        if nome in ("POST /auth/login", "POST /auth/refresh"):
+            headers["Authorization"] = f"Bearer {resposta.get_json()['access_token']}"
+            headers_refresh["Authorization"] = f"Bearer {resposta.get_json()['refresh_token']}"
+        contagens[nome] = contador.consultas
+    return contagens
+
+
+def verificar(app):
+    """Mede nos dois tamanhos e devolve a lista de falhas (texto)."""
+    falhas = [f"{endpoint}: rota sem orçamento declarado" for endpoint in rotas_sem_orcamento(app)]
+    for falha in falhas:
+        print(f"ORCAMENTO: [FALHOU] {falha}")
+
+    medicoes = []
+    for tamanho in TAMANHOS:
+        popular(tamanho["escala"])
+        _preparar_amostra(tamanho["itens"])
+        medicoes.append(medir(app, tamanho["itens"]))
+
+    pequeno, grande = medicoes
+    for nome, orcamento in ORCAMENTOS.items():
+        qtd_pequeno, qtd_grande = pequeno[nome], grande[nome]
+        problemas = []
+        if max(qtd_pequeno, qtd_grande) > orcamento:
+            problemas.append(f"acima do orçamento ({max(qtd_pequeno, qtd_grande)} > {orcamento})")
+        if qtd_grande > qtd_pequeno:
+            problemas.append(f"cresce com o tamanho ({qtd_pequeno} -> {qtd_grande})")
+        status = "FALHOU" if problemas else "ok"
+        print(f"ORCAMENTO: [{status}] {nome}: {qtd_pequeno} / {qtd_grande} consultas (orçamento {orcamento})"
+              + (f" -> {'; '.join(problemas)}" if problemas else ""))
+        if problemas:
+            falhas.append(f"{nome}: {'; '.join(problemas)}")
+    return falhas
+
+
+if __name__ == "__main__":
+    from . import create_app
+
+    parser = argparse.ArgumentParser(description="Verifica o orçamento de consultas SQL de cada endpoint.")
+    parser.add_argument("--confirmar", action="store_true", help="Confirma que o banco é descartável (a carga apaga os dados)")
+    args = parser.parse_args()
+
+    if not args.confirmar:
+        print("ORCAMENTO: A carga sintética APAGA projetos, usuários e notificações. Use --confirmar em um banco descartável.")
+        sys.exit(2)
+
+    # Perfil worker: a carga sintética passa do statement_timeout da API
+    app = create_app('worker')
+    with app.app_context():
+        falhas = verificar(app)
+
+    if falhas:
+        print(f"ORCAMENTO: {len(falhas)} endpoint(s) fora do orçamento.")
+        sys.exit(1)
+    print("ORCAMENTO: Todos os endpoints dentro do orçamento.")
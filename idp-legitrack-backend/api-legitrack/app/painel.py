@@ -0,0 +1,235 @@
+"""
+Rotas do painel de atividade legislativa.
+
+Todas leem só os agregados de app.agregados (dia × situação × tema e
+dia × órgão), nunca rl_tramitacoes: o custo depende do período pedido, não do
+tamanho do histórico. Período padrão: os últimos PAINEL_PERIODO_DIAS dias.
+"""
+import os
+from datetime import date, timedelta
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required
+from .extensions import db
+from .models import TB_AtividadeDiaria, TB_AtividadeOrgao, TP_Situacao, TP_Temas
+from .serializacao import resposta_json
+
+bp = Blueprint('painel', __name__, url_prefix='/api/painel')
+
+PERIODO_DIAS = int(os.getenv('PAINEL_PERIODO_DIAS', '365'))
+LIMITE_ORGAOS = int(os.getenv('PAINEL_LIMITE_ORGAOS', '20'))
+
+# ============================================================================
+# FUNÇÕES AUXILIARES
+# ============================================================================
+
+def _filtros():
+    """
+    Lê de/ate (AAAA-MM-DD) e tema da query string.
+    ValueError com a mensagem para o usuário se algum for inválido.
+    """
+    try:
+        ate = date.fromisoformat(request.args["ate"]) if request.args.get("ate") else date.today()
+        de = date.fromisoformat(request.args["de"]) if request.args.get("de") else ate - timedelta(days=PERIODO_DIAS)
+        id_tema = int(request.args.get("tema") or 0)
+    except ValueError:
+        raise ValueError("Filtros inválidos: de e ate são AAAA-MM-DD; tema é número")
+    if de > ate:
+        raise ValueError("Filtros inválidos: de é posterior a ate")
+    return de, ate, id_tema
+
+def _total():
+    return db.func.sum(TB_AtividadeDiaria.qtd_tramitacoes)
+
+def consulta_atividade(de, ate, id_tema=0):
+    mes = db.func.date_trunc('month', TB_AtividadeDiaria.dia)
+    return (
+        db.select(mes, _total())
+        .filter(TB_AtividadeDiaria.id_tema == id_tema, TB_AtividadeDiaria.dia.between(de, ate))
+        .group_by(mes)
+        .order_by(mes)
+    )
+
+def consulta_situacoes(de, ate, id_tema=0):
+    return (
+        db.select(TB_AtividadeDiaria.id_situacao, TP_Situacao.ds_situacao, _total())
+        .outerjoin(TP_Situacao, TP_Situacao.id_situacao == TB_AtividadeDiaria.id_situacao)
+        .filter(TB_AtividadeDiaria.id_tema == id_tema, TB_AtividadeDiaria.dia.between(de, ate))
+        .group_by(TB_AtividadeDiaria.id_situacao, TP_Situacao.ds_situacao)
+        .order_by(_total().desc())
+    )
+
+def consulta_temas(de, ate):
+    return (
+        db.select(TB_AtividadeDiaria.id_tema, TP_Temas.ds_tema, _total())
+        .join(TP_Temas, TP_Temas.id_tema == TB_AtividadeDiaria.id_tema)
+        .filter(TB_AtividadeDiaria.dia.between(de, ate))
+        .group_by(TB_AtividadeDiaria.id_tema, TP_Temas.ds_tema)
+        .order_by(_total().desc())
+    )
+
+def consulta_orgaos(de, ate, limite=LIMITE_ORGAOS):
+    total = db.func.sum(TB_AtividadeOrgao.qtd_tramitacoes)
+    return (
+        db.select(TB_AtividadeOrgao.sigla_orgao, total)
+        .filter(TB_AtividadeOrgao.dia.between(de, ate))
+        .group_by(TB_AtividadeOrgao.sigla_orgao)
+        .order_by(total.desc())
+        .limit(limite)
+    )
+
+def _periodo(de, ate):
+    return {"de": de.isoformat(), "ate": ate.isoformat()}
+
+# ============================================================================
+# ROTAS
+# ============================================================================
+
+@bp.route("/atividade", methods=["GET"])
+@jwt_required()
+def atividade_mensal():
+    """
+    Tramitações por mês
+    ---
+    tags:
+      - Painel
+    security:
+      - Bearer: []
+    parameters:
+      - name: de
+        in: query
+        type: string
+        description: Início do período (AAAA-MM-DD); padrão, um ano antes de 'ate'
+      - name: ate
+        in: query
+        type: string
+        description: Fim do período (AAAA-MM-DD); padrão, hoje
+      - name: tema
+        in: query
+        type: integer
+        description: Só tramitações de projetos deste tema
+    responses:
+      200:
+        description: Quantidade de tramitações por mês do período
+      400:
+        description: Filtros inválidos
+    """
+    try:
+        de, ate, id_tema = _filtros()
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+    linhas = db.session.execute(consulta_atividade(de, ate, id_tema)).all()
+    return resposta_json({
+        "periodo": _periodo(de, ate),
+        "meses": [{"mes": mes.strftime("%Y-%m"), "tramitacoes": qtd} for mes, qtd in linhas],
+    })
+
+@bp.route("/situacoes", methods=["GET"])
+@jwt_required()
+def distribuicao_situacoes():
+    """
+    Distribuição das tramitações por situação
+    ---
+    tags:
+      - Painel
+    security:
+      - Bearer: []
+    parameters:
+      - name: de
+        in: query
+        type: string
+      - name: ate
+        in: query
+        type: string
+      - name: tema
+        in: query
+        type: integer
+    responses:
+      200:
+        description: Tramitações por situação no período, da mais frequente para a menos
+      400:
+        description: Filtros inválidos
+    """
+    try:
+        de, ate, id_tema = _filtros()
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+    linhas = db.session.execute(consulta_situacoes(de, ate, id_tema)).all()
+    return resposta_json({
+        "periodo": _periodo(de, ate),
+        "situacoes": [
+            {"id_situacao": id_situacao, "situacao": situacao or "", "tramitacoes": qtd}
+            for id_situacao, situacao, qtd in linhas
+        ],
+    })
+
+@bp.route("/temas", methods=["GET"])
+@jwt_required()
+def vazao_temas():
+    """
+    Tramitações por tema
+    ---
+    tags:
+      - Painel
+    security:
+      - Bearer: []
+    parameters:
+      - name: de
+        in: query
+        type: string
+      - name: ate
+        in: query
+        type: string
+    responses:
+      200:
+        description: >
+          Tramitações por tema no período. Um projeto com vários temas conta em
+          cada um, então a soma pode passar do total de /atividade.
+      400:
+        description: Filtros inválidos
+    """
+    try:
+        de, ate, _ = _filtros()
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+    linhas = db.session.execute(consulta_temas(de, ate)).all()
+    return resposta_json({
+        "periodo": _periodo(de, ate),
+        "temas": [{"id_tema": id_tema, "tema": tema, "tramitacoes": qtd} for id_tema, tema, qtd in linhas],
+    })
+
+@bp.route("/orgaos", methods=["GET"])
+@jwt_required()
+def orgaos_mais_ativos():
+    """
+    Órgãos com mais tramitações
+    ---
+    tags:
+      - Painel
+    security:
+      - Bearer: []
+    parameters:
+      - name: de
+        in: query
+        type: string
+      - name: ate
+        in: query
+        type: string
+    responses:
+      200:
+        description: Os órgãos (sigla) com mais tramitações no período
+      400:
+        description: Filtros inválidos
+    """
+    try:
+        de, ate, _ = _filtros()
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+    linhas = db.session.execute(consulta_orgaos(de, ate)).all()
+    return resposta_json({
+        "periodo": _periodo(de, ate),
+        "orgaos": [{"orgao": orgao, "tramitacoes": qtd} for orgao, qtd in linhas],
+    })
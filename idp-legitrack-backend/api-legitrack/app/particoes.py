@@ -0,0 +1,457 @@
+"""
+Particionamento por tempo das tabelas que mais crescem.
+
+usuarios.tb_notificacoes (RANGE mensal em data_hora):
+  - partições dos próximos meses criadas antes de serem necessárias, além de
+    uma partição DEFAULT de segurança;
+  - partições fora da janela de retenção expiram com DETACH + DROP (sem
+    DELETE longo nem bloat). Um mês que ainda tem não lidas só expira depois
+    de NOTIFICACOES_RETENCAO_NAO_LIDAS_MESES: a partição inteira espera, e
+    nada é copiado para a DEFAULT (que cresceria sem nunca expirar).
+
+camara.rl_tramitacoes (RANGE anual em data_hora):
+  - uma partição por ano do histórico, mais o ano seguinte. A carga em lote
+    (app.carga) e o worker criam os anos antigos antes de gravar o histórico;
+  - anos antigos dominados por projetos encerrados (situação final, ex.:
+    Arquivada) vão para o nível de arquivo: CLUSTER compacto (fillfactor 100),
+    VACUUM FREEZE e, se configurado, um tablespace barato. O CLUSTER segura um
+    lock ACCESS EXCLUSIVE na partição durante toda a reescrita (lock_timeout só
+    limita a espera para obtê-lo): leituras da timeline daquele ano ficam
+    bloqueadas. Por isso só roda dentro de TRAMITACOES_HORARIO_ARQUIVO.
+
+Linhas na partição DEFAULT impedem criar uma partição para a faixa delas;
+manter() as tira da DEFAULT (esvaziar_default) antes de criar partições.
+
+migrar() converte uma tabela antiga (não particionada) preservando os ids.
+O worker chama manter() uma vez por dia; o entrypoint chama na subida da API.
+
+Uso:
+    python -m app.particoes              # cria partições futuras, retenção e arquivamento
+    python -m app.particoes --arquivar   # idem, arquivando tramitações mesmo fora do horário
+    python -m app.particoes --migrar     # converte as tabelas antigas (bloqueia escritas durante a cópia)
+"""
+import argparse
+import os
+import re
+from datetime import date, datetime
+from sqlalchemy import text
+from sqlalchemy.schema import CreateTable
+from .banco import db
+from .indices import ddl_indice
+from .models import RL_Tramitacoes, TB_Notificacao
+
+NOTIFICACOES = TB_Notificacao.__table__
+TRAMITACOES = RL_Tramitacoes.__table__
+
+# Meses mantidos (o mês corrente conta como o primeiro) e meses criados adiantado
+RETENCAO_MESES = int(os.getenv('NOTIFICACOES_RETENCAO_MESES', '12'))
+MESES_A_FRENTE = int(os.getenv('NOTIFICACOES_MESES_A_FRENTE', '3'))
+# 'apagar' remove a partição expirada; 'desanexar' só a separa da tabela (para backup/pg_dump manual)
+MODO_EXPIRACAO = os.getenv('NOTIFICACOES_EXPIRACAO', 'apagar')
+# Retenção dos meses com notificações não lidas (menor ou igual a RETENCAO_MESES: nenhuma extensão)
+RETENCAO_NAO_LIDAS_MESES = int(os.getenv('NOTIFICACOES_RETENCAO_NAO_LIDAS_MESES', '24'))
+
+# Tramitações: anos recentes nunca são arquivados; um ano antigo é arquivado quando pelo menos
+# TRAMITACOES_FRACAO_ARQUIVADA das suas linhas são de projetos com situação final
+TRAMITACOES_ANOS_QUENTES = int(os.getenv('TRAMITACOES_ANOS_QUENTES', '3'))
+TRAMITACOES_FRACAO_ARQUIVADA = float(os.getenv('TRAMITACOES_FRACAO_ARQUIVADA', '0.9'))
+TRAMITACOES_TABLESPACE_ARQUIVO = os.getenv('TRAMITACOES_TABLESPACE_ARQUIVO')  # ex.: disco lento; vazio = mesmo disco
+SITUACOES_FINAIS = [
+    s.strip() for s in os.getenv(
+        'SITUACOES_FINAIS',
+        'Arquivada;Transformado em Norma Jurídica;Transformada em Norma Jurídica;Vetado totalmente;Perdeu a Eficácia'
+    ).split(';') if s.strip()
+]
+MARCA_ARQUIVO = 'legitrack:arquivo'
+# Horas (início-fim, hora local do servidor) em que o arquivamento pode rodar. O worker faz
+# a manutenção diária no primeiro ciclo do dia, dentro da janela padrão
+TRAMITACOES_HORARIO_ARQUIVO = os.getenv('TRAMITACOES_HORARIO_ARQUIVO', '0-6')
+
+# Postgres 13 não tem DETACH CONCURRENTLY: o DETACH pega um lock exclusivo rápido na tabela-mãe.
+# Se a API estiver segurando o lock, desiste e tenta de novo na próxima manutenção.
+LOCK_TIMEOUT = os.getenv('PARTICOES_LOCK_TIMEOUT', '5s')
+
+_RE_LIMITES = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+# ============================================================================
+# UTILITÁRIOS GENÉRICOS (qualquer tabela particionada por RANGE de data)
+# ============================================================================
+
+def somar_meses(dia, meses):
+    """Primeiro dia do mês `meses` à frente (ou atrás, se negativo) de `dia`."""
+    indice = dia.year * 12 + dia.month - 1 + meses
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def esta_particionada(tabela):
+    return bool(db.session.scalar(text("""
+        SELECT c.relkind = 'p'
+        FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = :schema AND c.relname = :nome
+    """), {"schema": tabela.schema, "nome": tabela.name}))
+
+
+def listar_particoes(tabela, conn=None):
+    """Lista (nome, inicio, fim) das partições de RANGE; a DEFAULT vem com inicio/fim None."""
+    linhas = (conn or db.session).execute(text("""
+        SELECT filha.relname, pg_get_expr(filha.relpartbound, filha.oid)
+        FROM pg_inherits h
+        JOIN pg_class mae ON mae.oid = h.inhparent
+        JOIN pg_namespace n ON n.oid = mae.relnamespace
+        JOIN pg_class filha ON filha.oid = h.inhrelid
+        WHERE n.nspname = :schema AND mae.relname = :nome
+        ORDER BY filha.relname
+    """), {"schema": tabela.schema, "nome": tabela.name}).all()
+
+    particoes = []
+    for nome, limites in linhas:
+        achado = _RE_LIMITES.search(limites or "")
+        if achado:
+            inicio, fim = (datetime.fromisoformat(v).date() for v in achado.groups())
+            particoes.append((nome, inicio, fim))
+        else:
+            particoes.append((nome, None, None))
+    return particoes
+
+
+def criar_particao(conn, tabela, nome, inicio, fim):
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {tabela.schema}.{nome} PARTITION OF {tabela.fullname} "
+        f"FOR VALUES FROM ('{inicio.isoformat()}') TO ('{fim.isoformat()}')"
+    ))
+
+
+def criar_particao_default(conn, tabela):
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {tabela.fullname}_default PARTITION OF {tabela.fullname} DEFAULT"
+    ))
+
+
+def esvaziar_default(tabela):
+    """
+    Tira as linhas da partição DEFAULT, cria as partições das faixas delas e as devolve
+    pela tabela-mãe, numa transação. Sem isso, criar uma partição cuja faixa já tem
+    linhas na DEFAULT falha. Retorna as linhas movidas.
+    """
+    default = f"{tabela.fullname}_default"
+    with db.engine.begin() as conn:
+        conn.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+        if not conn.scalar(text("SELECT to_regclass(:t) IS NOT NULL"), {"t": default}):
+            return 0
+        # Escritas novas esperam: uma linha que chegasse agora barraria a criação das partições
+        conn.execute(text(f"LOCK TABLE {default} IN EXCLUSIVE MODE"))
+        mais_antiga = conn.scalar(text(f"SELECT min(data_hora) FROM {default}"))
+        if mais_antiga is None:
+            return 0
+        conn.execute(text(f"CREATE TEMP TABLE movidas (LIKE {default}) ON COMMIT DROP"))
+        qtd = conn.execute(text(
+            f"WITH m AS (DELETE FROM {default} RETURNING *) INSERT INTO movidas SELECT * FROM m"
+        )).rowcount
+        GARANTIR_PARTICOES[tabela.fullname](desde=mais_antiga.date(), conn=conn)
+        conn.execute(text(f"INSERT INTO {tabela.fullname} SELECT * FROM movidas"))
+        restantes = conn.scalar(text(f"SELECT count(*) FROM {default}"))
+    print(f"PARTICOES: {qtd - restantes} linhas movidas de {default} para partições próprias"
+          + (f" ({restantes} fora das faixas criadas continuam nela)." if restantes else "."))
+    return qtd - restantes
+
+
+# ============================================================================
+# NOTIFICAÇÕES: PARTIÇÕES MENSAIS
+# ============================================================================
+
+def _nome_mensal(inicio):
+    return f"{NOTIFICACOES.name}_p{inicio.year}_{inicio.month:02d}"
+
+
+def garantir_particoes_notificacoes(meses_a_frente=MESES_A_FRENTE, desde=None, conn=None):
+    """Cria (se faltarem) as partições mensais de `desde` (padrão: mês atual) até `meses_a_frente` meses depois."""
+    hoje = date.today()
+    inicio = somar_meses(desde or hoje, 0)
+    ultimo = somar_meses(hoje, meses_a_frente)
+    existentes = {nome for nome, _, _ in listar_particoes(NOTIFICACOES, conn)}
+
+    criadas = []
+    while inicio <= ultimo:
+        nome = _nome_mensal(inicio)
+        if nome not in existentes:
+            criar_particao(conn or db.session, NOTIFICACOES, nome, inicio, somar_meses(inicio, 1))
+            criadas.append(nome)
+        inicio = somar_meses(inicio, 1)
+    if conn is None:
+        db.session.commit()
+    return criadas
+
+
+def expirar_notificacoes(retencao_meses=RETENCAO_MESES, modo=MODO_EXPIRACAO,
+                         retencao_nao_lidas_meses=RETENCAO_NAO_LIDAS_MESES):
+    """
+    Desanexa (e, no modo 'apagar', remove) as partições inteiramente anteriores à janela
+    de retenção. Partições com não lidas esperam até a retenção delas. Cada partição é
+    tratada numa transação curta própria.
+    """
+    limite = somar_meses(date.today(), -(retencao_meses - 1))
+    limite_nao_lidas = somar_meses(date.today(), -(max(retencao_meses, retencao_nao_lidas_meses) - 1))
+    expiradas = [
+        (nome, fim) for nome, _, fim in listar_particoes(NOTIFICACOES) if fim is not None and fim <= limite
+    ]
+    db.session.commit()
+
+    processadas = []
+    for nome, fim in expiradas:
+        particao = f"{NOTIFICACOES.schema}.{nome}"
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+                if fim > limite_nao_lidas and conn.scalar(text(
+                    f"SELECT EXISTS (SELECT 1 FROM {particao} WHERE lida IS NOT TRUE)"
+                )):
+                    continue
+                conn.execute(text(f"ALTER TABLE {NOTIFICACOES.fullname} DETACH PARTITION {particao}"))
+                if modo == 'apagar':
+                    conn.execute(text(f"DROP TABLE {particao}"))
+            processadas.append(nome)
+            print(f"PARTICOES: {nome} expirada ({modo}).")
+        except Exception as e:
+            print(f"PARTICOES: [AVISO] Não foi possível expirar {nome} agora: {e}")
+    return processadas
+
+
+# ============================================================================
+# TRAMITAÇÕES: PARTIÇÕES ANUAIS E NÍVEL DE ARQUIVO
+# ============================================================================
+
+def _nome_anual(ano):
+    return f"{TRAMITACOES.name}_p{ano}"
+
+
+def garantir_particoes_tramitacoes(desde=None, conn=None):
+    """
+    Cria (se faltarem) as partições anuais de `desde` (padrão: ano atual) até o ano seguinte.
+    Falha se a DEFAULT tiver linhas de um ano a criar (veja esvaziar_default).
+    """
+    ano = (desde or date.today()).year
+    ultimo = date.today().year + 1
+    existentes = {nome for nome, _, _ in listar_particoes(TRAMITACOES, conn)}
+
+    criadas = []
+    while ano <= ultimo:
+        nome = _nome_anual(ano)
+        if nome not in existentes:
+            criar_particao(conn or db.session, TRAMITACOES, nome, date(ano, 1, 1), date(ano + 1, 1, 1))
+            criadas.append(nome)
+        ano += 1
+    if conn is None:
+        db.session.commit()
+    return criadas
+
+
+def preparar_historico_tramitacoes(desde):
+    """
+    Antes de gravar tramitações desde a data `desde` (carga do histórico): tira da DEFAULT o
+    que houver e cria as partições anuais que faltarem. Faz commit. Sem efeito se a
+    tabela ainda não for particionada.
+    """
+    particionada = desde is not None and esta_particionada(TRAMITACOES)
+    db.session.commit()
+    if not particionada:
+        return []
+    esvaziar_default(TRAMITACOES)
+    criadas = garantir_particoes_tramitacoes(desde=desde)
+    if criadas:
+        print(f"PARTICOES: Criadas {', '.join(criadas)}.")
+    return criadas
+
+
+def no_horario_de_arquivo(agora=None, horario=TRAMITACOES_HORARIO_ARQUIVO):
+    inicio, fim = (int(h) for h in horario.split("-"))
+    return inicio <= (agora or datetime.now()).hour < fim
+
+
+def _indice_da_particao(conn, particao, indice_mae):
+    """Nome do índice da partição que herda de `indice_mae` (índice particionado da tabela-mãe)."""
+    return conn.scalar(text("""
+        SELECT filho.relname
+        FROM pg_inherits h
+        JOIN pg_class filho ON filho.oid = h.inhrelid
+        JOIN pg_class mae ON mae.oid = h.inhparent
+        JOIN pg_index i ON i.indexrelid = filho.oid
+        WHERE mae.relname = :indice_mae AND i.indrelid = CAST(:particao AS regclass)
+    """), {"indice_mae": indice_mae, "particao": particao})
+
+
+def arquivar_tramitacoes(anos_quentes=TRAMITACOES_ANOS_QUENTES, fracao=TRAMITACOES_FRACAO_ARQUIVADA,
+                         tablespace=TRAMITACOES_TABLESPACE_ARQUIVO):
+    """
+    Move para o nível de arquivo os anos antigos cujas tramitações são, quase todas,
+    de projetos encerrados. Cada partição é arquivada uma única vez (marcada por COMMENT).
+    O CLUSTER bloqueia a partição (inclusive leituras) até terminar: chame fora de pico.
+    """
+    ano_limite = date.today().year - anos_quentes
+    candidatas = [
+        nome for nome, inicio, _ in listar_particoes(TRAMITACOES)
+        if inicio is not None and inicio.year <= ano_limite
+    ]
+    db.session.commit()
+
+    arquivadas = []
+    for nome in candidatas:
+        particao = f"{TRAMITACOES.schema}.{nome}"
+        if db.session.scalar(text("SELECT obj_description(CAST(:p AS regclass), 'pg_class')"), {"p": particao}) == MARCA_ARQUIVO:
+            continue
+
+        fracao_encerrada = db.session.scalar(text(f"""
+            SELECT avg(CASE WHEN sit.ds_situacao = ANY(CAST(:finais AS text[])) THEN 1.0 ELSE 0.0 END)
+            FROM {particao} t
+            JOIN camara.tb_projeto p ON p.id_projeto = t.id_projeto
+            LEFT JOIN camara.tp_situacao sit ON sit.id_situacao = p.id_ultima_situacao
+        """), {"finais": SITUACOES_FINAIS})
+        db.session.commit()
+        if fracao_encerrada is None or fracao_encerrada < fracao:
+            continue
+
+        print(f"PARTICOES: Arquivando {nome} ({fracao_encerrada:.0%} de projetos encerrados)...")
+        # CLUSTER e VACUUM não rodam dentro de transação
+        with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(f"SET lock_timeout = '{LOCK_TIMEOUT}'"))
+            indice = _indice_da_particao(conn, particao, "ix_rl_tramitacoes_projeto_data")
+            conn.execute(text(f"ALTER TABLE {particao} SET (fillfactor = 100)"))
+            if indice:
+                # Reescreve a partição na ordem da timeline: cada projeto ocupa poucas páginas contíguas
+                conn.execute(text(f"CLUSTER {particao} USING {indice}"))
+            if tablespace:
+                conn.execute(text(f"ALTER TABLE {particao} SET TABLESPACE {tablespace}"))
+                for (nome_indice,) in conn.execute(text(
+                    "SELECT indexrelid::regclass::text FROM pg_index WHERE indrelid = CAST(:p AS regclass)"
+                ), {"p": particao}):
+                    conn.execute(text(f"ALTER INDEX {nome_indice} SET TABLESPACE {tablespace}"))
+            conn.execute(text(f"VACUUM (FREEZE, ANALYZE) {particao}"))
+            conn.execute(text(f"COMMENT ON TABLE {particao} IS '{MARCA_ARQUIVO}'"))
+        arquivadas.append(nome)
+    return arquivadas
+
+
+# ============================================================================
+# ROTINA DIÁRIA
+# ============================================================================
+
+def manter(arquivar=None):
+    """
+    Rotina diária: linhas perdidas na DEFAULT, partições futuras, retenção e arquivamento.
+    arquivar=None só arquiva dentro de TRAMITACOES_HORARIO_ARQUIVO. Ignora tabelas ainda não migradas.
+    """
+    if esta_particionada(NOTIFICACOES):
+        db.session.commit()
+        esvaziar_default(NOTIFICACOES)
+        criadas = garantir_particoes_notificacoes()
+        if criadas:
+            print(f"PARTICOES: Criadas {', '.join(criadas)}.")
+        expirar_notificacoes()
+    else:
+        print(f"PARTICOES: {NOTIFICACOES.fullname} não é particionada. Rode 'python -m app.particoes --migrar'.")
+
+    if esta_particionada(TRAMITACOES):
+        db.session.commit()
+        esvaziar_default(TRAMITACOES)
+        criadas = garantir_particoes_tramitacoes()
+        if criadas:
+            print(f"PARTICOES: Criadas {', '.join(criadas)}.")
+        if arquivar if arquivar is not None else no_horario_de_arquivo():
+            arquivar_tramitacoes()
+        else:
+            print(f"PARTICOES: Arquivamento de tramitações só entre {TRAMITACOES_HORARIO_ARQUIVO}h (use --arquivar).")
+    else:
+        print(f"PARTICOES: {TRAMITACOES.fullname} não é particionada. Rode 'python -m app.particoes --migrar'.")
+
+
+# ============================================================================
+# MIGRAÇÃO DAS TABELAS ANTIGAS
+# ============================================================================
+
+# Tabela -> função que cria as partições a partir da data mais antiga
+GARANTIR_PARTICOES = {
+    NOTIFICACOES.fullname: garantir_particoes_notificacoes,
+    TRAMITACOES.fullname: garantir_particoes_tramitacoes,
+}
+
+
+def migrar(tabela, manter_legado=False):
+    """
+    Converte `tabela` em particionada numa única transação: renomeia a antiga, cria a
+    nova com partições desde a data mais antiga, copia as linhas mantendo os ids
+    (ex.: cursores do SSE) e ajusta a sequência.
+    """
+    if esta_particionada(tabela):
+        print(f"PARTICOES: {tabela.fullname} já é particionada.")
+        return False
+    db.session.commit()
+
+    schema, nome = tabela.schema, tabela.name
+    legado = f"{nome}_legado"
+    # Coluna serial da PK (a outra coluna da PK é data_hora, a chave de partição)
+    serial = next(c.name for c in tabela.primary_key.columns if c.autoincrement is True)
+
+    with db.engine.begin() as conn:
+        print(f"PARTICOES: Renomeando {tabela.fullname}...")
+        sequencia_antiga = conn.scalar(text("SELECT pg_get_serial_sequence(:t, :c)"), {"t": tabela.fullname, "c": serial})
+        conn.execute(text(f"ALTER TABLE {tabela.fullname} RENAME TO {legado}"))
+        conn.execute(text(f"ALTER TABLE {schema}.{legado} RENAME CONSTRAINT {nome}_pkey TO {legado}_pkey"))
+        if sequencia_antiga:
+            conn.execute(text(f"ALTER SEQUENCE {sequencia_antiga} RENAME TO {legado}_{serial}_seq"))
+        for indice in tabela.indexes:
+            conn.execute(text(f"DROP INDEX IF EXISTS {schema}.{indice.name}"))
+
+        print(f"PARTICOES: Criando {tabela.fullname} particionada...")
+        conn.execute(CreateTable(tabela))
+        criar_particao_default(conn, tabela)
+        mais_antiga = conn.scalar(text(f"SELECT min(data_hora) FROM {schema}.{legado}"))
+        GARANTIR_PARTICOES[tabela.fullname](desde=mais_antiga.date() if mais_antiga else None, conn=conn)
+
+        print("PARTICOES: Copiando linhas...")
+        # Só as colunas que a tabela antiga tem; data_hora agora faz parte da PK e não aceita NULL
+        colunas_legado = set(conn.scalars(text("""
+            SELECT column_name FROM information_schema.columns WHERE table_schema = :schema AND table_name = :nome
+        """), {"schema": schema, "nome": legado}))
+        colunas = [c.name for c in tabela.columns if c.name in colunas_legado]
+        origem = ["COALESCE(data_hora, now())" if c == "data_hora" else c for c in colunas]
+        copiadas = conn.execute(text(
+            f"INSERT INTO {tabela.fullname} ({', '.join(colunas)}) "
+            f"SELECT {', '.join(origem)} FROM {schema}.{legado}"
+        )).rowcount
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence(:t, :c), GREATEST((SELECT max({serial}) FROM {schema}.{legado}), 1))"
+        ), {"t": tabela.fullname, "c": serial})
+
+        print("PARTICOES: Recriando índices...")
+        for indice in sorted(tabela.indexes, key=lambda i: i.name):
+            conn.execute(text(ddl_indice(indice, conn.dialect, concorrente=False)))
+
+        if not manter_legado:
+            conn.execute(text(f"DROP TABLE {schema}.{legado}"))
+
+    db.session.execute(text(f"ANALYZE {tabela.fullname}"))
+    db.session.commit()
+    print(f"PARTICOES: Migração de {tabela.fullname} concluída: {copiadas} linhas copiadas"
+          + (f" (tabela antiga mantida em {schema}.{legado})." if manter_legado else "."))
+    return True
+
+
+if __name__ == "__main__":
+    from . import criar_app_dados
+
+    parser = argparse.ArgumentParser(description="Partições, retenção e arquivamento.")
+    parser.add_argument("--migrar", action="store_true", help="Converte as tabelas antigas em particionadas")
+    parser.add_argument("--manter-legado", action="store_true", help="Na migração, mantém as tabelas antigas renomeadas")
+    parser.add_argument("--arquivar", action="store_true",
+                        help="Arquiva tramitações agora, fora de TRAMITACOES_HORARIO_ARQUIVO (CLUSTER bloqueia a partição)")
+    args = parser.parse_args()
+
+    app = criar_app_dados('worker')
+    with app.app_context():
+        for tabela in (NOTIFICACOES, TRAMITACOES):
+            if args.migrar:
+                migrar(tabela, args.manter_legado)
+            elif esta_particionada(tabela):
+                criar_particao_default(db.session, tabela)
+        db.session.commit()
+        manter(arquivar=True if args.arquivar else None)
@@ -0,0 +1,173 @@
+"""
+Configuração do pool de conexões com o Postgres e telemetria do pool.
+
+Cada tipo de processo usa um perfil ('api' ou 'worker'). Os valores vêm do
+ambiente, do mais específico para o mais genérico:
+
+    API_DB_POOL_SIZE  ->  DB_POOL_SIZE  ->  padrão do perfil
+
+Dimensionamento do Postgres (max_connections), por host:
+    N processos da API x (POOL_SIZE + MAX_OVERFLOW + 1 conexão de LISTEN do SSE)
+  + M workers/seeders x (POOL_SIZE + MAX_OVERFLOW)
+  + folga para administração
+"""
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+PERFIS_PADRAO = {
+    "api": {
+        "POOL_SIZE": 5,
+        "MAX_OVERFLOW": 10,
+        "POOL_TIMEOUT": 10,
+        "POOL_RECYCLE": 1800,
+        "POOL_PRE_PING": True,
+        "STATEMENT_TIMEOUT_MS": 15000,
+    },
+    "worker": {
+        "POOL_SIZE": 2,
+        "MAX_OVERFLOW": 2,
+        "POOL_TIMEOUT": 60,
+        "POOL_RECYCLE": 1800,
+        "POOL_PRE_PING": True,
+        "STATEMENT_TIMEOUT_MS": 0,  # Cargas e fan-out podem ser longos
+    },
+}
+
+
+def _valor(perfil, nome):
+    bruto = os.getenv(f"{perfil.upper()}_DB_{nome}", os.getenv(f"DB_{nome}"))
+    padrao = PERFIS_PADRAO[perfil][nome]
+    if bruto is None:
+        return padrao
+    if isinstance(padrao, bool):
+        return bruto.strip().lower() in ("1", "true", "sim", "yes")
+    return int(bruto)
+
+
+def modo_pgbouncer():
+    return os.getenv("DB_PGBOUNCER", "").strip().lower() in ("1", "true", "sim", "yes")
+
+
+def configuracao_pool(perfil):
+    """Valores efetivos do perfil (usados no engine e expostos na telemetria)."""
+    if perfil not in PERFIS_PADRAO:
+        raise ValueError(f"Perfil de banco desconhecido: {perfil}")
+    config = {nome: _valor(perfil, nome) for nome in PERFIS_PADRAO[perfil]}
+    config["PGBOUNCER"] = modo_pgbouncer()
+    return config
+
+
+def opcoes_engine(perfil):
+    """Monta SQLALCHEMY_ENGINE_OPTIONS para o perfil informado."""
+    config = configuracao_pool(perfil)
+    connect_args = {"application_name": f"legitrack-{perfil}"}
+
+    # Em transaction pooling o PgBouncer recusa parâmetros de startup como 'options';
+    # nesse modo o timeout é aplicado por transação (veja instalar_eventos)
+    if config["STATEMENT_TIMEOUT_MS"] and not config["PGBOUNCER"]:
+        connect_args["options"] = f"-c statement_timeout={config['STATEMENT_TIMEOUT_MS']}"
+
+    return {
+        "poolclass": PoolInstrumentado,
+        "pool_size": config["POOL_SIZE"],
+        "max_overflow": config["MAX_OVERFLOW"],
+        "pool_timeout": config["POOL_TIMEOUT"],
+        "pool_recycle": config["POOL_RECYCLE"],
+        "pool_pre_ping": config["POOL_PRE_PING"],
+        "connect_args": connect_args,
+    }
+
+
+def instalar_eventos(engine, perfil):
+    """Ajustes que dependem do engine já criado (modo PgBouncer)."""
+    config = configuracao_pool(perfil)
+    if config["PGBOUNCER"] and config["STATEMENT_TIMEOUT_MS"]:
+        timeout_ms = int(config["STATEMENT_TIMEOUT_MS"])
+
+        @event.listens_for(engine, "begin")
+        def _timeout_por_transacao(conn):
+            conn.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout_ms}")
+
+
+# ============================================================================
+# TELEMETRIA
+# ============================================================================
+
+class MetricasPool:
+    """Contadores acumulados desde a criação do pool (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.espera_total_s = 0.0
+        self.espera_max_s = 0.0
+        self.eventos_overflow = 0
+        self.timeouts = 0
+
+    def registrar(self, espera, overflow, timeout):
+        with self._lock:
+            if timeout:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.espera_total_s += espera
+            self.espera_max_s = max(self.espera_max_s, espera)
+            if overflow:
+                self.eventos_overflow += 1
+
+    def snapshot(self):
+        with self._lock:
+            media = self.espera_total_s / self.checkouts if self.checkouts else 0.0
+            return {
+                "checkouts": self.checkouts,
+                "espera_media_ms": round(media * 1000, 3),
+                "espera_max_ms": round(self.espera_max_s * 1000, 3),
+                "eventos_overflow": self.eventos_overflow,
+                "timeouts": self.timeouts,
+            }
+
+
+class PoolInstrumentado(QueuePool):
+    """
+    QueuePool que mede quanto cada checkout esperou por uma conexão e
+    quantas vezes precisou abrir conexões além de pool_size (overflow).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metricas = MetricasPool()
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        overflow_antes = self.overflow()
+        try:
+            conexao = super()._do_get()
+        except PoolTimeoutError:
+            self.metricas.registrar(time.perf_counter() - inicio, False, timeout=True)
+            raise
+        # overflow() começa em -pool_size: só é overflow quando passa de zero
+        abriu_extra = self.overflow() > overflow_antes and self.overflow() > 0
+        self.metricas.registrar(time.perf_counter() - inicio, abriu_extra, timeout=False)
+        return conexao
+
+    def estatisticas(self):
+        dados = self.metricas.snapshot()
+        dados.update({
+            "pool_size": self.size(),
+            "conexoes_em_uso": self.checkedout(),
+            "conexoes_livres": self.checkedin(),
+            "overflow_atual": max(0, self.overflow()),
+        })
+        return dados
+
+
+def estatisticas_pool(engine):
+    pool = engine.pool
+    if isinstance(pool, PoolInstrumentado):
+        return pool.estatisticas()
+    return {"status": pool.status()}
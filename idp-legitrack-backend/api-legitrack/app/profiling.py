@@ -0,0 +1,198 @@
+"""
+Instrumentação de SQL por requisição (opt-in via SQL_PROFILING=true).
+
+Conta consultas e tempo de banco de cada requisição usando os eventos
+before/after_cursor_execute do SQLAlchemy. Com o header X-Debug-SQL a resposta
+recebe um Server-Timing; requisições lentas (SQL_SLOW_REQUEST_MS) são
+amostradas (SQL_SLOW_SAMPLE_RATE) num buffer circular lido em /admin/consultas-lentas
+e, se SQL_SLOW_LOG for definido, gravadas num log rotativo.
+"""
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Literais numéricos e strings viram '?', e listas IN (...) colapsam: mesma forma = mesma impressão digital
+_RE_STRING = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_LISTA = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+_RE_ESPACO = re.compile(r"\s+")
+
+
+def impressao_digital(sql):
+    """Normaliza o SQL e devolve (hash curto, SQL normalizado)."""
+    normalizado = _RE_STRING.sub("?", sql)
+    normalizado = _RE_NUMERO.sub("?", normalizado)
+    normalizado = _RE_LISTA.sub("(?)", normalizado)
+    normalizado = _RE_ESPACO.sub(" ", normalizado).strip()
+    return hashlib.sha1(normalizado.encode("utf-8")).hexdigest()[:12], normalizado
+
+
+class ContadorSQL:
+    """Acumulador de consultas de uma unidade de trabalho (requisição ou bloco de teste)."""
+
+    __slots__ = ("consultas", "tempo_total", "mais_lenta_tempo", "mais_lenta_sql", "digitais")
+
+    def __init__(self):
+        self.consultas = 0
+        self.tempo_total = 0.0
+        self.mais_lenta_tempo = 0.0
+        self.mais_lenta_sql = None
+        self.digitais = {}
+
+    def registrar(self, sql, duracao):
+        self.consultas += 1
+        self.tempo_total += duracao
+        digital, normalizado = impressao_digital(sql)
+        self.digitais[digital] = self.digitais.get(digital, 0) + 1
+        if duracao >= self.mais_lenta_tempo:
+            self.mais_lenta_tempo = duracao
+            self.mais_lenta_sql = normalizado
+
+
+# Contadores ativos fora de requisições (ex.: app.orcamento_consultas), por thread
+_local = threading.local()
+
+
+def _contador_atual():
+    contador = g.get("_contador_sql") if has_request_context() else None
+    if contador is None:
+        # Sem profiling na requisição, vale o contador aberto por contar_consultas (ex.: cliente de teste)
+        contador = getattr(_local, "contador", None)
+    return contador
+
+
+def _antes(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_inicio_consulta", []).append(time.perf_counter())
+
+
+def _depois(conn, cursor, statement, parameters, context, executemany):
+    inicios = conn.info.get("_inicio_consulta")
+    if not inicios:
+        return
+    duracao = time.perf_counter() - inicios.pop()
+    contador = _contador_atual()
+    if contador is not None:
+        contador.registrar(statement, duracao)
+
+
+_eventos_instalados = False
+_lock_eventos = threading.Lock()
+
+
+def instalar_eventos_sql():
+    """Registra os eventos em todos os engines (uma única vez por processo)."""
+    global _eventos_instalados
+    with _lock_eventos:
+        if _eventos_instalados:
+            return
+        event.listen(Engine, "before_cursor_execute", _antes)
+        event.listen(Engine, "after_cursor_execute", _depois)
+        _eventos_instalados = True
+
+
+class contar_consultas:
+    """
+    Context manager para contar SQL fora de uma requisição HTTP:
+
+        with contar_consultas() as c:
+            ...
+        c.consultas
+    """
+
+    def __enter__(self):
+        instalar_eventos_sql()
+        self.contador = ContadorSQL()
+        _local.contador = self.contador
+        return self.contador
+
+    def __exit__(self, *exc):
+        _local.contador = None
+        return False
+
+
+class ProfilerSQL:
+    """Extensão Flask que liga a contagem às requisições e guarda as lentas."""
+
+    def __init__(self, app=None):
+        self.lentas = deque(maxlen=200)
+        self._logger = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions["profiler_sql"] = self
+        if not app.config.get("SQL_PROFILING"):
+            return
+
+        self.lentas = deque(maxlen=app.config["SQL_SLOW_BUFFER"])
+        caminho_log = app.config.get("SQL_SLOW_LOG")
+        if caminho_log:
+            self._logger = logging.getLogger("legitrack.consultas_lentas")
+            self._logger.setLevel(logging.INFO)
+            self._logger.propagate = False
+            if not self._logger.handlers:
+                self._logger.addHandler(RotatingFileHandler(caminho_log, maxBytes=10 * 1024 * 1024, backupCount=5))
+
+        instalar_eventos_sql()
+        app.before_request(self._inicio_requisicao)
+        app.after_request(self._fim_requisicao)
+
+    def _inicio_requisicao(self):
+        g._contador_sql = ContadorSQL()
+        g._inicio_requisicao = time.perf_counter()
+
+    def _fim_requisicao(self, response):
+        contador = g.pop("_contador_sql", None)
+        if contador is None:
+            return response
+        duracao_total = time.perf_counter() - g.pop("_inicio_requisicao", time.perf_counter())
+
+        if request.headers.get("X-Debug-SQL"):
+            response.headers["Server-Timing"] = (
+                f'db;dur={contador.tempo_total * 1000:.2f};desc="{contador.consultas} consultas", '
+                f'db-max;dur={contador.mais_lenta_tempo * 1000:.2f}, '
+                f'total;dur={duracao_total * 1000:.2f}'
+            )
+            response.headers["X-SQL-Count"] = str(contador.consultas)
+
+        limite = current_app.config["SQL_SLOW_REQUEST_MS"] / 1000
+        if duracao_total >= limite and random.random() < current_app.config["SQL_SLOW_SAMPLE_RATE"]:
+            self._registrar_lenta(contador, duracao_total, response.status_code)
+        return response
+
+    def _registrar_lenta(self, contador, duracao_total, status):
+        from flask_jwt_extended import get_jwt_identity
+
+        try:
+            usuario = get_jwt_identity()
+        except Exception:
+            usuario = None
+
+        registro = {
+            "quando": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "endpoint": request.endpoint,
+            "metodo": request.method,
+            "caminho": request.path,
+            "status": status,
+            "usuario": usuario,
+            "duracao_ms": round(duracao_total * 1000, 2),
+            "db_ms": round(contador.tempo_total * 1000, 2),
+            "consultas": contador.consultas,
+            "mais_lenta_ms": round(contador.mais_lenta_tempo * 1000, 2),
+            "mais_lenta_sql": contador.mais_lenta_sql,
+            "digitais": contador.digitais,
+        }
+        self.lentas.append(registro)
+        if self._logger is not None:
+            self._logger.info(json.dumps(registro, ensure_ascii=False))
+
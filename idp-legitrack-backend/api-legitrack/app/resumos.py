@@ -0,0 +1,127 @@
+"""
+Manutenção de camara.tb_projeto_resumo, a tabela lida pelas listagens da API.
+
+Cada linha guarda o que a lista renderiza (ementa, descrição, rótulo da
+situação, data já formatada, temas, seguidores e última sequência), então as
+rotas de listagem leem uma tabela só, sem joins com tp_situacao, rl_temas
+ou rl_tramitacoes.
+
+  - atualizar_resumos(ids): reescreve só as linhas dos projetos informados.
+    O worker e a carga em lote chamam na mesma transação em que alteram o
+    projeto, então o resumo nunca fica atrás de tb_projeto (o GET /api/sync
+    depende disso);
+  - atualizar_seguidores(desde): recontagem dos seguidores só dos projetos
+    com favoritos alterados depois da versão `desde` (gatilhos de
+    app.sincronizacao), feita pelo worker a cada ciclo. Projeto cuja
+    contagem mudou ganha versão nova em tb_projeto, para o GET /api/sync
+    reenviar os seguidores.
+
+Uso:
+    python -m app.resumos    # cria a tabela (se faltar) e reconstrói todas as linhas
+"""
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex, CreateTable
+from .banco import db
+from .models import TB_ProjetoResumo
+from .sincronizacao import versao_segura
+
+# 'DD "de" Mon". de" YYYY' = '05 de Mar. de 2024', o mesmo de serializacao.formatar_data
+SQL_ATUALIZAR = """
+    INSERT INTO camara.tb_projeto_resumo (
+        id_projeto, titulo, descricao, situacao, data, data_hora, ids_temas,
+        qtd_seguidores, ultima_sequencia, atualizado_em
+    )
+    SELECT p.id_projeto, p.titulo_projeto, p.descricao, s.ds_situacao,
+           to_char(p.data_hora, 'DD "de" Mon". de" YYYY'), p.data_hora, p.ids_temas,
+           (SELECT count(*) FROM usuarios.rl_favoritos f WHERE f.id_projeto = p.id_projeto),
+           (SELECT max(t.sequencia) FROM camara.rl_tramitacoes t WHERE t.id_projeto = p.id_projeto),
+           now()
+    FROM camara.tb_projeto p
+    LEFT JOIN camara.tp_situacao s ON s.id_situacao = p.id_ultima_situacao
+    {filtro}
+    ON CONFLICT (id_projeto) DO UPDATE SET
+        titulo = EXCLUDED.titulo,
+        descricao = EXCLUDED.descricao,
+        situacao = EXCLUDED.situacao,
+        data = EXCLUDED.data,
+        data_hora = EXCLUDED.data_hora,
+        ids_temas = EXCLUDED.ids_temas,
+        qtd_seguidores = EXCLUDED.qtd_seguidores,
+        ultima_sequencia = EXCLUDED.ultima_sequencia,
+        atualizado_em = EXCLUDED.atualizado_em
+"""
+
+# O GET /api/sync entrega qtd_seguidores pela versão de tb_projeto: projeto cuja contagem mudou
+# ganha versão nova (o gatilho de versão de tb_projeto só olha data_hora e situação)
+SQL_SEGUIDORES = text("""
+    WITH contagens AS (
+        SELECT r.id_projeto, (SELECT count(*) FROM usuarios.rl_favoritos f WHERE f.id_projeto = r.id_projeto) AS qtd
+        FROM camara.tb_projeto_resumo r
+        WHERE r.id_projeto IN (
+            SELECT id_projeto FROM usuarios.rl_favoritos WHERE versao > :desde
+            UNION
+            SELECT id_registro FROM usuarios.tb_remocoes WHERE tabela = 'rl_favoritos' AND versao > :desde
+        )
+    ),
+    alterados AS (
+        UPDATE camara.tb_projeto_resumo r
+        SET qtd_seguidores = c.qtd
+        FROM contagens c
+        WHERE r.id_projeto = c.id_projeto AND r.qtd_seguidores IS DISTINCT FROM c.qtd
+        RETURNING r.id_projeto
+    )
+    UPDATE camara.tb_projeto p
+    SET versao = usuarios.fn_proxima_versao()
+    FROM alterados a
+    WHERE p.id_projeto = a.id_projeto
+""")
+
+
+def instalar():
+    """Cria a tabela de resumos, se faltar."""
+    with db.engine.begin() as conn:
+        conn.execute(CreateTable(TB_ProjetoResumo.__table__, if_not_exists=True))
+        for indice in TB_ProjetoResumo.__table__.indexes:
+            conn.execute(CreateIndex(indice, if_not_exists=True))
+
+
+def atualizar_resumos(ids_projetos=None):
+    """
+    Reescreve o resumo dos projetos informados (None = todos). Não faz commit.
+    Retorna a quantidade de linhas escritas.
+    """
+    if ids_projetos is None:
+        return db.session.execute(text(SQL_ATUALIZAR.format(filtro=""))).rowcount
+    if not ids_projetos:
+        return 0
+    return db.session.execute(
+        text(SQL_ATUALIZAR.format(filtro="WHERE p.id_projeto = ANY(CAST(:ids AS integer[]))")),
+        {"ids": sorted(ids_projetos)}
+    ).rowcount
+
+
+def atualizar_seguidores(desde):
+    """
+    Recontagem dos seguidores dos projetos com favoritos alterados após a versão `desde`.
+    Retorna (projetos com contagem nova, versão a usar na próxima chamada). Não faz commit.
+    """
+    # Lida antes do UPDATE e só até o que já está confirmado: uma transação ainda aberta com
+    # versão menor (o dispatcher, por exemplo) entra na próxima passada em vez de ser pulada
+    ate = versao_segura()
+    qtd = db.session.execute(SQL_SEGUIDORES, {"desde": desde}).rowcount
+    return qtd, ate
+
+
+if __name__ == "__main__":
+    from . import criar_app_dados
+
+    app = criar_app_dados('worker')
+    with app.app_context():
+        print("--- [RESUMOS] INICIANDO ---")
+        instalar()
+        qtd = atualizar_resumos()
+        db.session.commit()
+        db.session.execute(text("ANALYZE camara.tb_projeto_resumo"))
+        db.session.commit()
+        print(f"RESUMOS: {qtd} projetos resumidos.")
+        print("--- [RESUMOS] CONCLUÍDO ---")
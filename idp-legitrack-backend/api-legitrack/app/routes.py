@@ -1,28 +1,207 @@
-from flask import Blueprint, jsonify, request
+import json
+import queue
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy.orm import joinedload
-from .extensions import db
-from .models import TB_Projeto, TP_Temas, TB_Interesses, TB_User, RL_Favoritos, TB_Notificacao
+from sqlalchemy import any_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import joinedload, lazyload
+from .extensions import db, broker
+from .facetas import calcular_facetas
+from .feed import reconstruir_feed_usuario
+from .models import (
+    TB_Projeto, TP_Temas, TB_Interesses, TB_User, RL_Favoritos, TB_Notificacao, TB_Feed,
+    RL_Tramitacoes, TB_Remocao, TB_ProjetoResumo, TB_ProjetoSemelhante
+)
+from .serializacao import resposta_json
+from .stream import StreamsEsgotados
+from . import exportacao, sincronizacao
 
 bp = Blueprint('api', __name__, url_prefix='/api')
 
+# Máximo de ids aceitos pelas rotas em lote
+LIMITE_LOTE = 200
+
 # ============================================================================
 # FUNÇÕES AUXILIARES
 # ============================================================================
 
-def _montar_json_projeto(projeto, user_favoritos_ids):
+def _ids_do_corpo(dados, chave):
+    """
+    Lê uma lista de ids inteiros do corpo JSON (sem repetidos, na ordem recebida).
+    ValueError se não for uma lista de inteiros ou passar de LIMITE_LOTE.
+    """
+    valor = dados.get(chave) or []
+    if not isinstance(valor, list) or not all(isinstance(i, (int, str)) and str(i).isdigit() for i in valor):
+        raise ValueError(f"'{chave}' deve ser uma lista de ids")
+    ids = list(dict.fromkeys(int(i) for i in valor))
+    if len(ids) > LIMITE_LOTE:
+        raise ValueError(f"'{chave}' aceita no máximo {LIMITE_LOTE} ids")
+    return ids
+
+def _montar_json_projetos(linhas):
     """
-    Padroniza o objeto JSON do projeto para o Flutter.
+    Padroniza o objeto JSON dos projetos para o Flutter.
+    Recebe as tuplas de _select_resumo (sem hidratar objetos do ORM; a data já vem formatada).
+    """
+    return [
+        {
+            "id": str(id_projeto),
+            "titulo": titulo,
+            "descricao": descricao,
+            "status": status or "Em tramitação",
+            "data": data or "",
+            "seguidores": seguidores,
+            "is_favorite": bool(is_favorite)
+        }
+        for id_projeto, titulo, descricao, status, data, seguidores, is_favorite in linhas
+    ]
+
+def _montar_json_notificacao(notificacao):
+    """
+    Padroniza o objeto JSON da notificação (lista e stream usam o mesmo formato).
     """
     return {
-        "id": str(projeto.id_projeto),
-        "titulo": projeto.titulo_projeto,
-        "descricao": projeto.descricao,
-        "status": projeto.ultima_situacao.ds_situacao if projeto.ultima_situacao else "Em tramitação",
-        "data": projeto.data_hora.strftime("%d de %b. de %Y") if projeto.data_hora else "",
-        "is_favorite": projeto.id_projeto in user_favoritos_ids
+        "id": notificacao.id,
+        "title": notificacao.titulo,
+        "description": notificacao.descricao,
+        "date": notificacao.data_hora.strftime("%d de %b. de %Y"),
+        "isUnread": not notificacao.lida
     }
 
+# ============================================================================
+# CONSULTAS DOS CAMINHOS QUENTES
+# (também usadas por app.verificar_planos para checar os planos de execução)
+# ============================================================================
+
+def _select_resumo(coluna_favorito):
+    """
+    Projeção usada pelas listagens: lida só de tb_projeto_resumo (app.resumos),
+    que já traz o rótulo da situação e a data formatada, sem joins.
+    """
+    return (
+        db.select(
+            TB_ProjetoResumo.id_projeto,
+            TB_ProjetoResumo.titulo,
+            TB_ProjetoResumo.descricao,
+            TB_ProjetoResumo.situacao,
+            TB_ProjetoResumo.data,
+            TB_ProjetoResumo.qtd_seguidores,
+            coluna_favorito
+        )
+        .select_from(TB_ProjetoResumo)
+    )
+
+def _favoritado_por(id_user):
+    return db.exists().where(
+        RL_Favoritos.id_user == id_user, RL_Favoritos.id_projeto == TB_ProjetoResumo.id_projeto
+    )
+
+def consulta_projetos(id_user, ids_temas=None, termo_busca=''):
+    query = _select_resumo(_favoritado_por(id_user))
+
+    if termo_busca:
+        t = f"%{termo_busca}%"
+        query = query.filter(
+            (TB_ProjetoResumo.titulo.ilike(t)) | 
+            (TB_ProjetoResumo.descricao.ilike(t))
+        )
+
+    if ids_temas and isinstance(ids_temas, list):
+        # Cópia desnormalizada de rl_temas com índice GIN (app.facetas)
+        query = query.filter(TB_ProjetoResumo.ids_temas.overlap([int(i) for i in ids_temas]))
+
+    return query.order_by(TB_ProjetoResumo.data_hora.desc().nullslast()).limit(50)
+
+def consulta_timeline(id_projeto):
+    """
+    Tramitações do projeto, mais recentes primeiro. Sem filtro de data: o histórico
+    pode começar antes do ano do projeto (ex.: projetos vindos do Senado), e cada
+    partição anual tem índice em (id_projeto, data_hora).
+    """
+    return (
+        db.select(RL_Tramitacoes)
+        .filter_by(id_projeto=id_projeto)
+        .options(joinedload(RL_Tramitacoes.situacao), joinedload(RL_Tramitacoes.tipo_tramitacao))
+        .order_by(RL_Tramitacoes.data_hora.desc())
+    )
+
+def consulta_lote_projetos(id_user, ids):
+    return _select_resumo(_favoritado_por(id_user)).filter(TB_ProjetoResumo.id_projeto.in_(ids))
+
+def consulta_semelhantes(id_user, id_projeto):
+    # Lista pré-calculada (app.semelhantes): leitura pela PK, resumos na ordem do score
+    return (
+        _select_resumo(_favoritado_por(id_user))
+        .join(TB_ProjetoSemelhante, TB_ProjetoResumo.id_projeto == any_(TB_ProjetoSemelhante.ids_semelhantes))
+        .filter(TB_ProjetoSemelhante.id_projeto == id_projeto)
+        .order_by(db.func.array_position(TB_ProjetoSemelhante.ids_semelhantes, TB_ProjetoResumo.id_projeto))
+    )
+
+def consulta_favoritos(id_user):
+    return (
+        _select_resumo(db.true())
+        .join(RL_Favoritos, RL_Favoritos.id_projeto == TB_ProjetoResumo.id_projeto)
+        .filter(RL_Favoritos.id_user == id_user)
+    )
+
+def consulta_feed(id_user):
+    return (
+        _select_resumo(_favoritado_por(id_user))
+        .join(TB_Feed, TB_Feed.id_projeto == TB_ProjetoResumo.id_projeto)
+        .filter(TB_Feed.id_user == id_user)
+        .order_by(TB_Feed.data_hora.desc().nullslast())
+        .limit(50)
+    )
+
+def consulta_notificacoes(id_user):
+    return (
+        db.select(TB_Notificacao)
+        .filter_by(id_user=id_user)
+        .order_by(TB_Notificacao.data_hora.desc())
+    )
+
+def consulta_sync_projetos(id_user, desde, ate, limite):
+    return (
+        _select_resumo(_favoritado_por(id_user))
+        .add_columns(TB_Projeto.versao)
+        .join(TB_Projeto, TB_Projeto.id_projeto == TB_ProjetoResumo.id_projeto)
+        .filter(TB_Projeto.versao > desde, TB_Projeto.versao <= ate)
+        .order_by(TB_Projeto.versao)
+        .limit(limite + 1)
+    )
+
+def consulta_sync_favoritos(id_user, desde, ate, limite):
+    return (
+        consulta_favoritos(id_user)
+        .add_columns(RL_Favoritos.versao)
+        .filter(RL_Favoritos.versao > desde, RL_Favoritos.versao <= ate)
+        .order_by(RL_Favoritos.versao)
+        .limit(limite + 1)
+    )
+
+def consulta_sync_remocoes(id_user, desde, ate, limite):
+    # Removido e adicionado de novo depois: vale o estado atual (a adição já sai em favoritos)
+    return (
+        db.select(TB_Remocao.id_registro, TB_Remocao.versao)
+        .filter(
+            TB_Remocao.id_user == id_user,
+            TB_Remocao.tabela == RL_Favoritos.__tablename__,
+            TB_Remocao.versao > desde,
+            TB_Remocao.versao <= ate,
+            ~db.exists().where(RL_Favoritos.id_user == id_user, RL_Favoritos.id_projeto == TB_Remocao.id_registro),
+        )
+        .order_by(TB_Remocao.versao)
+        .limit(limite + 1)
+    )
+
+def consulta_sync_notificacoes(id_user, desde, ate, limite):
+    return (
+        db.select(TB_Notificacao)
+        .filter(TB_Notificacao.id_user == id_user, TB_Notificacao.versao > desde, TB_Notificacao.versao <= ate)
+        .order_by(TB_Notificacao.versao)
+        .limit(limite + 1)
+    )
+
 # ============================================================================
 # ROTAS DE PROJETOS (HOME & BUSCA)
 # ============================================================================
@@ -52,6 +231,11 @@ def listar_projetos():
             busca:
               type: string
               description: Termo para busca textual
+            facetas:
+              type: boolean
+              description: >
+                Se true, a resposta vira {"projetos": [...], "facetas": {"temas": [...], "situacoes": [...]}}
+                com a quantidade de projetos da consulta por tema e por situação
     responses:
       200:
         description: Lista de projetos retornada com sucesso
@@ -65,34 +249,16 @@ def listar_projetos():
     termo_busca = dados.get('busca', '')
 
     try:
-        query = db.select(TB_Projeto).options(
-            joinedload(TB_Projeto.ultima_situacao),
-            joinedload(TB_Projeto.ultima_tramitacao)
-        )
-
-        if termo_busca:
-            t = f"%{termo_busca}%"
-            query = query.filter(
-                (TB_Projeto.titulo_projeto.ilike(t)) | 
-                (TB_Projeto.descricao.ilike(t))
-            )
-
-        if ids_temas and isinstance(ids_temas, list):
-            query = query.filter(TB_Projeto.temas.any(TP_Temas.id_tema.in_(ids_temas)))
-
-        query = query.order_by(TB_Projeto.data_hora.desc().nullslast())
+        query = consulta_projetos(current_user_id, ids_temas, termo_busca)
         
-        projetos_encontrados = db.session.scalars(query.limit(50)).unique().all()
-
-        favoritos_query = db.select(RL_Favoritos.id_projeto).filter_by(id_user=current_user_id)
-        meus_favoritos_ids = set(db.session.scalars(favoritos_query).all())
-
-        projetos_json = [
-            _montar_json_projeto(p, meus_favoritos_ids) 
-            for p in projetos_encontrados
-        ]
+        linhas = db.session.execute(query).all()
 
-        return jsonify(projetos_json), 200
+        if dados.get('facetas'):
+            return resposta_json({
+                "projetos": _montar_json_projetos(linhas),
+                "facetas": calcular_facetas(ids_temas if isinstance(ids_temas, list) else None, termo_busca),
+            })
+        return resposta_json(_montar_json_projetos(linhas))
 
     except Exception as e:
         print(f"ERRO: {e}")
@@ -122,7 +288,10 @@ def detalhes_projeto(id_projeto):
     """
     current_user_id = int(get_jwt_identity())
     
-    projeto = db.session.get(TB_Projeto, id_projeto)
+    # Temas não aparecem no detalhe: evita o carregamento 'subquery' padrão do relacionamento
+    projeto = db.session.get(TB_Projeto, id_projeto, options=[
+        joinedload(TB_Projeto.ultima_situacao), lazyload(TB_Projeto.temas)
+    ])
     if not projeto:
         return jsonify({"erro": "Projeto não encontrado"}), 404
 
@@ -131,7 +300,7 @@ def detalhes_projeto(id_projeto):
     ).first() is not None
 
     timeline = []
-    for tram in projeto.tramitacoes: 
+    for tram in db.session.scalars(consulta_timeline(id_projeto)): 
         timeline.append({
             "data": tram.data_hora.strftime("%d de %b. de %Y"),
             "titulo": tram.situacao.ds_situacao if tram.situacao else "Tramitação",
@@ -149,6 +318,158 @@ def detalhes_projeto(id_projeto):
         "timeline": timeline
     }), 200
 
+@bp.route("/exportar", methods=["GET"])
+@jwt_required()
+def exportar_projetos():
+    """
+    Exporta projetos com tramitações e temas (streaming)
+    ---
+    tags:
+      - Projetos
+    security:
+      - Bearer: []
+    parameters:
+      - name: formato
+        in: query
+        type: string
+        enum: [ndjson, csv]
+        default: ndjson
+      - name: ano
+        in: query
+        type: integer
+      - name: tema
+        in: query
+        type: integer
+        description: Código do tema
+      - name: situacao
+        in: query
+        type: integer
+        description: Código da situação atual
+      - name: desde
+        in: query
+        type: string
+        description: Só projetos movimentados a partir desta data (AAAA-MM-DD)
+    description: >
+      A resposta é enviada em pedaços enquanto o banco é lido por cursor,
+      sem montar a exportação inteira na memória. Para cargas completas
+      prefira a linha de comando (python -m app.exportacao).
+    responses:
+      200:
+        description: NDJSON (um projeto por linha) ou CSV (uma linha por tramitação)
+      400:
+        description: Formato ou filtros inválidos
+    """
+    formato = request.args.get("formato", "ndjson")
+    try:
+        filtros = exportacao.validar_filtros(
+            request.args.get("ano"), request.args.get("tema"),
+            request.args.get("situacao"), request.args.get("desde"),
+        )
+        pedacos = exportacao.gerar(formato, filtros)
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+    return Response(
+        stream_with_context(pedacos),
+        mimetype=exportacao.FORMATOS[formato],
+        headers={
+            "Content-Disposition": f"attachment; filename=projetos.{formato}",
+            "X-Accel-Buffering": "no",
+        }
+    )
+
+@bp.route("/projetos/lote", methods=["POST"])
+@jwt_required()
+def lote_projetos():
+    """
+    Resumo de vários projetos numa chamada só
+    ---
+    tags:
+      - Projetos
+    security:
+      - Bearer: []
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            ids:
+              type: array
+              items:
+                type: integer
+              description: IDs dos projetos (até 200)
+    responses:
+      200:
+        description: Projetos encontrados, na ordem dos ids pedidos (inexistentes são omitidos)
+      400:
+        description: Lista de ids inválida
+    """
+    current_user_id = int(get_jwt_identity())
+    try:
+        ids = _ids_do_corpo(request.get_json() or {}, 'ids')
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+    if not ids:
+        return resposta_json([])
+
+    linhas = db.session.execute(consulta_lote_projetos(current_user_id, ids)).all()
+    por_id = {linha[0]: linha for linha in linhas}
+
+    return resposta_json(_montar_json_projetos(por_id[i] for i in ids if i in por_id))
+
+@bp.route("/projetos/<int:id_projeto>/semelhantes", methods=["GET"])
+@jwt_required()
+def listar_semelhantes(id_projeto):
+    """
+    Projetos com ementa parecida (pré-calculados pelo worker)
+    ---
+    tags:
+      - Projetos
+    security:
+      - Bearer: []
+    parameters:
+      - name: id_projeto
+        in: path
+        type: integer
+        required: true
+        description: ID do projeto na Câmara
+    responses:
+      200:
+        description: Projetos semelhantes, do mais parecido para o menos (vazia se ainda não calculada)
+    """
+    current_user_id = int(get_jwt_identity())
+    linhas = db.session.execute(consulta_semelhantes(current_user_id, id_projeto)).all()
+    return resposta_json(_montar_json_projetos(linhas))
+
+# ============================================================================
+# ROTAS DE FEED (HOME PERSONALIZADA)
+# ============================================================================
+
+@bp.route("/feed", methods=["GET"])
+@jwt_required()
+def listar_feed():
+    """
+    Feed personalizado com os projetos dos temas que o usuário segue
+    ---
+    tags:
+      - Projetos
+    security:
+      - Bearer: []
+    description: >
+      Lido de uma tabela pré-calculada pelo worker (usuarios.tb_feed),
+      ordenada pela data da última movimentação de cada projeto.
+    responses:
+      200:
+        description: Lista de projetos do feed
+    """
+    current_user_id = int(get_jwt_identity())
+
+    linhas = db.session.execute(consulta_feed(current_user_id)).all()
+
+    return resposta_json(_montar_json_projetos(linhas))
+
 # ============================================================================
 # ROTAS DE FAVORITOS
 # ============================================================================
@@ -169,18 +490,9 @@ def listar_favoritos():
     """
     current_user_id = int(get_jwt_identity())
     
-    favoritos = db.session.scalars(
-        db.select(RL_Favoritos).filter_by(id_user=current_user_id)
-        .options(joinedload(RL_Favoritos.projeto))
-    ).all()
-
-    projetos_json = []
-    for fav in favoritos:
-        if fav.projeto:
-            p_json = _montar_json_projeto(fav.projeto, {fav.projeto.id_projeto})
-            projetos_json.append(p_json)
+    linhas = db.session.execute(consulta_favoritos(current_user_id)).all()
 
-    return jsonify(projetos_json), 200
+    return resposta_json(_montar_json_projetos(linhas))
 
 @bp.route("/favoritar/<int:id_projeto>", methods=["POST"])
 @jwt_required()
@@ -205,7 +517,7 @@ def toggle_favorito(id_projeto):
     """
     current_user_id = int(get_jwt_identity())
     
-    projeto = db.session.get(TB_Projeto, id_projeto)
+    projeto = db.session.get(TB_Projeto, id_projeto, options=[lazyload(TB_Projeto.temas)])
     if not projeto:
         return jsonify({"erro": "Projeto inválido"}), 404
 
@@ -226,6 +538,72 @@ def toggle_favorito(id_projeto):
     db.session.commit()
     return jsonify({"mensagem": msg, "is_favorite": is_favorite}), 200
 
+@bp.route("/favoritos/lote", methods=["POST"])
+@jwt_required()
+def lote_favoritos():
+    """
+    Adiciona e remove vários favoritos numa transação
+    ---
+    tags:
+      - Favoritos
+    security:
+      - Bearer: []
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            adicionar:
+              type: array
+              items:
+                type: integer
+            remover:
+              type: array
+              items:
+                type: integer
+    responses:
+      200:
+        description: IDs efetivamente adicionados e removidos (os demais já estavam no estado pedido ou não existem)
+      400:
+        description: Listas inválidas ou um mesmo id nas duas
+    """
+    current_user_id = int(get_jwt_identity())
+    dados = request.get_json() or {}
+    try:
+        adicionar = _ids_do_corpo(dados, 'adicionar')
+        remover = _ids_do_corpo(dados, 'remover')
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+    if set(adicionar) & set(remover):
+        return jsonify({"erro": "Um mesmo projeto não pode ser adicionado e removido"}), 400
+
+    removidos, adicionados = [], []
+    if remover:
+        removidos = db.session.scalars(
+            db.delete(RL_Favoritos)
+            .where(RL_Favoritos.id_user == current_user_id, RL_Favoritos.id_projeto.in_(remover))
+            .returning(RL_Favoritos.id_projeto)
+        ).all()
+    if adicionar:
+        # Só projetos existentes; os que já eram favoritos ficam de fora pelo ON CONFLICT
+        adicionados = db.session.scalars(
+            pg_insert(RL_Favoritos)
+            .from_select(
+                ["id_user", "id_projeto"],
+                db.select(db.literal(current_user_id), TB_Projeto.id_projeto).where(TB_Projeto.id_projeto.in_(adicionar))
+            )
+            .on_conflict_do_nothing(constraint='uq_user_projeto_favorito')
+            .returning(RL_Favoritos.id_projeto)
+        ).all()
+
+    db.session.commit()
+    return jsonify({
+        "adicionados": [str(i) for i in sorted(adicionados)],
+        "removidos": [str(i) for i in sorted(removidos)],
+    }), 200
+
 # ============================================================================
 # ROTAS DE INTERESSES
 # ============================================================================
@@ -296,9 +674,12 @@ def gerenciar_interesses():
             db.session.query(TB_Interesses).filter_by(id_user=current_user_id).delete()
 
             if ids_temas_recebidos:
-                for id_tema in ids_temas_recebidos:
-                    novo = TB_Interesses(id_user=current_user_id, id_interesse=id_tema)
-                    db.session.add(novo)
+                # Um único INSERT em lote, em vez de um por tema
+                db.session.execute(db.insert(TB_Interesses), [
+                    {"id_user": current_user_id, "id_interesse": id_tema} for id_tema in set(ids_temas_recebidos)
+                ])
+
+            reconstruir_feed_usuario(current_user_id)
 
             db.session.commit()
             return jsonify({"mensagem": "Interesses atualizados"}), 200
@@ -326,24 +707,135 @@ def listar_notificacoes():
     """
     current_user_id = int(get_jwt_identity())
     
-    notificacoes = db.session.scalars(
-        db.select(TB_Notificacao)
-        .filter_by(id_user=current_user_id)
-        .order_by(TB_Notificacao.data_hora.desc())
-    ).all()
-
-    resp = []
-    for n in notificacoes:
-        resp.append({
-            "id": n.id,
-            "title": n.titulo,
-            "description": n.descricao,
-            "date": n.data_hora.strftime("%d de %b. de %Y"),
-            "isUnread": not n.lida
-        })
+    notificacoes = db.session.scalars(consulta_notificacoes(current_user_id)).all()
+
+    resp = [_montar_json_notificacao(n) for n in notificacoes]
     
     return jsonify(resp), 200
 
+@bp.route("/notificacoes/stream", methods=["GET"])
+@jwt_required()
+def stream_notificacoes():
+    """
+    Stream de notificações novas (Server-Sent Events)
+    ---
+    tags:
+      - Notificações
+    security:
+      - Bearer: []
+    description: >
+      Mantém a conexão aberta e envia um evento `notificacao` para cada
+      notificação nova ou agrupada do usuário (a agrupada mantém o id e chega
+      de novo com o texto atualizado). O `id` de cada evento é o maior ID de
+      notificação já enviado; ao reconectar, o cliente envia o header
+      `Last-Event-ID` (ou `?ultimo_id=`) e recebe as notificações criadas
+      depois dele. Agrupamentos perdidos durante a desconexão chegam pelo
+      GET /api/sync. Cada processo atende no máximo SSE_MAX_CONEXOES streams;
+      acima disso a resposta é 503 com Retry-After.
+    parameters:
+      - name: Last-Event-ID
+        in: header
+        type: integer
+        required: false
+      - name: ultimo_id
+        in: query
+        type: integer
+        required: false
+    produces:
+      - text/event-stream
+    responses:
+      200:
+        description: Stream de eventos aberto
+      503:
+        description: Limite de streams do processo atingido
+    """
+    current_user_id = int(get_jwt_identity())
+    heartbeat = current_app.config['SSE_HEARTBEAT_SEGUNDOS']
+
+    try:
+        ultimo_id = int(request.headers.get('Last-Event-ID') or request.args.get('ultimo_id'))
+    except (TypeError, ValueError):
+        # Sem ponto de retomada: o cliente acabou de carregar a lista, enviamos só o que vier depois
+        # Maior id, não a mais recente por data_hora: é o mesmo critério de buscar_novas (id > cursor)
+        ultimo_id = db.session.scalar(
+            db.select(db.func.max(TB_Notificacao.id)).where(TB_Notificacao.id_user == current_user_id)
+        ) or 0
+        db.session.close()
+
+    def buscar_novas(desde_id):
+        novas = db.session.scalars(
+            db.select(TB_Notificacao)
+            .filter(TB_Notificacao.id_user == current_user_id, TB_Notificacao.id > desde_id)
+            .order_by(TB_Notificacao.id)
+        ).all()
+        eventos = [(n.id, _montar_json_notificacao(n)) for n in novas]
+        # Devolve a conexão ao pool: a stream pode ficar minutos parada
+        db.session.close()
+        return eventos
+
+    def buscar_alteradas(desde_versao):
+        # Inserções e agrupamentos ("3 novas tramitações") mudam a versão sem mudar o id;
+        # só até a versão segura, para não pular uma transação ainda aberta
+        ate = sincronizacao.versao_segura()
+        alteradas = db.session.scalars(
+            db.select(TB_Notificacao)
+            .filter(
+                TB_Notificacao.id_user == current_user_id,
+                TB_Notificacao.versao > desde_versao,
+                TB_Notificacao.versao <= ate,
+                TB_Notificacao.lida.isnot(True),
+            )
+            .order_by(TB_Notificacao.id)
+        ).all()
+        eventos = [(n.id, _montar_json_notificacao(n)) for n in alteradas]
+        db.session.close()
+        return eventos, ate
+
+    try:
+        fila = broker.assinar(current_user_id)
+    except StreamsEsgotados:
+        resposta = jsonify({"erro": "Muitas conexões de notificações neste servidor. Tente novamente em instantes."})
+        resposta.status_code = 503
+        resposta.headers["Retry-After"] = "5"
+        return resposta
+
+    def gerar():
+        cursor = ultimo_id
+        # Lida antes da retomada por id: o que mudar depois dela sai em buscar_alteradas
+        versao = sincronizacao.versao_segura()
+        yield "retry: 5000\n\n"
+        eventos = buscar_novas(cursor)
+        revisar = False
+        while True:
+            for id_notif, dados in eventos:
+                # O id do evento é o maior id já enviado (Last-Event-ID da retomada), não o da
+                # notificação: uma notificação antiga agrupada não faz o cursor voltar
+                cursor = max(cursor, id_notif)
+                yield f"id: {cursor}\nevent: notificacao\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+            try:
+                acordado = fila.get(timeout=heartbeat)
+            except queue.Empty:
+                acordado = False
+                yield ": keep-alive\n\n"
+            if broker.encerrando():
+                # Worker saindo (max_requests, HUP): o cliente reconecta em outro com Last-Event-ID
+                return
+            eventos = []
+            if acordado or revisar:
+                eventos, versao = buscar_alteradas(versao)
+            # Uma transação aberta com versão menor pode ter segurado a versão segura:
+            # o heartbeat seguinte a um aviso busca de novo
+            revisar = acordado
+
+    resposta = Response(
+        stream_with_context(gerar()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Libera a vaga mesmo se o gerador nunca chegar a rodar (cliente caiu antes do primeiro byte)
+    resposta.call_on_close(lambda: broker.cancelar(current_user_id, fila))
+    return resposta
+
 @bp.route("/notificacoes/<int:id_notificacao>/ler", methods=["POST"])
 @jwt_required()
 def marcar_notificacao_lida(id_notificacao):
@@ -365,11 +857,97 @@ def marcar_notificacao_lida(id_notificacao):
     """
     current_user_id = int(get_jwt_identity())
     
-    notificacao = db.session.get(TB_Notificacao, id_notificacao)
+    # A PK é (id, data_hora) por causa do particionamento: atualiza direto pelo id + dono
+    resultado = db.session.execute(
+        db.update(TB_Notificacao)
+        .where(TB_Notificacao.id == id_notificacao, TB_Notificacao.id_user == current_user_id)
+        .values(lida=True)
+    )
     
-    if notificacao and notificacao.id_user == current_user_id:
-        notificacao.lida = True
+    if resultado.rowcount:
         db.session.commit()
         return jsonify({"ok": True}), 200
         
-    return jsonify({"erro": "Notificação não encontrada"}), 404
\ No newline at end of file
+    return jsonify({"erro": "Notificação não encontrada"}), 404
+
+# ============================================================================
+# SINCRONIZAÇÃO INCREMENTAL (CACHE OFFLINE DO APP)
+# ============================================================================
+
+@bp.route("/sync", methods=["GET"])
+@jwt_required()
+def sincronizar():
+    """
+    Alterações desde o último token (projetos, favoritos e notificações)
+    ---
+    tags:
+      - Sincronização
+    security:
+      - Bearer: []
+    parameters:
+      - name: since
+        in: query
+        type: string
+        required: false
+        description: Token devolvido pela chamada anterior. Sem ele, só o token atual é devolvido.
+    description: >
+      Devolve os projetos cuja data ou situação mudou, os favoritos adicionados
+      e removidos e as notificações novas ou alteradas desde o token. Cada lista
+      traz no máximo SYNC_LIMITE itens; com "mais" = true, chame de novo com o
+      token recebido. Com "reiniciar" = true o token expirou e o app deve
+      recarregar as listas completas.
+    responses:
+      200:
+        description: Alterações e o próximo token
+      400:
+        description: Token inválido
+    """
+    current_user_id = int(get_jwt_identity())
+    token = request.args.get("since")
+    # Antes das consultas: tudo até `ate` já está confirmado e visível para elas
+    ate = sincronizacao.versao_segura()
+
+    if not token:
+        return jsonify({"token": sincronizacao.emitir_token(ate), "reiniciar": True}), 200
+
+    try:
+        desde, emitido_em = sincronizacao.ler_token(token)
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+    if sincronizacao.expirado(emitido_em):
+        return jsonify({"token": sincronizacao.emitir_token(ate), "reiniciar": True}), 200
+
+    limite = sincronizacao.LIMITE
+    projetos, v_projetos, t_projetos = sincronizacao.cortar(
+        db.session.execute(consulta_sync_projetos(current_user_id, desde, ate, limite)).all(), limite, lambda l: l[-1]
+    )
+    favoritos, v_favoritos, t_favoritos = sincronizacao.cortar(
+        db.session.execute(consulta_sync_favoritos(current_user_id, desde, ate, limite)).all(), limite, lambda l: l[-1]
+    )
+    removidos, v_removidos, t_removidos = sincronizacao.cortar(
+        db.session.execute(consulta_sync_remocoes(current_user_id, desde, ate, limite)).all(), limite, lambda l: l[-1]
+    )
+    notificacoes, v_notificacoes, t_notificacoes = sincronizacao.cortar(
+        db.session.scalars(consulta_sync_notificacoes(current_user_id, desde, ate, limite)).all(), limite, lambda n: n.versao
+    )
+
+    # Lista truncada: o próximo token para no último item entregue dela (o resto é reenviado, sem perda)
+    cortes = [
+        (versao, truncada) for versao, truncada in (
+            (v_projetos, t_projetos), (v_favoritos, t_favoritos),
+            (v_removidos, t_removidos), (v_notificacoes, t_notificacoes),
+        ) if versao is not None
+    ]
+    truncadas = [versao for versao, truncada in cortes if truncada]
+    proxima = min(truncadas) if truncadas else max(desde, ate)
+
+    return resposta_json({
+        "token": sincronizacao.emitir_token(proxima),
+        "mais": bool(truncadas),
+        "reiniciar": False,
+        "projetos": _montar_json_projetos(linha[:-1] for linha in projetos),
+        "favoritos_adicionados": _montar_json_projetos(linha[:-1] for linha in favoritos),
+        "favoritos_removidos": [str(id_projeto) for id_projeto, _ in removidos],
+        "notificacoes": [_montar_json_notificacao(n) for n in notificacoes],
+    })
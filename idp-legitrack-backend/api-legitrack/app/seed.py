@@ -1,40 +1,12 @@
 import time
 import requests
 from datetime import datetime, timedelta
-from . import create_app, db
-from .models import (
-    TP_Situacao, TP_Tramitacao, TP_Temas, TB_Projeto, RL_Tramitacoes,
-    TB_User, TB_Notificacao
-)
-from sqlalchemy.exc import OperationalError
-from sqlalchemy import text
+from concurrent.futures import ThreadPoolExecutor
+from . import criar_app_dados, db, wait_for_db
+from .carga import CargaEmLote, SEED_THREADS, buscar_detalhes_projeto
+from .models import TP_Situacao, TP_Tramitacao, TP_Temas, TB_User, TB_Notificacao
 from urllib.parse import urlparse, parse_qs
 
-app = create_app()
-app.app_context().push()
-
-def wait_for_db():
-    print("SEEDER: Aguardando o banco de dados ficar pronto...")
-    retries = 0
-    max_retries = 10
-    while retries < max_retries:
-        try:
-            db.session.execute(text('SELECT 1'))
-            print("SEEDER: Conexão com o banco de dados estabelecida!")
-            return True
-        except OperationalError:
-            retries += 1
-            wait_time = 5
-            print(f"SEEDER: Banco ainda não está pronto. Tentando novamente em {wait_time}s... (Tentativa {retries}/{max_retries})")
-            time.sleep(wait_time)
-        except Exception as e:
-            print(f"SEEDER: Erro inesperado ao esperar pelo banco: {e}")
-            retries += 1
-            time.sleep(5)
-            
-    print(f"SEEDER: ERRO CRÍTICO! Não foi possível conectar ao banco após {max_retries} tentativas. Encerrando.")
-    return False
-
 def sicronizar_tabelas_tp(url, model_class, id_field_name, ds_field_name, api_id_key, api_desc_key):
     tabela_nome = model_class.__tablename__
     print(f"SEEDER: Iniciando sicronização da tabela '{tabela_nome}'...")
@@ -104,111 +76,34 @@ def sicronizar_tabelas_tp(url, model_class, id_field_name, ds_field_name, api_id
         print(f"SEEDER: [ERRO] ERRO INESPERADO (fora do loop) ao sicronizar '{tabela_nome}': {e}")
         db.session.rollback()
 
-def processar_pagina_de_projetos(projetos_desta_pagina):
+def processar_pagina_de_projetos(projetos_desta_pagina, carga):
     """
-    Recebe uma lista de projetos (1 página) e salva
-    todos eles (Projeto, Tramitações, Temas) no banco.
+    Recebe uma lista de projetos (1 página), baixa tramitações e temas em
+    paralelo e acumula tudo na carga em lote. A carga grava a cada
+    CARGA_PROJETOS_POR_MERGE projetos; carga.aplicar() grava o resto no fim.
     """
-    projetos_atualizados = 0
-    projetos_novos = 0
-    novas_tramitacoes_total = 0
+    projetos_preparados = 0
+    tramitacoes_total = 0
 
     if not projetos_desta_pagina:
-        return 0, 0, 0
-
-    for projeto_resumido in projetos_desta_pagina:
-        id_api = None
-        try:
-            id_api_str = projeto_resumido.get('id')
-            if not id_api_str:
-                print(f"SEEDER (Projetos): [AVISO] Item de projeto resumido sem ID. Pulando item.")
-                continue
-            
-            id_api = int(id_api_str)
-            projeto_db = db.session.get(TB_Projeto, id_api)
-
-            if not projeto_db:
-                projeto_db = TB_Projeto(id_projeto=id_api)
-                db.session.add(projeto_db)
-                projetos_novos += 1
-            else:
-                projetos_atualizados += 1
-
-            projeto_db.titulo_projeto = projeto_resumido.get('ementa')
-            projeto_db.descricao = f"{projeto_resumido.get('siglaTipo')} {projeto_resumido.get('numero')}/{projeto_resumido.get('ano')}"
-            projeto_db.ano_inicio = str(projeto_resumido.get('ano'))
-
-            sequencias_existentes = {t.sequencia for t in projeto_db.tramitacoes}
-            url_tram = f"https://dadosabertos.camara.leg.br/api/v2/proposicoes/{id_api}/tramitacoes"
-            resposta_tram = requests.get(url_tram, timeout=10)
-            resposta_tram.raise_for_status()
-            tramitacoes_api = resposta_tram.json().get('dados', [])
-
-            novas_tramitacoes_para_salvar = []
-            
-            if not tramitacoes_api:
-                pass # Silencioso para não poluir log
-            else:
-                for item_tram_api in tramitacoes_api:
-                    try:
-                        if not isinstance(item_tram_api, dict):
-                            continue
-                        
-                        seq_api = int(item_tram_api['sequencia'])
-                        
-                        if seq_api not in sequencias_existentes:
-                            nova_tram = RL_Tramitacoes(
-                                id_projeto = id_api,
-                                sequencia = seq_api,
-                                data_hora = datetime.fromisoformat(item_tram_api['dataHora']),
-                                id_situacao = int(item_tram_api['codSituacao']),
-                                id_tramitacao = int(item_tram_api['codTipoTramitacao'])
-                            )
-                            novas_tramitacoes_para_salvar.append(nova_tram)
-                            
-                    except (ValueError, TypeError, KeyError, AttributeError):
-                        pass # Silencioso
-
-                if novas_tramitacoes_para_salvar:
-                    db.session.add_all(novas_tramitacoes_para_salvar)
-                    novas_tramitacoes_total += len(novas_tramitacoes_para_salvar)
-
-                ultimo_status = tramitacoes_api[-1]
-                try:
-                    projeto_db.data_hora = datetime.fromisoformat(ultimo_status.get("dataHora"))
-                    projeto_db.sigla_orgao = ultimo_status.get("siglaOrgao")
-                    projeto_db.despacho = ultimo_status.get("despacho")
-                    projeto_db.id_ultima_situacao = int(ultimo_status.get("codSituacao"))
-                    projeto_db.id_ultima_tramitacao = int(ultimo_status.get("codTipoTramitacao"))
-                except (ValueError, TypeError):
-                     pass
+        return 0, 0
 
-            resposta_tema = requests.get(f'https://dadosabertos.camara.leg.br/api/v2/proposicoes/{id_api}/temas', timeout=10)
-            resposta_tema.raise_for_status()
-            projeto_temas_api = resposta_tema.json().get("dados", [])
+    resumos = [p for p in projetos_desta_pagina if p.get('id')]
+    if len(resumos) < len(projetos_desta_pagina):
+        print(f"SEEDER (Projetos): [AVISO] {len(projetos_desta_pagina) - len(resumos)} itens sem ID. Pulando.")
 
-            if projeto_temas_api:
-                temas_existentes_ids = {tema.id_tema for tema in projeto_db.temas}
-                for tema_api in projeto_temas_api:
-                    try:
-                        if not isinstance(tema_api, dict):
-                           continue
-                        
-                        id_tema_api = int(tema_api.get('cod'))
-                        if id_tema_api not in temas_existentes_ids:
-                            tema_db = db.session.get(TP_Temas, id_tema_api)
-                            if tema_db:
-                                projeto_db.temas.append(tema_db)
-                    except (ValueError, TypeError, KeyError, AttributeError):
-                        pass
-
-            db.session.commit()
-            
-        except Exception as e:
-            print(f"SEEDER (Projetos): [ERRO CRÍTICO] Falha ao processar projeto {id_api}: {e}")
-            db.session.rollback()
+    with ThreadPoolExecutor(max_workers=SEED_THREADS) as executor:
+        for detalhes in executor.map(buscar_detalhes_projeto, resumos):
+            if not detalhes:
+                continue
+            try:
+                carga.adicionar_da_api(*detalhes)
+                projetos_preparados += 1
+                tramitacoes_total += len(detalhes[1])
+            except Exception as e:
+                print(f"SEEDER (Projetos): [ERRO CRÍTICO] Falha ao processar projeto {detalhes[0].get('id')}: {e}")
 
-    return projetos_novos, projetos_atualizados, novas_tramitacoes_total
+    return projetos_preparados, tramitacoes_total
 
 def get_total_pages():
     try:
@@ -282,7 +177,10 @@ def seed_dados_teste():
 
 if __name__ == "__main__":
     
-    if not wait_for_db():
+    app = criar_app_dados('worker')
+    app.app_context().push()
+
+    if not wait_for_db("SEEDER"):
         exit(1)
 
     print(f"\n--- [SEED SCRIPT]: {datetime.now()} - INICIANDO CARGA INICIAL ---")
@@ -324,6 +222,7 @@ if __name__ == "__main__":
                 if pagina_inicio < 1: pagina_inicio = 1
                 
                 print(f"\nSEEDER: Processando {pagina_inicio} até {pagina_fim}...")
+                carga = CargaEmLote()
                 
                 for pagina_atual in range(pagina_inicio, pagina_fim + 1):
                     url = f"https://dadosabertos.camara.leg.br/api/v2/proposicoes?pagina={pagina_atual}&itens=100&ordem=ASC&ordenarPor=id"
@@ -331,12 +230,15 @@ if __name__ == "__main__":
                     try:
                         resp = requests.get(url, timeout=20)
                         resp.raise_for_status()
-                        pn, pa, tn = processar_pagina_de_projetos(resp.json().get('dados', []))
-                        print(f"Status: {pn} novos, {tn} tramitações.")
+                        pn, tn = processar_pagina_de_projetos(resp.json().get('dados', []), carga)
+                        print(f"Status: {pn} projetos preparados, {tn} tramitações.")
                         time.sleep(1)
                     except Exception as e:
                         print(f"Erro na pág {pagina_atual}: {e}")
 
+                resultado = carga.aplicar()
+                print(f"SEEDER: {resultado['projetos']} projetos gravados, {resultado['tramitacoes']} tramitações novas.")
+
             except ValueError:
                 print("Entrada inválida.")
     else:
@@ -1,40 +1,14 @@
 import time
 import requests
-from datetime import datetime
-from . import create_app, db
-from .models import TP_Situacao, TP_Tramitacao, TP_Temas, TB_Projeto, RL_Tramitacoes
-from sqlalchemy.exc import OperationalError
-from sqlalchemy import text
-
-app = create_app()
-app.app_context().push()
+from concurrent.futures import ThreadPoolExecutor
+from . import criar_app_dados, db, wait_for_db
+from .carga import CargaEmLote, SEED_THREADS, buscar_detalhes_projeto
+from .models import TP_Situacao, TP_Tramitacao, TP_Temas
 
 # ============================================================================
 # FUNÇÕES DE SUPORTE
 # ============================================================================
 
-def wait_for_db():
-    print("SEEDER_RECENT: Aguardando o banco de dados ficar pronto...")
-    retries = 0
-    max_retries = 10
-    while retries < max_retries:
-        try:
-            db.session.execute(text('SELECT 1'))
-            print("SEEDER_RECENT: Conexão com o banco de dados estabelecida!")
-            return True
-        except OperationalError:
-            retries += 1
-            wait_time = 5
-            print(f"SEEDER_RECENT: Banco ainda não está pronto. Tentando novamente em {wait_time}s... (Tentativa {retries}/{max_retries})")
-            time.sleep(wait_time)
-        except Exception as e:
-            print(f"SEEDER_RECENT: Erro inesperado ao esperar pelo banco: {e}")
-            retries += 1
-            time.sleep(5)
-            
-    print(f"SEEDER_RECENT: ERRO CRÍTICO! Não foi possível conectar ao banco. Encerrando.")
-    return False
-
 def sicronizar_tabelas_tp(url, model_class, id_field_name, ds_field_name, api_id_key, api_desc_key):
     """
     Sincroniza tabelas de domínio (TP_Situacao, TP_Tema, etc)
@@ -151,95 +125,37 @@ def sicronizar_projetos_por_ano(ano_selecionado):
 
     print(f"SEEDER_RECENT: Total de {len(todos_projetos)} projetos encontrados. Iniciando detalhamento...")
 
-    # 2. Detalhamento: Busca detalhes, tramitações e temas para cada um
-    count_novos = 0
-    count_atualizados = 0
-
-    for i, resumo in enumerate(todos_projetos):
-        if (i + 1) % 50 == 0:
-            print(f"SEEDER_RECENT: Processando {i+1}/{len(todos_projetos)}...")
+    # 2. Detalhamento: tramitações e temas baixados em paralelo e carregados em lote (COPY + merge)
+    carga = CargaEmLote()
+    falhas = 0
 
-        try:
-            id_api = int(resumo.get('id'))
-            
-            # Verifica/Cria Projeto
-            projeto = db.session.get(TB_Projeto, id_api)
-            if not projeto:
-                projeto = TB_Projeto(id_projeto=id_api)
-                db.session.add(projeto)
-                count_novos += 1
-            else:
-                count_atualizados += 1
-
-            # Atualiza dados básicos
-            projeto.titulo_projeto = resumo.get('ementa')
-            projeto.descricao = f"{resumo.get('siglaTipo')} {resumo.get('numero')}/{resumo.get('ano')}"
-            projeto.ano_inicio = str(resumo.get('ano'))
+    with ThreadPoolExecutor(max_workers=SEED_THREADS) as executor:
+        for i, detalhes in enumerate(executor.map(buscar_detalhes_projeto, todos_projetos)):
+            if (i + 1) % 50 == 0:
+                print(f"SEEDER_RECENT: Processando {i+1}/{len(todos_projetos)}...")
 
-            # A. Busca Tramitações
-            url_tram = f"https://dadosabertos.camara.leg.br/api/v2/proposicoes/{id_api}/tramitacoes"
+            if not detalhes:
+                falhas += 1
+                continue
             try:
-                resp_tram = requests.get(url_tram, timeout=10)
-                if resp_tram.ok:
-                    trams = resp_tram.json().get('dados', [])
-                    seqs_existentes = {t.sequencia for t in projeto.tramitacoes}
-                    
-                    for t in trams:
-                        seq = int(t['sequencia'])
-                        if seq not in seqs_existentes:
-                            nova = RL_Tramitacoes(
-                                id_projeto=id_api,
-                                sequencia=seq,
-                                data_hora=datetime.fromisoformat(t['dataHora']),
-                                id_situacao=int(t['codSituacao']),
-                                id_tramitacao=int(t['codTipoTramitacao'])
-                            )
-                            db.session.add(nova)
-                    
-                    # Atualiza status final do projeto baseado na última tramitação
-                    if trams:
-                        ult = trams[-1]
-                        projeto.data_hora = datetime.fromisoformat(ult['dataHora'])
-                        projeto.sigla_orgao = ult.get('siglaOrgao')
-                        projeto.despacho = ult.get('despacho')
-                        projeto.id_ultima_situacao = int(ult.get('codSituacao'))
-                        projeto.id_ultima_tramitacao = int(ult.get('codTipoTramitacao'))
-
+                carga.adicionar_da_api(*detalhes)
             except Exception as e:
-                print(f"SEEDER_RECENT: Erro ao buscar tramitações do projeto {id_api}: {e}")
+                falhas += 1
+                print(f"SEEDER_RECENT: Erro crítico no projeto {detalhes[0].get('id')}: {e}")
 
-            # B. Busca Temas
-            url_tema = f"https://dadosabertos.camara.leg.br/api/v2/proposicoes/{id_api}/temas"
-            try:
-                resp_tema = requests.get(url_tema, timeout=10)
-                if resp_tema.ok:
-                    temas_api = resp_tema.json().get('dados', [])
-                    temas_ids_proj = {tema.id_tema for tema in projeto.temas}
-                    
-                    for t_api in temas_api:
-                        tid = int(t_api['cod'])
-                        if tid not in temas_ids_proj:
-                            tema_db = db.session.get(TP_Temas, tid)
-                            if tema_db:
-                                projeto.temas.append(tema_db)
-            except Exception:
-                pass
-
-            # Commit a cada projeto para salvar progresso
-            db.session.commit()
-
-        except Exception as e:
-            db.session.rollback()
-            print(f"SEEDER_RECENT: Erro crítico no projeto {resumo.get('id')}: {e}")
-
-    print(f"\nSEEDER_RECENT: Finalizado! {count_novos} novos, {count_atualizados} atualizados.")
+    resultado = carga.aplicar()
+    print(f"\nSEEDER_RECENT: Finalizado! {resultado['projetos']} projetos gravados, "
+          f"{resultado['tramitacoes']} tramitações novas, {falhas} falhas.")
 
 # ============================================================================
 # EXECUÇÃO
 # ============================================================================
 
 if __name__ == "__main__":
-    if not wait_for_db():
+    app = criar_app_dados('worker')
+    app.app_context().push()
+
+    if not wait_for_db("SEEDER_RECENT"):
         exit(1)
 
     print("\n--- [SEEDER RECENT]: ATUALIZAÇÃO POR ANO ---")
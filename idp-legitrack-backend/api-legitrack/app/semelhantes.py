@@ -0,0 +1,267 @@
+"""
+Projetos semelhantes: vizinhos mais próximos pela similaridade TF-IDF das ementas.
+
+Todo o cálculo fica fora da requisição:
+  - as ementas viram vetores TF-IDF (tf sublinear, idf suavizado, linhas
+    normalizadas em L2) numa matriz esparsa CSR do SciPy, então o cosseno
+    entre projetos é um produto de matrizes;
+  - os top-k vizinhos saem de produtos em lotes (LOTE projetos × todos),
+    sem materializar a matriz de similaridade inteira;
+  - as listas vão para camara.tb_projeto_semelhantes (uma linha por projeto,
+    ids e scores em ordem) e a rota GET /api/projetos/<id>/semelhantes é uma
+    leitura pela chave primária.
+
+O worker mantém o modelo em memória entre os ciclos. A cada ciclo só os
+projetos alterados são revetorizados (com o vocabulário e o idf vigentes) e
+recalculados; a lista de um projeto não alterado só muda se um alterado
+entrar ou sair dela. Termos novos e a deriva do idf entram na reconstrução
+completa, feita uma vez por dia.
+
+Uso:
+    python -m app.semelhantes              # cria a tabela (se faltar) e recalcula todos os projetos
+    python -m app.semelhantes --so-tabela  # só cria a tabela
+"""
+import argparse
+import os
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from datetime import datetime
+import numpy as np
+from scipy import sparse
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.schema import CreateIndex, CreateTable
+from .banco import db
+from .models import TB_ProjetoSemelhante
+
+K = int(os.getenv('SEMELHANTES_K', '10'))
+# Projetos por produto de matrizes (e por INSERT na gravação)
+LOTE = int(os.getenv('SEMELHANTES_LOTE', '2000'))
+SCORE_MINIMO = float(os.getenv('SEMELHANTES_SCORE_MINIMO', '0.1'))
+# Termos presentes em mais que esta fração das ementas não distinguem projetos ("dispõe", "altera")
+DF_MAXIMA = float(os.getenv('SEMELHANTES_DF_MAXIMA', '0.5'))
+
+# Palavras de 3+ letras sem conteúdo (as menores já ficam de fora pelo tamanho)
+STOPWORDS = frozenset(
+    "aos com das dos nas nos para pela pelas pelo pelos por que sem sob sobre uma".split()
+)
+
+_RE_MILHAR = re.compile(r"(?<=\d)\.(?=\d)")  # "Lei nº 8.666" -> termo "8666"
+_RE_TERMO = re.compile(r"[a-z0-9]{3,}")
+
+SQL_DOCUMENTOS = "SELECT id_projeto, titulo_projeto FROM camara.tb_projeto {filtro} ORDER BY id_projeto"
+
+SQL_AFETADOS = text("""
+    SELECT id_projeto, ids_semelhantes, scores
+    FROM camara.tb_projeto_semelhantes
+    WHERE id_projeto = ANY(CAST(:ids AS integer[]))
+       OR ids_semelhantes && CAST(:alterados AS integer[])
+""")
+
+
+def termos(texto):
+    """Termos da ementa: minúsculas, sem acento, 3+ caracteres, sem stopwords."""
+    texto = unicodedata.normalize("NFKD", (texto or "").lower()).encode("ascii", "ignore").decode()
+    return [t for t in _RE_TERMO.findall(_RE_MILHAR.sub("", texto)) if t not in STOPWORDS]
+
+
+class ModeloTfidf:
+    """Vocabulário, idf e a matriz normalizada (uma linha por projeto, na ordem de `ids`)."""
+
+    def __init__(self, vocabulario, idf):
+        self.vocabulario = vocabulario
+        self.idf = idf
+        self.ids = np.empty(0, dtype=np.int64)
+        self.matriz = sparse.csr_matrix((0, len(vocabulario)), dtype=np.float32)
+        self.linha = {}
+
+    @classmethod
+    def construir(cls, documentos):
+        """documentos: lista de (id_projeto, ementa)."""
+        listas = [termos(ementa) for _, ementa in documentos]
+        df = Counter(t for lista in listas for t in set(lista))
+        # Termo de uma ementa só não liga projetos entre si
+        maximo = max(2, DF_MAXIMA * len(documentos))
+        vocabulario = {t: n for n, t in enumerate(sorted(t for t, qtd in df.items() if 2 <= qtd <= maximo))}
+        idf = np.empty(len(vocabulario), dtype=np.float32)
+        for t, coluna in vocabulario.items():
+            idf[coluna] = np.log((1 + len(documentos)) / (1 + df[t])) + 1
+
+        modelo = cls(vocabulario, idf)
+        modelo._substituir([i for i, _ in documentos], modelo.vetorizar(listas))
+        return modelo
+
+    def vetorizar(self, listas):
+        """Matriz CSR (uma linha por lista de termos); termos fora do vocabulário são ignorados."""
+        indptr, indices, contagens = [0], [], []
+        for lista in listas:
+            contagem = Counter(self.vocabulario[t] for t in lista if t in self.vocabulario)
+            indices.extend(contagem.keys())
+            contagens.extend(contagem.values())
+            indptr.append(len(indices))
+        matriz = sparse.csr_matrix(
+            (np.array(contagens, dtype=np.float32), np.array(indices, dtype=np.int32), np.array(indptr)),
+            shape=(len(listas), len(self.vocabulario))
+        )
+        matriz.data = 1 + np.log(matriz.data)
+        matriz = matriz @ sparse.diags(self.idf)
+        normas = np.sqrt(np.asarray(matriz.multiply(matriz).sum(axis=1)).ravel())
+        normas[normas == 0] = 1
+        return (sparse.diags(1 / normas) @ matriz).tocsr().astype(np.float32)
+
+    def atualizar(self, documentos):
+        """Revetoriza os (id_projeto, ementa) informados; projetos novos viram linhas novas."""
+        self._substituir([i for i, _ in documentos], self.vetorizar([termos(e) for _, e in documentos]))
+
+    def _substituir(self, ids, vetores):
+        manter = ~np.isin(self.ids, ids)
+        self.ids = np.concatenate([self.ids[manter], np.asarray(ids, dtype=np.int64)])
+        self.matriz = sparse.vstack([self.matriz[manter], vetores], format="csr")
+        self.linha = {int(i): n for n, i in enumerate(self.ids)}
+
+    def vetores(self, ids):
+        return self.matriz[[self.linha[int(i)] for i in ids]]
+
+    def vizinhos(self, ids, k=K, lote=LOTE):
+        """
+        Gera, por lote, listas de (id_projeto, ids vizinhos, scores) com os k maiores
+        cossenos acima de SCORE_MINIMO, sem o próprio projeto.
+        """
+        transposta = self.matriz.T.tocsr()
+        for inicio in range(0, len(ids), lote):
+            ids_lote = ids[inicio:inicio + lote]
+            similaridades = (self.vetores(ids_lote) @ transposta).tocsr()
+            resultado = []
+            for n, id_projeto in enumerate(ids_lote):
+                ini, fim = similaridades.indptr[n], similaridades.indptr[n + 1]
+                colunas, scores = similaridades.indices[ini:fim], similaridades.data[ini:fim]
+                filtro = (scores >= SCORE_MINIMO) & (self.ids[colunas] != id_projeto)
+                colunas, scores = colunas[filtro], scores[filtro]
+                if len(scores) > k:
+                    maiores = np.argpartition(-scores, k)[:k]
+                    colunas, scores = colunas[maiores], scores[maiores]
+                ordem = np.argsort(-scores, kind="stable")
+                resultado.append((int(id_projeto), self.ids[colunas[ordem]], scores[ordem]))
+            yield resultado
+
+
+# Modelo do processo (o worker reaproveita entre os ciclos)
+_modelo = None
+
+
+def _documentos(ids=None):
+    if ids is None:
+        return db.session.execute(text(SQL_DOCUMENTOS.format(filtro=""))).all()
+    return db.session.execute(
+        text(SQL_DOCUMENTOS.format(filtro="WHERE id_projeto = ANY(CAST(:ids AS integer[]))")), {"ids": ids}
+    ).all()
+
+
+def _gravar(linhas):
+    """Upsert de (id_projeto, ids vizinhos, scores) em lotes de LOTE linhas."""
+    agora = datetime.now()
+    for inicio in range(0, len(linhas), LOTE):
+        insert = pg_insert(TB_ProjetoSemelhante).values([
+            {
+                "id_projeto": id_projeto,
+                "ids_semelhantes": [int(i) for i in ids],
+                "scores": [round(float(s), 4) for s in scores],
+                "atualizado_em": agora,
+            }
+            for id_projeto, ids, scores in linhas[inicio:inicio + LOTE]
+        ])
+        db.session.execute(insert.on_conflict_do_update(
+            index_elements=[TB_ProjetoSemelhante.id_projeto],
+            set_={coluna: insert.excluded[coluna] for coluna in ("ids_semelhantes", "scores", "atualizado_em")}
+        ))
+
+
+def instalar():
+    """Cria a tabela de vizinhos, se faltar."""
+    with db.engine.begin() as conn:
+        conn.execute(CreateTable(TB_ProjetoSemelhante.__table__, if_not_exists=True))
+        for indice in TB_ProjetoSemelhante.__table__.indexes:
+            conn.execute(CreateIndex(indice, if_not_exists=True))
+
+
+def reconstruir():
+    """
+    Reconstrói o modelo com todas as ementas e recalcula todas as listas.
+    Não faz commit. Retorna a quantidade de projetos.
+    """
+    global _modelo
+    _modelo = ModeloTfidf.construir(_documentos())
+    qtd = 0
+    for lote in _modelo.vizinhos(_modelo.ids):
+        _gravar(lote)
+        qtd += len(lote)
+    return qtd
+
+
+def _reordenar_afetados(alterados):
+    """
+    Listas de projetos não alterados em que um alterado entra (score novo acima do
+    mínimo) ou já estava (score antigo). Retorna as linhas a regravar.
+    """
+    conjunto = set(alterados.tolist())
+    reverso = (_modelo.matriz @ _modelo.vetores(alterados).T).tocoo()
+    filtro = reverso.data >= SCORE_MINIMO
+    novos = defaultdict(dict)
+    for linha, coluna, score in zip(reverso.row[filtro], reverso.col[filtro], reverso.data[filtro]):
+        id_projeto = int(_modelo.ids[linha])
+        if id_projeto not in conjunto:
+            novos[id_projeto][int(alterados[coluna])] = float(score)
+
+    armazenadas = {
+        id_projeto: dict(zip(ids, scores))
+        for id_projeto, ids, scores in db.session.execute(
+            SQL_AFETADOS, {"ids": sorted(novos), "alterados": sorted(conjunto)}
+        )
+        if id_projeto not in conjunto
+    }
+
+    linhas = []
+    for id_projeto in sorted(set(novos) | set(armazenadas)):
+        candidatos = {i: s for i, s in armazenadas.get(id_projeto, {}).items() if i not in conjunto}
+        candidatos.update(novos.get(id_projeto, {}))
+        melhores = sorted(candidatos.items(), key=lambda item: -item[1])[:K]
+        linhas.append((id_projeto, [i for i, _ in melhores], [s for _, s in melhores]))
+    return linhas
+
+
+def atualizar_semelhantes(ids_projetos):
+    """
+    Atualização incremental depois de um ciclo do worker. Sem modelo em memória
+    (primeira chamada do processo) faz a reconstrução completa.
+    Não faz commit. Retorna a quantidade de listas gravadas.
+    """
+    if _modelo is None:
+        return reconstruir()
+    documentos = _documentos(sorted({int(i) for i in ids_projetos}))
+    if not documentos:
+        return 0
+    _modelo.atualizar(documentos)
+    alterados = np.array([i for i, _ in documentos], dtype=np.int64)
+    linhas = [linha for lote in _modelo.vizinhos(alterados) for linha in lote]
+    linhas.extend(_reordenar_afetados(alterados))
+    _gravar(linhas)
+    return len(linhas)
+
+
+if __name__ == "__main__":
+    from . import criar_app_dados
+
+    parser = argparse.ArgumentParser(description="Calcula os projetos semelhantes (TF-IDF das ementas).")
+    parser.add_argument("--so-tabela", action="store_true", help="Só cria a tabela, sem calcular")
+    args = parser.parse_args()
+
+    app = criar_app_dados('worker')
+    with app.app_context():
+        print("--- [SEMELHANTES] INICIANDO ---")
+        instalar()
+        if not args.so_tabela:
+            qtd = reconstruir()
+            db.session.commit()
+            print(f"SEMELHANTES: Vizinhos de {qtd} projetos calculados ({len(_modelo.vocabulario)} termos).")
+        print("--- [SEMELHANTES] CONCLUÍDO ---")
@@ -0,0 +1,67 @@
+"""
+Hash e verificação de senha num executor limitado.
+
+check_password_hash/generate_password_hash (scrypt) são caros de propósito. Num
+pico de logins, cada thread do gunicorn ocupada com um hash é uma thread a
+menos para o resto da API. A thread da requisição espera o resultado, então o
+que protege a API é o limite: no máximo SENHAS_THREADS hashes por processo
+(padrão: metade de GUNICORN_THREADS) e SENHAS_PENDENTES na fila (padrão 0).
+Quem não acha vaga em SENHAS_ESPERA_VAGA segundos (padrão 0: na hora) recebe
+SenhasOcupadas (a rota responde 503 com Retry-After), e as outras threads do
+worker continuam livres para o resto da API. threads + pendentes precisa
+ficar abaixo de GUNICORN_THREADS, senão o 503 nunca acontece.
+
+O pool é criado no primeiro uso e recriado se o pid mudar: com preload_app o
+gunicorn importa o app no master e faz fork dos workers, e threads não
+sobrevivem ao fork.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import check_password_hash, generate_password_hash
+
+SENHAS_THREADS = int(os.getenv('SENHAS_THREADS', max(1, int(os.getenv('GUNICORN_THREADS', '4')) // 2)))
+SENHAS_PENDENTES = int(os.getenv('SENHAS_PENDENTES', '0'))
+SENHAS_ESPERA_VAGA = float(os.getenv('SENHAS_ESPERA_VAGA', '0'))
+
+
+class SenhasOcupadas(Exception):
+    """Todas as vagas do executor estão ocupadas; tente de novo em instantes."""
+
+
+class ExecutorSenhas:
+
+    def __init__(self, threads=SENHAS_THREADS, pendentes=SENHAS_PENDENTES, espera_vaga=SENHAS_ESPERA_VAGA):
+        self.threads = threads
+        self.espera_vaga = espera_vaga
+        self._vagas = threading.BoundedSemaphore(threads + pendentes)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="senhas")
+                self._pid = os.getpid()
+            return self._pool
+
+    def _executar(self, funcao, *args):
+        # timeout=0 (padrão): não espera, falha na hora se as vagas estão ocupadas
+        if not self._vagas.acquire(timeout=self.espera_vaga):
+            raise SenhasOcupadas()
+        try:
+            return self._executor().submit(funcao, *args).result()
+        finally:
+            self._vagas.release()
+
+    def verificar(self, password_hash, senha):
+        if not password_hash or not senha:
+            return False
+        return self._executar(check_password_hash, password_hash, senha)
+
+    def gerar(self, senha):
+        return self._executar(generate_password_hash, senha)
+
+
+executor_senhas = ExecutorSenhas()
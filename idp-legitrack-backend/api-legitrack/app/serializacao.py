@@ -0,0 +1,35 @@
+"""
+Serialização rápida das respostas de listagem.
+
+Usa orjson quando disponível (bem mais rápido que o json da stdlib usado pelo
+jsonify) e memoriza a formatação das datas, que se repetem muito entre linhas.
+"""
+import json
+from functools import lru_cache
+from flask import current_app
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional: cai no json da stdlib
+    orjson = None
+
+
+@lru_cache(maxsize=8192)
+def _formatar_dia(dia):
+    return dia.strftime("%d de %b. de %Y")
+
+
+def formatar_data(data_hora):
+    """Formata como '05 de Mar. de 2024'; o cache é por dia, não por instante."""
+    if not data_hora:
+        return ""
+    return _formatar_dia(data_hora.date())
+
+
+def resposta_json(dados, status=200):
+    """Equivalente a jsonify(dados), status com um encoder mais rápido."""
+    if orjson is not None:
+        corpo = orjson.dumps(dados)
+    else:
+        corpo = json.dumps(dados, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return current_app.response_class(corpo, status=status, mimetype="application/json")
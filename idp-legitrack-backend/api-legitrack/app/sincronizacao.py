@@ -0,0 +1,187 @@
+"""
+Rastreamento de alterações por linha para o GET /api/sync (cache offline do app).
+
+Uma sequência global (usuarios.seq_versao_sync) numera as alterações. Gatilhos
+gravam o próximo valor na coluna `versao` de:
+
+  - camara.tb_projeto: ao inserir e quando data_hora ou a última situação mudam;
+  - usuarios.rl_favoritos: ao inserir (a remoção vira uma lápide em tb_remocoes);
+  - usuarios.tb_notificacoes: ao inserir e em qualquer alteração (lida, agrupamento).
+
+Assim "o que mudou desde X" é uma leitura por faixa em índices (versao > X).
+O token entregue ao cliente é opaco: codifica a versão e o momento da emissão.
+
+A versão sai do nextval() na escrita, não no commit: uma transação longa (o
+dispatcher, uma carga) pode confirmar a versão 10 depois de outra já ter
+confirmado a 11. Um token emitido em 11 perderia a 10 para sempre. Por isso
+toda transação, antes da primeira versão, anuncia um piso das versões que vai
+gravar com um advisory lock compartilhado (visível em pg_locks na hora, ao
+contrário das linhas ainda não confirmadas). versao_segura() devolve a maior
+versão abaixo desses pisos, e o sync só lê e só emite tokens até ela.
+Lápides mais antigas que SYNC_RETENCAO_DIAS são apagadas pela manutenção
+diária do worker; um token mais velho que isso pede recarga completa.
+
+Uso:
+    python -m app.sincronizacao    # cria sequência, colunas e gatilhos (idempotente)
+"""
+import base64
+import binascii
+import os
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from sqlalchemy.schema import CreateTable
+from .banco import db
+from .models import RL_Favoritos, TB_Notificacao, TB_Projeto, TB_Remocao
+
+RETENCAO_DIAS = int(os.getenv('SYNC_RETENCAO_DIAS', '30'))
+LIMITE = int(os.getenv('SYNC_LIMITE', '500'))
+
+SEQUENCIA = "usuarios.seq_versao_sync"
+# Chave dos advisory locks que anunciam versões em aberto: BASE + piso (fora da faixa dos outros locks)
+BASE_LOCK = 1 << 62
+TABELAS_VERSIONADAS = [TB_Projeto.__table__, RL_Favoritos.__table__, TB_Notificacao.__table__]
+
+DDL_FUNCOES = [
+    # O lock é tomado antes do nextval e com chave <= versão sorteada (sequência com CACHE 1):
+    # quem ler last_value antes de pg_locks nunca vê uma versão em aberto sem ver o piso dela
+    f"""
+    CREATE OR REPLACE FUNCTION usuarios.fn_proxima_versao() RETURNS bigint LANGUAGE plpgsql AS $$
+    BEGIN
+        IF coalesce(current_setting('legitrack.versao_aberta', true), '') = '' THEN
+            PERFORM pg_advisory_xact_lock_shared(
+                {BASE_LOCK} + (SELECT CASE WHEN is_called THEN last_value + 1 ELSE last_value END FROM {SEQUENCIA})
+            );
+            PERFORM set_config('legitrack.versao_aberta', '1', true);
+        END IF;
+        RETURN nextval('{SEQUENCIA}');
+    END $$
+    """,
+    # Sequência lida antes de pg_locks, em comandos separados: a ordem importa
+    f"""
+    CREATE OR REPLACE FUNCTION usuarios.fn_versao_segura() RETURNS bigint LANGUAGE plpgsql AS $$
+    DECLARE
+        ultima bigint;
+        piso bigint;
+    BEGIN
+        SELECT CASE WHEN is_called THEN last_value ELSE last_value - 1 END INTO ultima FROM {SEQUENCIA};
+        SELECT min(((classid::bigint << 32) | objid::bigint) - {BASE_LOCK}) INTO piso
+        FROM pg_locks
+        WHERE locktype = 'advisory' AND objsubid = 1 AND classid::bigint >= {BASE_LOCK >> 32};
+        RETURN CASE WHEN piso IS NULL THEN ultima ELSE least(ultima, piso - 1) END;
+    END $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION usuarios.fn_versao_sync() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.versao := usuarios.fn_proxima_versao();
+        RETURN NEW;
+    END $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION usuarios.fn_remocao_favorito() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        INSERT INTO usuarios.tb_remocoes (versao, tabela, id_user, id_registro, removido_em)
+        VALUES (usuarios.fn_proxima_versao(), TG_TABLE_NAME, OLD.id_user, OLD.id_projeto, now());
+        RETURN OLD;
+    END $$
+    """,
+]
+
+# (tabela, nome do gatilho, definição após "CREATE TRIGGER <nome>")
+GATILHOS = [
+    ("camara.tb_projeto", "tg_versao_sync_insert",
+     "BEFORE INSERT ON camara.tb_projeto FOR EACH ROW EXECUTE FUNCTION usuarios.fn_versao_sync()"),
+    ("camara.tb_projeto", "tg_versao_sync_update",
+     "BEFORE UPDATE OF data_hora, id_ultima_situacao ON camara.tb_projeto FOR EACH ROW "
+     "WHEN (OLD.data_hora IS DISTINCT FROM NEW.data_hora OR OLD.id_ultima_situacao IS DISTINCT FROM NEW.id_ultima_situacao) "
+     "EXECUTE FUNCTION usuarios.fn_versao_sync()"),
+    ("usuarios.rl_favoritos", "tg_versao_sync_insert",
+     "BEFORE INSERT ON usuarios.rl_favoritos FOR EACH ROW EXECUTE FUNCTION usuarios.fn_versao_sync()"),
+    ("usuarios.rl_favoritos", "tg_remocao_sync",
+     "AFTER DELETE ON usuarios.rl_favoritos FOR EACH ROW EXECUTE FUNCTION usuarios.fn_remocao_favorito()"),
+    # Gatilho BEFORE em tabela particionada (Postgres 13+): não muda data_hora, então a linha não troca de partição
+    ("usuarios.tb_notificacoes", "tg_versao_sync",
+     "BEFORE INSERT OR UPDATE ON usuarios.tb_notificacoes FOR EACH ROW EXECUTE FUNCTION usuarios.fn_versao_sync()"),
+]
+
+
+def instalar():
+    """Cria sequência, colunas, tabela de lápides e gatilhos. Linhas antigas recebem uma versão inicial."""
+    with db.engine.begin() as conn:
+        conn.execute(text(f"CREATE SEQUENCE IF NOT EXISTS {SEQUENCIA}"))
+        conn.execute(CreateTable(TB_Remocao.__table__, if_not_exists=True))
+        for tabela in TABELAS_VERSIONADAS:
+            conn.execute(text(f"ALTER TABLE {tabela.fullname} ADD COLUMN IF NOT EXISTS versao bigint"))
+        for ddl in DDL_FUNCOES:
+            conn.execute(text(ddl))
+        for tabela, nome, definicao in GATILHOS:
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {nome} ON {tabela}"))
+            conn.execute(text(f"CREATE TRIGGER {nome} {definicao}"))
+        for tabela in TABELAS_VERSIONADAS:
+            # Em tb_notificacoes o próprio gatilho de UPDATE numera as linhas
+            atualizadas = conn.execute(text(
+                f"UPDATE {tabela.fullname} SET versao = usuarios.fn_proxima_versao() WHERE versao IS NULL"
+            )).rowcount
+            if atualizadas:
+                print(f"SYNC: {atualizadas} linhas de {tabela.fullname} numeradas.")
+    print("SYNC: Gatilhos de versão instalados.")
+
+
+def limpar_remocoes(dias=RETENCAO_DIAS):
+    """Apaga lápides mais antigas que a retenção (tokens dessa idade já pedem recarga)."""
+    resultado = db.session.execute(
+        db.delete(TB_Remocao).where(TB_Remocao.removido_em < datetime.now() - timedelta(days=dias))
+    )
+    db.session.commit()
+    return resultado.rowcount
+
+
+# ============================================================================
+# TOKEN DE SINCRONIZAÇÃO
+# ============================================================================
+
+def versao_segura():
+    """Maior versão V com todas as versões <= V já confirmadas (ou descartadas por rollback)."""
+    return db.session.scalar(text("SELECT usuarios.fn_versao_segura()"))
+
+
+def emitir_token(versao):
+    return base64.urlsafe_b64encode(f"{int(versao)}.{int(time.time())}".encode()).decode().rstrip("=")
+
+
+def ler_token(token):
+    """Devolve (versao, emitido_em em epoch). ValueError se o token não for válido."""
+    try:
+        bruto = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        versao, emitido_em = (int(parte) for parte in bruto.split("."))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Token de sincronização inválido")
+    if versao < 0:
+        raise ValueError("Token de sincronização inválido")
+    return versao, emitido_em
+
+
+def expirado(emitido_em, dias=RETENCAO_DIAS):
+    return time.time() - emitido_em > dias * 86400
+
+
+def cortar(linhas, limite, versao_de):
+    """
+    Limita `linhas` (ordenadas por versão, buscadas com limite + 1) a `limite`.
+    Devolve (linhas, maior versão entregue, se a lista foi truncada).
+    """
+    truncada = len(linhas) > limite
+    linhas = linhas[:limite]
+    maior = max((versao_de(l) for l in linhas), default=None)
+    return linhas, maior, truncada
+
+
+if __name__ == "__main__":
+    from . import criar_app_dados
+
+    app = criar_app_dados('worker')
+    with app.app_context():
+        print("--- [SYNC] INICIANDO ---")
+        instalar()
+        print("--- [SYNC] CONCLUÍDO ---")
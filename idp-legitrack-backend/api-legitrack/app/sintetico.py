@@ -0,0 +1,284 @@
+"""
+Gerador de massa de dados sintética para testes de desempenho.
+
+Popula os schemas 'camara' e 'usuarios' com volumes proporcionais a uma escala
+(escala 1 = 10 mil projetos, ~100 mil tramitações, 10 mil usuários e ~500 mil
+notificações; escala 10 aproxima a produção). Toda a carga é feita em SQL
+(generate_series) com semente fixa, então duas execuções na mesma escala
+produzem a mesma distribuição.
+
+As distribuições imitam o uso real em vez de serem uniformes:
+  - tramitações por projeto, favoritos e notificações por usuário seguem
+    Pareto (cauda longa: a maioria tem poucos, alguns têm centenas);
+  - seguidores se concentram em poucos projetos e temas (Zipf aproximado);
+  - tramitações chegam em rajadas (várias no mesmo dia, depois semanas paradas).
+
+ATENÇÃO: limpar() apaga TODOS os projetos, usuários, favoritos e notificações.
+Use somente em um banco descartável.
+"""
+from datetime import date
+from sqlalchemy import text
+from werkzeug.security import generate_password_hash
+from .banco import db
+from .feed import FEED_TAMANHO
+from .agregados import instalar as instalar_agregados, reconstruir as reconstruir_agregados
+from .facetas import instalar as instalar_facetas
+from .resumos import atualizar_resumos, instalar as instalar_resumos
+from .semelhantes import instalar as instalar_semelhantes, reconstruir as reconstruir_semelhantes
+from .sincronizacao import instalar as instalar_sincronizacao
+from .particoes import (
+    NOTIFICACOES, TRAMITACOES, esta_particionada, garantir_particoes_notificacoes,
+    garantir_particoes_tramitacoes, somar_meses
+)
+
+# Volumes na escala 1
+VOLUMES_BASE = {
+    "projetos": 10_000,
+    "usuarios": 10_000,
+}
+
+# Distribuições de cauda longa por entidade (não escalam): Pareto(mínimo, alfa) truncada no máximo.
+# Média aproximada = mínimo * alfa / (alfa - 1), antes do corte.
+TRAMITACOES_POR_PROJETO = {"minimo": 4, "alfa": 1.6, "maximo": 400}     # ~10 por projeto
+FAVORITOS_POR_USUARIO = {"minimo": 3, "alfa": 1.4, "maximo": 500}       # ~10 por usuário
+NOTIFICACOES_POR_USUARIO = {"minimo": 15, "alfa": 1.5, "maximo": 3000}  # ~45 por usuário
+TEMAS_POR_PROJETO = 2
+INTERESSES_POR_USUARIO = {"minimo": 1, "maximo": 6}                     # uniforme
+
+# Concentração (Zipf aproximado): posição = floor(n * random() ^ expoente); expoente maior = mais concentrado
+CONCENTRACAO_SEGUIDORES = 3.0  # poucos projetos recebem a maior parte dos favoritos
+CONCENTRACAO_TEMAS = 2.0       # temas populares (ex.: Saúde) têm mais interessados
+
+# Rajadas: fração de tramitações que chega logo após a anterior (minutos/horas)
+PROBABILIDADE_RAJADA = 0.75
+
+SENHA_PADRAO = "1234"
+EMAIL_PADRAO = "sintetico{n}@legitrack.test"
+
+TABELAS_SINTETICAS = [
+    "usuarios.tb_eventos_notificacao", "usuarios.tb_notificacoes", "usuarios.tb_notificacoes_cobertura",
+    "usuarios.tb_feed", "usuarios.rl_favoritos",
+    "usuarios.tb_interesses", "usuarios.tb_remocoes", "usuarios.tb_users",
+    "camara.tb_projeto_resumo", "camara.tb_projeto_semelhantes",
+    "camara.tb_atividade_diaria", "camara.tb_atividade_orgao",
+    "camara.rl_temas", "camara.rl_tramitacoes", "camara.tb_projeto",
+]
+
+
+def limpar():
+    """Esvazia as tabelas de projetos e usuários (mantém as tabelas de domínio)."""
+    db.session.execute(text(f"TRUNCATE {', '.join(TABELAS_SINTETICAS)} RESTART IDENTITY CASCADE"))
+    db.session.commit()
+
+
+def _preparar_particoes():
+    # Sem partições, tudo cairia na DEFAULT e os planos não refletiriam a produção
+    hoje = date.today()
+    if esta_particionada(TRAMITACOES):
+        # Projetos até 10 anos atrás, com tramitações em rajadas que recuam mais alguns anos
+        garantir_particoes_tramitacoes(desde=date(hoje.year - 25, 1, 1))
+    if esta_particionada(NOTIFICACOES):
+        garantir_particoes_notificacoes(desde=somar_meses(hoje, -12))
+
+
+def _popular_dominios():
+    # Tabelas TP: reaproveita o que já existir (ex.: códigos reais da Câmara)
+    db.session.execute(text("""
+        INSERT INTO camara.tp_situacao (id_situacao, ds_situacao)
+        SELECT g, 'Situação sintética ' || g FROM generate_series(1, 60) g
+        ON CONFLICT DO NOTHING
+    """))
+    db.session.execute(text("""
+        INSERT INTO camara.tp_tramitacao (id_tramitacao, ds_tramitacao)
+        SELECT g, 'Tramitação sintética ' || g FROM generate_series(1, 120) g
+        ON CONFLICT DO NOTHING
+    """))
+    db.session.execute(text("""
+        INSERT INTO camara.tp_temas (id_tema, ds_tema)
+        SELECT g, 'Tema sintético ' || g FROM generate_series(1, 40) g
+        ON CONFLICT DO NOTHING
+    """))
+
+
+def _pareto(distribuicao):
+    """Expressão SQL de uma contagem Pareto truncada (1 - random() evita divisão por zero)."""
+    return (f"least({distribuicao['maximo']}, "
+            f"floor({distribuicao['minimo']} / power(1 - random(), 1.0 / {distribuicao['alfa']})))::int")
+
+
+def _popular_projetos(qtd_projetos):
+    db.session.execute(text("""
+        INSERT INTO camara.tb_projeto (
+            id_projeto, titulo_projeto, descricao, ano_inicio, data_hora,
+            sigla_orgao, despacho, id_ultima_situacao, id_ultima_tramitacao
+        )
+        SELECT g,
+               'Dispõe sobre ' || md5(g::text),
+               'PL ' || g || '/' || (2000 + g % 25),
+               (2000 + g % 25)::text,
+               now() - random() * interval '3650 days',
+               'ORG' || (g % 30),
+               NULL,
+               s.ids[1 + floor(random() * array_length(s.ids, 1))::int],
+               t.ids[1 + floor(random() * array_length(t.ids, 1))::int]
+        FROM generate_series(1, :n) g,
+             (SELECT array_agg(id_situacao) AS ids FROM camara.tp_situacao) s,
+             (SELECT array_agg(id_tramitacao) AS ids FROM camara.tp_tramitacao) t
+    """), {"n": qtd_projetos})
+
+    # Sequência mais alta = tramitação mais recente = data do projeto. Cada passo para trás
+    # é curto (rajada, até 6 horas) ou longo (até 30 dias); a soma acumulada dá a data.
+    db.session.execute(text(f"""
+        INSERT INTO camara.rl_tramitacoes (id_projeto, sequencia, data_hora, id_situacao, id_tramitacao, sigla_orgao)
+        SELECT id_projeto, k,
+               data_hora - coalesce(sum(passo) OVER (
+                   PARTITION BY id_projeto ORDER BY k DESC ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+               ), interval '0'),
+               id_situacao, id_tramitacao,
+               -- A última tramitação fica no órgão atual do projeto; as anteriores passam por outros
+               CASE WHEN k = n THEN sigla_orgao ELSE 'ORG' || floor(random() * 30)::int END
+        FROM (
+            SELECT p.id_projeto, p.data_hora, p.sigla_orgao, p.n, k,
+                   CASE WHEN random() < :rajada THEN random() * interval '6 hours'
+                        ELSE random() * interval '30 days' END AS passo,
+                   s.ids[1 + floor(random() * array_length(s.ids, 1))::int] AS id_situacao,
+                   t.ids[1 + floor(random() * array_length(t.ids, 1))::int] AS id_tramitacao
+            FROM (SELECT id_projeto, data_hora, sigla_orgao, {_pareto(TRAMITACOES_POR_PROJETO)} AS n FROM camara.tb_projeto) p,
+                 generate_series(1, p.n) k,
+                 (SELECT array_agg(id_situacao) AS ids FROM camara.tp_situacao) s,
+                 (SELECT array_agg(id_tramitacao) AS ids FROM camara.tp_tramitacao) t
+        ) passos
+    """), {"rajada": PROBABILIDADE_RAJADA})
+
+    # O ano do projeto é o da primeira tramitação (como "PL n/ano" na Câmara)
+    db.session.execute(text("""
+        UPDATE camara.tb_projeto p
+        SET ano_inicio = extract(year FROM t.inicio)::int::text,
+            descricao = 'PL ' || p.id_projeto || '/' || extract(year FROM t.inicio)::int
+        FROM (SELECT id_projeto, min(data_hora) AS inicio FROM camara.rl_tramitacoes GROUP BY id_projeto) t
+        WHERE t.id_projeto = p.id_projeto
+    """))
+
+    db.session.execute(text("""
+        INSERT INTO camara.rl_temas (id_projeto, id_tema)
+        SELECT p.id_projeto, tm.ids[1 + (p.id_projeto * 7 + k * 13) % array_length(tm.ids, 1)]
+        FROM camara.tb_projeto p,
+             generate_series(1, :k) k,
+             (SELECT array_agg(id_tema ORDER BY id_tema) AS ids FROM camara.tp_temas) tm
+    """), {"k": TEMAS_POR_PROJETO})
+
+
+def _popular_usuarios(qtd_usuarios, qtd_projetos):
+    db.session.execute(text("""
+        INSERT INTO usuarios.tb_users (username, email, password_hash, criado_em)
+        SELECT 'Usuário sintético ' || g, replace(:email, '{n}', g::text), :hash, now()
+        FROM generate_series(1, :n) g
+    """), {"n": qtd_usuarios, "email": EMAIL_PADRAO, "hash": generate_password_hash(SENHA_PADRAO)})
+
+    db.session.execute(text("""
+        INSERT INTO usuarios.tb_interesses (id_user, id_interesse)
+        SELECT u.id, tm.ids[1 + floor(power(random(), :concentracao) * array_length(tm.ids, 1))::int]
+        FROM (SELECT id, :minimo + floor(random() * (:maximo - :minimo + 1))::int AS n FROM usuarios.tb_users) u,
+             generate_series(1, u.n) k,
+             (SELECT array_agg(id_tema ORDER BY id_tema) AS ids FROM camara.tp_temas) tm
+        ON CONFLICT DO NOTHING
+    """), {**INTERESSES_POR_USUARIO, "concentracao": CONCENTRACAO_TEMAS})
+
+    db.session.execute(text(f"""
+        INSERT INTO usuarios.rl_favoritos (id_user, id_projeto)
+        SELECT u.id, 1 + floor(power(random(), :concentracao) * :n)::int
+        FROM (SELECT id, {_pareto(FAVORITOS_POR_USUARIO)} AS n FROM usuarios.tb_users) u,
+             generate_series(1, u.n) k
+        ON CONFLICT DO NOTHING
+    """), {"n": qtd_projetos, "concentracao": CONCENTRACAO_SEGUIDORES})
+
+    # Notificações mais recentes são mais frequentes (power concentra perto de now())
+    db.session.execute(text(f"""
+        INSERT INTO usuarios.tb_notificacoes (id_user, id_projeto, titulo, descricao, data_hora, lida)
+        SELECT u.id, 1 + floor(power(random(), :concentracao) * :n)::int,
+               'Movimentação: PL sintético', 'Nova tramitação: Atualização',
+               now() - power(random(), 2) * interval '365 days', random() < 0.7
+        FROM (SELECT id, {_pareto(NOTIFICACOES_POR_USUARIO)} AS n FROM usuarios.tb_users) u,
+             generate_series(1, u.n) k
+    """), {"n": qtd_projetos, "concentracao": CONCENTRACAO_SEGUIDORES})
+
+    db.session.execute(text("""
+        INSERT INTO usuarios.tb_feed (id_user, id_projeto, data_hora)
+        SELECT id_user, id_projeto, data_hora
+        FROM (
+            SELECT i.id_user, p.id_projeto, p.data_hora,
+                   row_number() OVER (PARTITION BY i.id_user ORDER BY p.data_hora DESC NULLS LAST) AS posicao
+            FROM (SELECT DISTINCT i.id_user, rt.id_projeto
+                  FROM usuarios.tb_interesses i
+                  JOIN camara.rl_temas rt ON rt.id_tema = i.id_interesse) i
+            JOIN camara.tb_projeto p ON p.id_projeto = i.id_projeto
+        ) f
+        WHERE posicao <= :limite
+    """), {"limite": FEED_TAMANHO})
+
+
+def popular(escala=1.0, semente=0.42):
+    """
+    Limpa e popula o banco na escala pedida. Retorna os volumes gerados.
+    """
+    volumes = {nome: max(1, int(qtd * escala)) for nome, qtd in VOLUMES_BASE.items()}
+
+    # Gatilhos de versão (GET /api/sync) e de ids_temas (facetas), resumos, semelhantes e agregados
+    # antes da carga, como em produção
+    instalar_sincronizacao()
+    instalar_facetas()
+    instalar_resumos()
+    instalar_semelhantes()
+    instalar_agregados()
+    limpar()
+    _preparar_particoes()
+    db.session.execute(text("SELECT setseed(:semente)"), {"semente": semente})
+
+    print(f"SINTETICO: Gerando {volumes['projetos']} projetos e {volumes['usuarios']} usuários (escala {escala})...")
+    _popular_dominios()
+    _popular_projetos(volumes["projetos"])
+    _popular_usuarios(volumes["usuarios"], volumes["projetos"])
+    atualizar_resumos()
+    reconstruir_semelhantes()
+    reconstruir_agregados()
+    db.session.commit()
+
+    for tabela in TABELAS_SINTETICAS:
+        db.session.execute(text(f"ANALYZE {tabela}"))
+    db.session.commit()
+
+    volumes.update(contar())
+    print(f"SINTETICO: Carga concluída: {volumes}")
+    return volumes
+
+
+def contar():
+    """Volumes efetivamente gerados nas tabelas de cauda longa."""
+    return {
+        nome: db.session.scalar(text(f"SELECT count(*) FROM {tabela}"))
+        for nome, tabela in (
+            ("tramitacoes", "camara.rl_tramitacoes"),
+            ("favoritos", "usuarios.rl_favoritos"),
+            ("notificacoes", "usuarios.tb_notificacoes"),
+        )
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    from . import criar_app_dados
+
+    parser = argparse.ArgumentParser(description="Popula o banco com a massa sintética.")
+    parser.add_argument("--escala", type=float, default=1.0, help="1 = 10 mil projetos; 10 aproxima a produção")
+    parser.add_argument("--semente", type=float, default=0.42, help="Semente do random() do Postgres (-1 a 1)")
+    parser.add_argument("--confirmar", action="store_true", help="Confirma que o banco é descartável (a carga apaga os dados)")
+    args = parser.parse_args()
+
+    if not args.confirmar:
+        print("SINTETICO: A carga APAGA projetos, usuários e notificações. Use --confirmar em um banco descartável.")
+        sys.exit(2)
+
+    app = criar_app_dados('worker')
+    with app.app_context():
+        popular(args.escala, args.semente)
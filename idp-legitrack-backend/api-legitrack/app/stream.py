@@ -0,0 +1,157 @@
+"""
+Entrega de notificações em tempo real (Server-Sent Events).
+
+O worker sinaliza, via Postgres NOTIFY, quais usuários receberam notificações
+novas. Cada processo da API mantém UMA conexão em LISTEN (NotificacaoBroker)
+e acorda somente as conexões SSE abertas pelos usuários afetados.
+
+No gthread cada stream aberto prende uma thread do worker. Por isso o broker
+aceita no máximo SSE_MAX_CONEXOES streams por processo (acima disso a rota
+responde 503 com Retry-After) e avisa os streams quando o worker vai sair
+(max_requests, HUP): eles terminam no heartbeat seguinte e o cliente reconecta
+em outro worker com Last-Event-ID, em vez de ser cortado no graceful_timeout.
+"""
+import queue
+import select
+import threading
+import time
+from collections import defaultdict
+
+import psycopg2
+import psycopg2.extensions
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+CANAL_NOTIFICACOES = 'legitrack_notificacoes'
+
+
+def sinalizar_usuarios(session, ids_usuarios):
+    """
+    Enfileira um NOTIFY por usuário na transação corrente.
+    O Postgres só entrega no COMMIT e descarta payloads repetidos,
+    então a API nunca é acordada antes de as linhas estarem visíveis.
+    """
+    ids = sorted({int(i) for i in ids_usuarios})
+    if not ids:
+        return
+    session.execute(
+        text("SELECT pg_notify(:canal, u::text) FROM unnest(CAST(:ids AS integer[])) AS u"),
+        {"canal": CANAL_NOTIFICACOES, "ids": ids}
+    )
+
+
+class StreamsEsgotados(Exception):
+    """O processo já atende SSE_MAX_CONEXOES streams; tente de novo em instantes."""
+
+
+class NotificacaoBroker:
+    """
+    Faz o fan-out das sinalizações do Postgres para as conexões SSE do processo.
+    A thread de LISTEN só é criada na primeira assinatura, ou seja, depois do
+    fork dos workers do servidor WSGI e nunca em processos que não servem SSE.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._assinantes = defaultdict(set)
+        self._thread = None
+        self._dsn = None
+        self._limite = None
+        self._conexoes = 0
+        self._ativo = lambda: True
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        uri = app.config.get('SSE_LISTEN_URI') or app.config['SQLALCHEMY_DATABASE_URI']
+        # psycopg2 aceita a URL libpq; removemos apenas o sufixo do driver do SQLAlchemy
+        self._dsn = make_url(uri).set(drivername='postgresql').render_as_string(hide_password=False)
+        self._limite = app.config.get('SSE_MAX_CONEXOES')
+        app.extensions['notificacao_broker'] = self
+
+    def acompanhar_processo(self, ativo):
+        """`ativo()` False indica que o processo vai sair (ex.: lambda: worker.alive do gunicorn)."""
+        self._ativo = ativo
+
+    def encerrando(self):
+        return not self._ativo()
+
+    def assinar(self, id_user):
+        """
+        Registra uma conexão SSE e retorna a fila que será acordada para ela.
+        StreamsEsgotados se o processo já está no limite de conexões.
+        """
+        fila = queue.Queue(maxsize=1)
+        with self._lock:
+            if self._limite and self._conexoes >= self._limite:
+                raise StreamsEsgotados()
+            self._conexoes += 1
+            self._assinantes[id_user].add(fila)
+        self._garantir_listener()
+        return fila
+
+    def cancelar(self, id_user, fila):
+        with self._lock:
+            filas = self._assinantes.get(id_user)
+            if filas is not None and fila in filas:
+                self._conexoes -= 1
+                filas.discard(fila)
+                if not filas:
+                    del self._assinantes[id_user]
+
+    def _acordar(self, filas):
+        for fila in filas:
+            try:
+                fila.put_nowait(True)
+            except queue.Full:
+                pass  # Já existe um "acorde" pendente; a consulta seguinte pega tudo
+
+    def _entregar(self, id_user):
+        with self._lock:
+            filas = list(self._assinantes.get(id_user, ()))
+        self._acordar(filas)
+
+    def _acordar_todos(self):
+        with self._lock:
+            filas = [f for conjunto in self._assinantes.values() for f in conjunto]
+        self._acordar(filas)
+
+    def _garantir_listener(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._loop, name='sse-listener', daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(self._dsn)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {CANAL_NOTIFICACOES}")
+                print(f"SSE: Escutando canal '{CANAL_NOTIFICACOES}'")
+
+                # Sinalizações perdidas durante uma queda são recuperadas pela consulta de cada conexão
+                self._acordar_todos()
+
+                while True:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        aviso = conn.notifies.pop(0)
+                        try:
+                            self._entregar(int(aviso.payload))
+                        except ValueError:
+                            continue
+            except Exception as e:
+                print(f"SSE: Conexão de LISTEN perdida: {e}. Reconectando em 5s...")
+                time.sleep(5)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
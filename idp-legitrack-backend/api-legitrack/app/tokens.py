@@ -0,0 +1,92 @@
+"""
+Par de tokens (acesso + refresh) com rotação e revogação.
+
+O login devolve um access token curto (JWT_ACESSO_MINUTOS) e um refresh token
+longo (JWT_REFRESH_DIAS). POST /auth/refresh troca o refresh por um par novo
+sem tocar na senha, então o cliente não precisa refazer o login (e o hash)
+quando o acesso vence.
+
+Todos os tokens de um login carregam a mesma família (claim 'fam'). Cada
+refresh só pode ser usado uma vez: ao rotacionar, o jti é marcado no
+armazenamento (app.armazenamento) até vencer. Se um refresh já rotacionado
+voltar, alguém guardou uma cópia: a família inteira é revogada e o dono
+precisa logar de novo. O logout revoga a família do mesmo jeito. A lista de
+revogação só guarda famílias e jtis ainda válidos, então fica pequena.
+
+A lista precisa ser vista por todos os processos: com mais de um worker o
+gunicorn só sobe com ARMAZENAMENTO_URL (Redis) configurado (gunicorn.conf.py).
+Se o armazenamento falhar, os tokens continuam valendo até expirar (a API
+não cai por causa da lista de revogação).
+"""
+import logging
+import uuid
+from datetime import datetime, timezone
+
+from flask import current_app
+from flask_jwt_extended import create_access_token, create_refresh_token
+
+from .armazenamento import armazenamento_do_app
+from .extensions import jwt
+
+logger = logging.getLogger("legitrack.tokens")
+
+
+class TokenReutilizado(Exception):
+    """Refresh token já rotacionado apresentado de novo; a família foi revogada."""
+
+
+def _armazenamento():
+    return armazenamento_do_app(current_app)
+
+
+def _restante(claims):
+    return max(1, claims["exp"] - int(datetime.now(timezone.utc).timestamp()))
+
+
+def emitir_par(identidade, familia=None):
+    """Access e refresh token da família (uma nova, se None)."""
+    claims = {"fam": familia or uuid.uuid4().hex}
+    return {
+        "access_token": create_access_token(identity=identidade, additional_claims=claims),
+        "refresh_token": create_refresh_token(identity=identidade, additional_claims=claims),
+    }
+
+
+def revogar_familia(claims):
+    """Revoga todos os tokens (acesso e refresh) emitidos no mesmo login."""
+    familia = claims.get("fam")
+    if not familia:
+        return
+    validade = current_app.config["JWT_REFRESH_TOKEN_EXPIRES"].total_seconds()
+    try:
+        _armazenamento().guardar(f"familia:{familia}", validade)
+    except Exception as e:
+        logger.warning("Não foi possível revogar a família %s: %s", familia, e)
+
+
+def rotacionar(claims):
+    """
+    Consome o refresh token e devolve um par novo da mesma família.
+    TokenReutilizado se este refresh já tinha sido usado.
+    """
+    try:
+        primeiro_uso = _armazenamento().guardar(f"rotacionado:{claims['jti']}", _restante(claims), somente_se_ausente=True)
+    except Exception as e:
+        logger.warning("Armazenamento indisponível, refresh sem detecção de reuso: %s", e)
+        primeiro_uso = True
+    if not primeiro_uso:
+        revogar_familia(claims)
+        raise TokenReutilizado()
+    return emitir_par(claims["sub"], claims.get("fam"))
+
+
+@jwt.token_in_blocklist_loader
+def token_revogado(jwt_header, jwt_payload):
+    familia = jwt_payload.get("fam")
+    if not familia:
+        return False
+    try:
+        return _armazenamento().existe(f"familia:{familia}")
+    except Exception as e:
+        logger.warning("Lista de revogação indisponível, token aceito: %s", e)
+        return False
@@ -0,0 +1,175 @@
+"""
+Regressão de planos de execução das consultas quentes.
+
+Popula um banco DESCARTÁVEL com a massa sintética (app.sintetico), roda
+EXPLAIN (FORMAT JSON) em cada consulta usada pelos endpoints e pelo fan-out do
+worker e falha (exit 1) se alguma delas cair em Seq Scan numa tabela grande.
+
+Uso:
+    python -m app.verificar_planos --confirmar [--escala 5] [--sem-carga]
+"""
+import argparse
+import re
+import sys
+from datetime import date, timedelta
+from sqlalchemy import text
+from .banco import db
+from .facetas import consulta_facetas
+from .models import RL_Favoritos, TB_Notificacao
+from .sincronizacao import versao_segura
+
+# Tabelas que crescem com o uso; nelas um Seq Scan é sempre regressão.
+# As TP (situação, tramitação, temas) são pequenas e podem ser varridas, assim como os
+# agregados do painel (uma linha por dia × domínio, não por tramitação).
+TABELAS_QUENTES = {
+    "tb_projeto", "tb_projeto_resumo", "tb_projeto_semelhantes", "rl_tramitacoes", "rl_temas", "tb_interesses",
+    "rl_favoritos", "tb_notificacoes", "tb_feed",
+}
+
+
+def _consultas(amostra):
+    """Lista (nome, statement) com as mesmas consultas que a API e o worker executam."""
+    from .painel import consulta_atividade, consulta_orgaos, consulta_situacoes, consulta_temas
+    from .routes import (
+        consulta_projetos, consulta_timeline, consulta_favoritos, consulta_lote_projetos, consulta_feed,
+        consulta_notificacoes, consulta_semelhantes,
+        consulta_sync_projetos, consulta_sync_favoritos, consulta_sync_remocoes, consulta_sync_notificacoes
+    )
+
+    ate = date.today()
+    de = ate - timedelta(days=365)
+
+    return [
+        ("POST /api/projetos", consulta_projetos(amostra["id_user"])),
+        ("POST /api/projetos (ids_temas)", consulta_projetos(amostra["id_user"], [amostra["id_tema"]])),
+        ("POST /api/projetos (facetas)", consulta_facetas([amostra["id_tema"]])),
+        ("GET /api/projetos/<id> (timeline)", consulta_timeline(amostra["id_projeto"])),
+        ("GET /api/projetos/<id>/semelhantes", consulta_semelhantes(amostra["id_user"], amostra["id_projeto"])),
+        ("POST /api/projetos/lote", consulta_lote_projetos(amostra["id_user"], list(range(1, 51)))),
+        ("GET /api/feed", consulta_feed(amostra["id_user"])),
+        ("GET /api/favoritos", consulta_favoritos(amostra["id_user"])),
+        ("GET /api/notificacoes", consulta_notificacoes(amostra["id_user"])),
+        ("GET /api/notificacoes/stream", db.select(TB_Notificacao).filter(
+            TB_Notificacao.id_user == amostra["id_user"], TB_Notificacao.id > amostra["id_notificacao"]
+        ).order_by(TB_Notificacao.id)),
+        ("GET /api/notificacoes/stream (alteradas)", db.select(TB_Notificacao).filter(
+            TB_Notificacao.id_user == amostra["id_user"],
+            TB_Notificacao.versao > amostra["versao_sync"],
+            TB_Notificacao.versao <= amostra["versao_segura"],
+            TB_Notificacao.lida.isnot(True),
+        ).order_by(TB_Notificacao.id)),
+        ("GET /api/sync (projetos)", consulta_sync_projetos(
+            amostra["id_user"], amostra["versao_sync"], amostra["versao_segura"], 500
+        )),
+        ("GET /api/sync (favoritos)", consulta_sync_favoritos(
+            amostra["id_user"], amostra["versao_sync"], amostra["versao_segura"], 500
+        )),
+        ("GET /api/sync (remoções)", consulta_sync_remocoes(
+            amostra["id_user"], amostra["versao_sync"], amostra["versao_segura"], 500
+        )),
+        ("GET /api/sync (notificações)", consulta_sync_notificacoes(
+            amostra["id_user"], amostra["versao_sync"], amostra["versao_segura"], 500
+        )),
+        ("GET /api/painel/atividade", consulta_atividade(de, ate)),
+        ("GET /api/painel/situacoes", consulta_situacoes(de, ate)),
+        ("GET /api/painel/temas", consulta_temas(de, ate)),
+        ("GET /api/painel/orgaos", consulta_orgaos(de, ate)),
+        ("WORKER fan-out favoritos", db.select(RL_Favoritos).filter_by(id_projeto=amostra["id_projeto"])),
+    ]
+
+
+def _amostra():
+    """Escolhe ids representativos: o projeto mais seguido e o usuário com mais notificações."""
+    return {
+        "id_projeto": db.session.scalar(text(
+            "SELECT id_projeto FROM usuarios.rl_favoritos GROUP BY id_projeto ORDER BY count(*) DESC LIMIT 1"
+        )),
+        "id_user": db.session.scalar(text(
+            "SELECT id_user FROM usuarios.tb_notificacoes GROUP BY id_user ORDER BY count(*) DESC LIMIT 1"
+        )),
+        "id_tema": db.session.scalar(text(
+            "SELECT id_tema FROM camara.rl_temas GROUP BY id_tema ORDER BY count(*) LIMIT 1"
+        )),
+        "id_notificacao": db.session.scalar(text(
+            "SELECT max(id) - 10 FROM usuarios.tb_notificacoes"
+        )),
+        # Retomada típica do app: poucas alterações desde o último token
+        "versao_sync": db.session.scalar(text(
+            "SELECT greatest(last_value - 1000, 0) FROM usuarios.seq_versao_sync"
+        )),
+        "versao_segura": versao_segura(),
+    }
+
+
+# Partições (tb_notificacoes_p2026_01, ..._default) contam como a tabela-mãe
+_RE_PARTICAO = re.compile(r"_(p\d{4}(_\d{2})?|default)$")
+
+# Partições vazias ou de uma página depois do ANALYZE (meses/anos futuros, DEFAULT, o primeiro ano
+# do histórico): varrer custa o mesmo que ler o índice, e o planner escolhe o Seq Scan
+SQL_PARTICOES_TRIVIAIS = text("""
+    SELECT c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE c.reltuples <= 0 OR c.relpages <= 1
+""")
+
+
+def _seq_scans(no, triviais=frozenset()):
+    """Percorre a árvore do plano e devolve as tabelas quentes lidas por Seq Scan (fora as partições triviais)."""
+    encontrados = []
+    nome = no.get("Relation Name") or ""
+    relacao = _RE_PARTICAO.sub("", nome)
+    if no.get("Node Type") == "Seq Scan" and relacao in TABELAS_QUENTES and nome not in triviais:
+        encontrados.append(nome)
+    for filho in no.get("Plans", []):
+        encontrados.extend(_seq_scans(filho, triviais))
+    return encontrados
+
+
+def explicar(statement):
+    sql = statement.compile(dialect=db.engine.dialect, compile_kwargs={"literal_binds": True})
+    resultado = db.session.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    return resultado[0]["Plan"]
+
+
+def verificar(amostra=None):
+    """Retorna a lista de (consulta, tabelas) que regrediram para Seq Scan."""
+    amostra = amostra or _amostra()
+    triviais = frozenset(db.session.scalars(SQL_PARTICOES_TRIVIAIS))
+    falhas = []
+    for nome, statement in _consultas(amostra):
+        plano = explicar(statement)
+        tabelas = _seq_scans(plano, triviais)
+        status = "FALHOU" if tabelas else "ok"
+        print(f"PLANOS: [{status}] {nome} (custo {plano['Total Cost']:.0f})" + (f" -> Seq Scan em {', '.join(tabelas)}" if tabelas else ""))
+        if tabelas:
+            falhas.append((nome, tabelas))
+    db.session.rollback()
+    return falhas
+
+
+if __name__ == "__main__":
+    from . import criar_app_dados
+    from .sintetico import popular
+
+    parser = argparse.ArgumentParser(description="Verifica os planos de execução das consultas quentes.")
+    parser.add_argument("--escala", type=float, default=5.0, help="Escala da massa sintética (1 = 10 mil projetos)")
+    parser.add_argument("--sem-carga", action="store_true", help="Usa os dados já existentes no banco")
+    parser.add_argument("--confirmar", action="store_true", help="Confirma que o banco é descartável (a carga apaga os dados)")
+    args = parser.parse_args()
+
+    if not args.sem_carga and not args.confirmar:
+        print("PLANOS: A carga sintética APAGA projetos, usuários e notificações. Use --confirmar em um banco descartável.")
+        sys.exit(2)
+
+    app = criar_app_dados('worker')
+    with app.app_context():
+        if not args.sem_carga:
+            popular(args.escala)
+
+        falhas = verificar()
+
+    if falhas:
+        print(f"PLANOS: {len(falhas)} consulta(s) com Seq Scan em tabela grande.")
+        sys.exit(1)
+    print("PLANOS: Todas as consultas usam índice.")
@@ -1,40 +1,22 @@
 import time
 import requests
-from datetime import datetime, timedelta
-from sqlalchemy import text
-from sqlalchemy.exc import OperationalError
-from . import create_app, db
+from datetime import date, datetime, timedelta
+from . import criar_app_dados, db, wait_for_db
 from .models import (
-    TP_Situacao, TP_Tramitacao, TB_Projeto, RL_Tramitacoes, TB_Notificacao, RL_Favoritos
+    TP_Situacao, TP_Tramitacao, TP_Temas, TB_Projeto, RL_Tramitacoes, TB_EventoNotificacao
 )
-
-app = create_app()
-app.app_context().push()
+from .agregados import acumular_tramitacoes
+from .feed import atualizar_feed_projetos
+from .particoes import esta_particionada, garantir_particoes_tramitacoes, manter as manter_particoes
+from .pool import estatisticas_pool
+from .resumos import atualizar_resumos, atualizar_seguidores
+from .semelhantes import atualizar_semelhantes, reconstruir as reconstruir_semelhantes
+from .sincronizacao import limpar_remocoes, versao_segura
 
 # ============================================================================
 # FUNÇÕES DE SUPORTE
 # ============================================================================
 
-def wait_for_db():
-    print("WORKER: Aguardando o banco de dados ficar pronto...")
-    retries = 0
-    max_retries = 10
-    while retries < max_retries:
-        try:
-            db.session.execute(text('SELECT 1'))
-            print("WORKER: Conexão com o banco de dados estabelecida!")
-            return True
-        except OperationalError:
-            retries += 1
-            time.sleep(5)
-        except Exception as e:
-            print(f"WORKER: Erro: {e}")
-            retries += 1
-            time.sleep(5)
-            
-    print(f"WORKER: ERRO CRÍTICO! Sem conexão com banco.")
-    return False
-
 def sicronizar_tabelas_tp(url, model_class, id_field_name, ds_field_name, api_id_key, api_desc_key):
     """Sincroniza tabelas de domínio (Metadados)"""
     tabela_nome = model_class.__tablename__
@@ -77,40 +59,15 @@ def sicronizar_tabelas_tp(url, model_class, id_field_name, ds_field_name, api_id
 # SINCRONIZAÇÃO DE PROJETOS E NOTIFICAÇÕES
 # ============================================================================
 
-def gerar_notificacao_mudanca(projeto, nova_tramitacao):
+def registrar_evento(id_projeto, tipo, sequencias=None):
     """
-    Verifica quem favoritou este projeto e cria notificação
+    Grava o evento na outbox, na transação do projeto. O fan-out para os
+    usuários fica com o app.dispatcher, fora do caminho da ingestão.
     """
-    try:
-        # Busca IDs dos usuários que favoritaram este projeto
-        favoritos = db.session.scalars(
-            db.select(RL_Favoritos).filter_by(id_projeto=projeto.id_projeto)
-        ).all()
-        
-        notificacoes = []
-        for fav in favoritos:
-            titulo = f"Movimentação: {projeto.titulo_projeto[:30]}..."
-            desc = f"Nova tramitação: {nova_tramitacao.situacao.ds_situacao if nova_tramitacao.situacao else 'Atualização'}"
-            
-            notif = TB_Notificacao(
-                id_user=fav.id_user,
-                id_projeto=projeto.id_projeto,
-                titulo=titulo,
-                descricao=desc,
-                lida=False
-            )
-            notificacoes.append(notif)
-        
-        if notificacoes:
-            db.session.add_all(notificacoes)
-            # O commit acontece no loop principal
-            print(f"WORKER: 🔔 {len(notificacoes)} notificações geradas para o projeto {projeto.id_projeto}")
-
-    except Exception as e:
-        print(f"WORKER: Erro ao gerar notificação: {e}")
+    db.session.add(TB_EventoNotificacao(tipo=tipo, id_projeto=id_projeto, sequencias=sequencias))
 
 def sicronizar_projetos(tempo_de_espera):
-    """Busca projetos alterados no intervalo de tempo"""
+    """Busca projetos alterados no intervalo de tempo. Retorna os ids dos projetos novos ou com tramitação nova."""
     
     # Define janela de busca (últimos X minutos + margem)
     dt_fim = datetime.now()
@@ -142,13 +99,14 @@ def sicronizar_projetos(tempo_de_espera):
 
     if not todos_resumos:
         print("WORKER: Nenhuma alteração recente encontrada na Câmara.")
-        return
+        return set()
 
     print(f"WORKER: {len(todos_resumos)} projetos com movimentação recente. Analisando...")
 
     # 2. Processamento Detalhado
     cnt_novos = 0
     cnt_atualizados = 0
+    projetos_alterados = set()
 
     for resumo in todos_resumos:
         try:
@@ -170,12 +128,12 @@ def sicronizar_projetos(tempo_de_espera):
             projeto.ano_inicio = str(resumo.get('ano'))
 
             # Busca Tramitações (Para detectar mudanças)
+            novas_trams_objs = []
             resp_tram = requests.get(f"https://dadosabertos.camara.leg.br/api/v2/proposicoes/{pid}/tramitacoes", timeout=10)
             if resp_tram.ok:
                 trams = resp_tram.json().get('dados', [])
                 seqs_existentes = {t.sequencia for t in projeto.tramitacoes}
                 
-                novas_trams_objs = []
                 for t in trams:
                     seq = int(t['sequencia'])
                     if seq not in seqs_existentes:
@@ -184,18 +142,24 @@ def sicronizar_projetos(tempo_de_espera):
                             sequencia=seq,
                             data_hora=datetime.fromisoformat(t['dataHora']),
                             id_situacao=int(t['codSituacao']),
-                            id_tramitacao=int(t['codTipoTramitacao'])
+                            id_tramitacao=int(t['codTipoTramitacao']),
+                            sigla_orgao=t.get('siglaOrgao')
                         )
                         db.session.add(nova)
                         novas_trams_objs.append(nova)
                 
-                # SE TIVER TRAMITAÇÃO NOVA E NÃO FOR PROJETO NOVO, NOTIFICA!
+                if novas_trams_objs:
+                    projetos_alterados.add(pid)
+                    # Projeto novo traz o histórico inteiro: anos antigos precisam de partição própria
+                    mais_antiga = min(t.data_hora for t in novas_trams_objs)
+                    if mais_antiga.year < date.today().year:
+                        with db.session.no_autoflush:
+                            if esta_particionada(RL_Tramitacoes.__table__):
+                                garantir_particoes_tramitacoes(desde=mais_antiga.date(), conn=db.session)
+
+                # SE TIVER TRAMITAÇÃO NOVA E NÃO FOR PROJETO NOVO, NOTIFICA (via outbox)!
                 if novas_trams_objs and not eh_novo:
-                    # Pega a mais recente para notificar
-                    ultima = novas_trams_objs[-1]
-                    # Necessário flush para garantir que a tramitação tenha IDs para relacionamento
-                    db.session.flush() 
-                    gerar_notificacao_mudanca(projeto, ultima)
+                    registrar_evento(pid, 'tramitacao', sorted(t.sequencia for t in novas_trams_objs))
 
                 # Atualiza status final
                 if trams:
@@ -203,14 +167,45 @@ def sicronizar_projetos(tempo_de_espera):
                     projeto.data_hora = datetime.fromisoformat(ult['dataHora'])
                     projeto.id_ultima_situacao = int(ult['codSituacao'])
                     projeto.id_ultima_tramitacao = int(ult['codTipoTramitacao'])
+                    projeto.sigla_orgao = ult.get('siglaOrgao') or projeto.sigla_orgao
+
+            # Projeto novo: busca os temas (necessários para o feed por interesses)
+            if eh_novo:
+                try:
+                    resp_tema = requests.get(f"https://dadosabertos.camara.leg.br/api/v2/proposicoes/{pid}/temas", timeout=10)
+                    if resp_tema.ok:
+                        for t_api in resp_tema.json().get('dados', []):
+                            tema_db = db.session.get(TP_Temas, int(t_api['cod']))
+                            if tema_db and tema_db not in projeto.temas:
+                                projeto.temas.append(tema_db)
+                except Exception as e:
+                    print(f"WORKER: Erro ao buscar temas do projeto {pid}: {e}")
+                projetos_alterados.add(pid)
+                registrar_evento(pid, 'projeto_novo')
 
+            # Resumo das listagens e agregados do painel na mesma transação
+            # (o SQL lê tb_projeto, temas e rl_tramitacoes já gravados)
+            db.session.flush()
+            atualizar_resumos([pid])
+            acumular_tramitacoes([(pid, t.sequencia) for t in novas_trams_objs])
             db.session.commit()
 
         except Exception as e:
             db.session.rollback()
             print(f"WORKER: Erro no projeto {resumo.get('id')}: {e}")
 
+    # 3. Feed personalizado: propaga só os projetos tocados neste ciclo
+    if projetos_alterados:
+        try:
+            qtd_usuarios = atualizar_feed_projetos(projetos_alterados)
+            db.session.commit()
+            print(f"WORKER: Feed atualizado para {qtd_usuarios} usuários ({len(projetos_alterados)} projetos).")
+        except Exception as e:
+            db.session.rollback()
+            print(f"WORKER: Erro ao atualizar feed: {e}")
+
     print(f"WORKER: Ciclo fim. {cnt_novos} novos, {cnt_atualizados} atualizados.")
+    return projetos_alterados
 
 # ============================================================================
 # LOOP PRINCIPAL
@@ -221,10 +216,20 @@ if __name__ == "__main__":
     # Câmara não atualiza tão rápido, 10 min (600s) é saudável.
     INTERVALO = 600 
 
-    if not wait_for_db():
+    app = criar_app_dados('worker')
+    app.app_context().push()
+
+    if not wait_for_db("WORKER"):
         exit(1)
 
+    # Reconstrói os resumos ao subir (cobre projetos alterados com o worker parado)
+    versao_seguidores = versao_segura()
+    print(f"WORKER: {atualizar_resumos()} resumos de projetos reconstruídos.")
+    db.session.commit()
+
     print(f"WORKER: Iniciando monitoramento (Intervalo: {INTERVALO}s)")
+    ultima_manutencao = None
+    ultima_reconstrucao_semelhantes = None
 
     while True:
         # 1. Sync Tabelas Auxiliares
@@ -238,7 +243,44 @@ if __name__ == "__main__":
         )
         
         # 2. Sync Projetos e Gera Notificações
-        sicronizar_projetos(INTERVALO)
+        projetos_alterados = sicronizar_projetos(INTERVALO)
+
+        # 3. Seguidores dos resumos: só projetos com favoritos alterados desde a última passada
+        try:
+            qtd, versao_seguidores = atualizar_seguidores(versao_seguidores)
+            db.session.commit()
+            if qtd:
+                print(f"WORKER: Seguidores recontados em {qtd} resumos.")
+        except Exception as e:
+            db.session.rollback()
+            print(f"WORKER: Erro ao recontar seguidores: {e}")
+
+        # 4. Manutenção diária: partições futuras, retenção das notificações e arquivo das tramitações,
+        #    e lápides do /api/sync fora da retenção
+        if ultima_manutencao != datetime.now().date():
+            try:
+                manter_particoes()
+                limpar_remocoes()
+                ultima_manutencao = datetime.now().date()
+            except Exception as e:
+                db.session.rollback()
+                print(f"WORKER: Erro na manutenção de partições: {e}")
         
+        # 5. Projetos semelhantes: reconstrução completa uma vez por dia (vocabulário e idf novos),
+        #    incremental com o modelo em memória nos demais ciclos
+        try:
+            if ultima_reconstrucao_semelhantes != datetime.now().date():
+                qtd = reconstruir_semelhantes()
+                ultima_reconstrucao_semelhantes = datetime.now().date()
+            else:
+                qtd = atualizar_semelhantes(projetos_alterados)
+            db.session.commit()
+            if qtd:
+                print(f"WORKER: Semelhantes recalculados para {qtd} projetos.")
+        except Exception as e:
+            db.session.rollback()
+            print(f"WORKER: Erro ao calcular semelhantes: {e}")
+
+        print(f"WORKER: Pool de conexões: {estatisticas_pool(db.engine)}")
         print(f"WORKER: Dormindo...")
         time.sleep(INTERVALO)
\ No newline at end of file
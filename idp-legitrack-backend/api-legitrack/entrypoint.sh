@@ -12,10 +12,34 @@ done
 echo "✅ PostgreSQL está pronto!"
 
 # Se for o container api (não worker), executa migrations e seed
-if [ "$1" = "python" ] && [ "$2" = "app.py" ]; then
+if [ "$1" = "gunicorn" ] || { [ "$1" = "python" ] && [ "$2" = "app.py" ]; }; then
   echo "🔄 Executando migrations..."
   flask db upgrade || echo "⚠️  Migrations falharam ou já estão aplicadas"
 
+  echo "🔄 Preparando partições (notificações e tramitações)..."
+  python -m app.particoes || echo "⚠️  Manutenção de partições falhou"
+
+  echo "🔄 Instalando gatilhos de versão (sincronização incremental)..."
+  python -m app.sincronizacao || echo "⚠️  Instalação dos gatilhos de versão falhou"
+
+  echo "🔄 Preparando a cobertura das notificações (idempotência)..."
+  python -m app.notificacoes || echo "⚠️  Preparação da cobertura das notificações falhou"
+
+  echo "🔄 Instalando gatilhos de ids_temas (facetas)..."
+  python -m app.facetas || echo "⚠️  Instalação dos gatilhos de facetas falhou"
+
+  echo "🔄 Reconstruindo resumos das listagens..."
+  python -m app.resumos || echo "⚠️  Reconstrução dos resumos falhou"
+
+  echo "🔄 Criando tabela de projetos semelhantes (calculada pelo worker)..."
+  python -m app.semelhantes --so-tabela || echo "⚠️  Criação da tabela de semelhantes falhou"
+
+  echo "🔄 Preparando agregados do painel..."
+  python -m app.agregados || echo "⚠️  Preparação dos agregados falhou"
+
+  echo "🔄 Criando índices secundários..."
+  python -m app.indices || echo "⚠️  Criação de índices falhou"
+
   echo "🌱 Populando banco de dados..."
   python -m app.seed || echo "⚠️  Seed falhou ou já está populado"
 fi
@@ -0,0 +1,78 @@
+"""
+Configuração do Gunicorn (servidor de produção da API).
+
+Uso:
+    gunicorn -c gunicorn.conf.py "app:create_app()"
+
+Operação:
+    kill -HUP <pid do master>    recarrega a configuração e troca os workers com calma
+    kill -USR2 <pid do master>   sobe um novo master com código novo (depois WINCH/QUIT no antigo)
+
+Com preload_app o código é importado uma vez no master; por isso um HUP não
+recarrega código Python, apenas recria os workers a partir do master.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Processos x threads: cada processo tem seu próprio pool de conexões com o banco
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+# Conexões SSE (/api/notificacoes/stream) ocupam uma thread cada; no máximo SSE_MAX_CONEXOES
+# por worker (padrão: metade das threads), o resto recebe 503
+worker_class = 'gthread'
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))
+
+# App carregado no master antes do fork (menos memória e boot mais rápido dos workers)
+preload_app = True
+
+# Keep-alive: o app mantém conexões HTTP abertas entre as chamadas de uma tela
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+
+# Recicla workers periodicamente (com jitter para não reiniciarem todos juntos). Os streams SSE
+# do worker que sai terminam no heartbeat seguinte (post_worker_init): mantenha
+# SSE_HEARTBEAT_SEGUNDOS menor que graceful_timeout
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '200'))
+
+accesslog = os.getenv('GUNICORN_ACCESSLOG', '-')
+errorlog = '-'
+
+
+def on_starting(server):
+    """
+    Com mais de um worker, a lista de revogação de tokens (app.tokens) e os
+    limites por usuário (app.limites) precisam de um armazenamento comum: em
+    memória, cada worker teria a sua e um logout só valeria em um deles.
+    """
+    if workers > 1 and not os.getenv('ARMAZENAMENTO_URL'):
+        raise RuntimeError(
+            f"WEB_CONCURRENCY={workers} exige ARMAZENAMENTO_URL (ex.: redis://redis:6379/0); "
+            "use WEB_CONCURRENCY=1 para rodar sem armazenamento compartilhado"
+        )
+
+
+def post_fork(server, worker):
+    """
+    Descarta as conexões herdadas do master: um socket do Postgres não pode ser
+    compartilhado entre processos. close=False evita fechar o socket que o
+    master (ou outro worker) ainda enxerga; o pool do worker começa vazio.
+    """
+    from app.extensions import db
+
+    flask_app = worker.app.wsgi()
+    with flask_app.app_context():
+        db.engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    """
+    Liga o broker SSE ao estado do worker: quando ele vai sair (max_requests,
+    HUP), worker.alive fica False e os streams abertos terminam sozinhos.
+    """
+    from app.extensions import broker
+
+    broker.acompanhar_processo(lambda: worker.alive)